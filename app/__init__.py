@@ -1,22 +1,60 @@
 #!/usr/bin/env python3
+import click
 from flask import Flask
 from .config import Config
 from .extensions import db, migrate, jwt, bcrypt, ma, mail
 from .routes import register_routes
+from .commands import register_commands
+from .utils.job_queue import start_worker
+from .utils.mail_pool import init_mail_pool
+from .utils.reminders import start_scheduler
+from .utils.code_store import init_code_store
+from .utils.password_hasher import init_password_hasher
+from .utils.pdf_generator import init_receipt_renderer
+from .utils.token_auth import init_token_auth
+from .utils.response_cache import init_response_cache
+from .utils.mpesa_client import init_mpesa_client
+from .utils.db_routing import init_database
+from .utils.metrics import init_metrics
+from .utils.slow_queries import init_slow_queries
+from .utils.profiler import init_profiler
 from flask_mail import Mail
 
 
+def _serving():
+    """False inside Flask CLI commands (db upgrade, jobs work, shell...), except ``flask run``."""
+    ctx = click.get_current_context(silent=True)
+    return ctx is None or ctx.info_name == 'run'
+
+
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
     db.init_app(app)
+    init_database(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
+    init_token_auth(app)
     bcrypt.init_app(app)
+    init_password_hasher(app)
+    init_receipt_renderer(app)
     ma.init_app(app)
     mail.init_app(app)
+    init_mail_pool(app)
+    init_code_store(app)
+    init_response_cache(app)
+    init_mpesa_client(app)
+    init_metrics(app)
+    init_slow_queries(app)
+    init_profiler(app)
 
 
     register_routes(app)
+    register_commands(app)
+
+    if app.config['JOB_WORKER_ENABLED'] and _serving():
+        start_worker(app)
+    if app.config['REMINDER_SCHEDULER_ENABLED'] and _serving():
+        start_scheduler(app)
     return app
\ No newline at end of file
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+import time
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from app.extensions import db
+from app.utils.search_index import rebuild_index
+from app.utils import fines, job_queue, payments, stats
+from app.utils.reminders import sweep_reminders
+
+books_cli = AppGroup('books', help='Catalog maintenance commands.')
+jobs_cli = AppGroup('jobs', help='Background job queue commands.')
+reminders_cli = AppGroup('reminders', help='Due-date reminder commands.')
+fines_cli = AppGroup('fines', help='Overdue fine commands.')
+stats_cli = AppGroup('stats', help='Dashboard rollup commands.')
+receipts_cli = AppGroup('receipts', help='Payment receipt and statement commands.')
+
+
+@books_cli.command('reindex')
+@click.option('--batch-size', default=1000, show_default=True)
+def reindex_books(batch_size):
+    """Rebuild the catalog search index from the book table."""
+    total = rebuild_index(batch_size=batch_size)
+    click.echo(f'Indexed {total} books')
+
+
+@jobs_cli.command('work')
+def work_jobs():
+    """Run a dedicated job worker until interrupted."""
+    worker = job_queue.start_worker(current_app._get_current_object())
+    click.echo(f'Job worker running with {worker.concurrency} threads')
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        worker.stop(timeout=10)
+
+
+@jobs_cli.command('drain')
+def drain_jobs():
+    """Run every job that is currently due, then exit."""
+    done = job_queue.drain(current_app._get_current_object())
+    click.echo(f'Ran {done} jobs')
+
+
+@jobs_cli.command('prune')
+def prune_jobs():
+    """Delete done and failed jobs past their retention period."""
+    removed = job_queue.prune_finished_jobs()
+    click.echo(f'Pruned {removed} jobs')
+
+
+@reminders_cli.command('run')
+def run_reminders():
+    """Queue reminder digests for every borrow due within the reminder window."""
+    sent = sweep_reminders()
+    click.echo(f'Queued {sent} reminder digests')
+
+
+@fines_cli.command('accrue')
+def accrue_fines():
+    """Accrue fines on overdue open borrows now."""
+    changed = fines.accrue_fines()
+    db.session.commit()
+    click.echo(f'Accrued fines on {changed} debts')
+
+
+@fines_cli.command('rebuild-balances')
+def rebuild_balances():
+    """Recompute every user_balance row from the debts table."""
+    total = fines.rebuild_balances()
+    db.session.commit()
+    click.echo(f'Rebuilt {total} balances')
+
+
+@stats_cli.command('rebuild')
+@click.option('--chunk-size', default=stats.REBUILD_CHUNK_SIZE, show_default=True)
+def rebuild_stats(chunk_size):
+    """Recompute the circulation rollups from borrow and debt history."""
+    days, titles = stats.rebuild_rollups(chunk_size=chunk_size)
+    db.session.commit()
+    click.echo(f'Rebuilt {days} daily rows and {titles} monthly title rows')
+
+
+@receipts_cli.command('statements')
+@click.option('--month', required=True, help='Month to report on, as YYYY-MM.')
+def send_statements(month):
+    """Render and queue a statement for every member who paid fines in MONTH."""
+    try:
+        first_day = datetime.strptime(month, '%Y-%m').date()
+    except ValueError:
+        raise click.BadParameter('Use YYYY-MM', param_hint='--month')
+    sent = payments.send_statements(first_day)
+    click.echo(f'Queued {sent} statements for {month}')
+
+
+def register_commands(app):
+    app.cli.add_command(books_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(reminders_cli)
+    app.cli.add_command(fines_cli)
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(receipts_cli)
+    return app
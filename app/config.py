@@ -15,12 +15,94 @@ class Config:
         SQLALCHEMY_TRACK_MODIFICATIONS = False
         if not SECRET_KEY or not SQLALCHEMY_DATABASE_URI:
             raise ValueError('Missing environment variables: Ensure SECRET_KEY and DATABASE_URI')
+        DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+        DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+        DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+        # Below MySQL's wait_timeout, so idle connections are replaced before the server drops them.
+        DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+        DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+        DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))
+        SQLALCHEMY_ENGINE_OPTIONS = {'pool_pre_ping': DB_POOL_PRE_PING, 'pool_recycle': DB_POOL_RECYCLE}
+        if not SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+            SQLALCHEMY_ENGINE_OPTIONS.update(
+                pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT,
+            )
+        REPLICA_DATABASE_URI = os.getenv('REPLICA_DATABASE_URI')
+        SQLALCHEMY_BINDS = {'replica': REPLICA_DATABASE_URI} if REPLICA_DATABASE_URI else {}
+        REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', 5))
+        REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', 2))
+        METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+        # When set, /metrics requires 'Authorization: Bearer <token>'.
+        METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+        # Statements slower than this are logged and kept for /api/admin/slow-queries; 0 turns it off.
+        SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 200))
+        SLOW_QUERY_MAX_ENTRIES = int(os.getenv('SLOW_QUERY_MAX_ENTRIES', 100))
+        SLOW_QUERY_RECENT_SIZE = int(os.getenv('SLOW_QUERY_RECENT_SIZE', 200))
+        SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() == 'true'
+        SLOW_QUERY_EXPLAIN_INTERVAL = int(os.getenv('SLOW_QUERY_EXPLAIN_INTERVAL', 600))
+        # Off by default. When on, requests carrying a signed X-Profile token
+        # (see POST /api/admin/profiles/token) are profiled.
+        PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+        PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+        PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 5))
+        PROFILE_TOKEN_MAX_AGE = int(os.getenv('PROFILE_TOKEN_MAX_AGE', 3600))
+        PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+        PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', 50))
+        PROFILE_MAX_BYTES = int(os.getenv('PROFILE_MAX_BYTES', 100 * 1024 * 1024))
         MAIL_SERVER = os.getenv('MAIL_SERVER')
         MAIL_PORT = os.getenv('MAIL_PORT')
         MAIL_USE_TLS = os.getenv('MAIL_USE_TLS')
         MAIL_USERNAME = os.getenv('MAIL_USERNAME')
         MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
         MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER')
+        BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+        PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS')) if os.getenv('PASSWORD_HASH_WORKERS') else None
+        PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 32))
+        PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+        PASSWORD_HASH_BULK_WORKERS = int(os.getenv('PASSWORD_HASH_BULK_WORKERS')) if os.getenv('PASSWORD_HASH_BULK_WORKERS') else None
+        AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 4096))
+        REVOKED_TOKEN_BLOOM_CAPACITY = int(os.getenv('REVOKED_TOKEN_BLOOM_CAPACITY', 100000))
+        REVOKED_TOKEN_SYNC_INTERVAL = int(os.getenv('REVOKED_TOKEN_SYNC_INTERVAL', 30))
+        BULK_IMPORT_CHUNK_SIZE = int(os.getenv('BULK_IMPORT_CHUNK_SIZE', 1000))
+        BULK_UPDATE_MAX_ROWS = int(os.getenv('BULK_UPDATE_MAX_ROWS', 10000))
+        RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+        RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 2048))
+        RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+        RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 300))
+        RESPONSE_CACHE_VERSION_CHECK = float(os.getenv('RESPONSE_CACHE_VERSION_CHECK', 1.0))
+        VERIFICATION_CODE_BACKEND = os.getenv('VERIFICATION_CODE_BACKEND', 'database')
+        VERIFICATION_CODE_MAX_ENTRIES = int(os.getenv('VERIFICATION_CODE_MAX_ENTRIES', 100000))
+        MAIL_POOL_SIZE = int(os.getenv('MAIL_POOL_SIZE', 2))
+        MAIL_POOL_MAX_IDLE = int(os.getenv('MAIL_POOL_MAX_IDLE', 60))
+        JOB_WORKER_ENABLED = os.getenv('JOB_WORKER_ENABLED', 'true').lower() == 'true'
+        JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+        JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 1.0))
+        JOB_VISIBILITY_TIMEOUT = int(os.getenv('JOB_VISIBILITY_TIMEOUT', 300))
+        JOB_RETENTION_DAYS = int(os.getenv('JOB_RETENTION_DAYS', 7))
+        JOB_FAILED_RETENTION_DAYS = int(os.getenv('JOB_FAILED_RETENTION_DAYS', 30))
+        REMINDER_SCHEDULER_ENABLED = os.getenv('REMINDER_SCHEDULER_ENABLED', 'true').lower() == 'true'
+        REMINDER_SWEEP_INTERVAL = int(os.getenv('REMINDER_SWEEP_INTERVAL', 3600))
+        FINES_ACCRUAL_HOUR = int(os.getenv('FINES_ACCRUAL_HOUR', 21))
+        HOLD_CLAIM_HOURS = int(os.getenv('HOLD_CLAIM_HOURS', 48))
+        HOLD_STREAM_POLL_INTERVAL = float(os.getenv('HOLD_STREAM_POLL_INTERVAL', 5))
+        HOLD_STREAM_HEARTBEAT = float(os.getenv('HOLD_STREAM_HEARTBEAT', 15))
+        HOLD_STREAM_MAX_SECONDS = int(os.getenv('HOLD_STREAM_MAX_SECONDS', 300))
+        HOLD_STREAM_OVERLAP_SECONDS = float(os.getenv('HOLD_STREAM_OVERLAP_SECONDS', 10))
+        RECEIPT_RENDER_WORKERS = int(os.getenv('RECEIPT_RENDER_WORKERS')) if os.getenv('RECEIPT_RENDER_WORKERS') else None
+        RECEIPT_RENDER_MAX_PENDING = int(os.getenv('RECEIPT_RENDER_MAX_PENDING', 16))
+        RECEIPT_RENDER_TIMEOUT = float(os.getenv('RECEIPT_RENDER_TIMEOUT', 30))
+        MPESA_BASE_URL = os.getenv('MPESA_BASE_URL', 'https://sandbox.safaricom.co.ke')
+        MPESA_CONSUMER_KEY = os.getenv('MPESA_CONSUMER_KEY')
+        MPESA_CONSUMER_SECRET = os.getenv('MPESA_CONSUMER_SECRET')
+        MPESA_SHORTCODE = os.getenv('MPESA_SHORTCODE', '174379')
+        MPESA_PASSKEY = os.getenv('MPESA_PASSKEY')
+        MPESA_CALLBACK_URL = os.getenv('MPESA_CALLBACK_URL')
+        MPESA_CONNECT_TIMEOUT = float(os.getenv('MPESA_CONNECT_TIMEOUT', 3.05))
+        MPESA_READ_TIMEOUT = float(os.getenv('MPESA_READ_TIMEOUT', 10))
+        MPESA_RETRIES = int(os.getenv('MPESA_RETRIES', 2))
+        MPESA_POOL_SIZE = int(os.getenv('MPESA_POOL_SIZE', 10))
+        MPESA_BREAKER_THRESHOLD = int(os.getenv('MPESA_BREAKER_THRESHOLD', 5))
+        MPESA_BREAKER_RESET = int(os.getenv('MPESA_BREAKER_RESET', 30))
 
 
 if __name__ == "__main__":
@@ -1,41 +1,55 @@
 #!/usr/bin/env python3
-import pandas as pd
-from flask import send_file, jsonify
-from io import BytesIO
+import csv
+import io
+import tempfile
+from flask import Response, send_file, jsonify, stream_with_context
+from openpyxl import Workbook
 import logging
 
 logger = logging.getLogger(__name__)
 
-def export_to_excel(data, columns, filename="export.xlsx"):
-    try:
-        if not data or not isinstance(data, list):
-            return jsonify({"msg": "No data available to export"}), 400
-        
-        df = pd.DataFrame(data, columns=columns)
-        output = BytesIO()
+CSV_CHUNK_ROWS = 500
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+def _csv_chunks(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= CSV_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+    yield buffer.getvalue()
 
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Sheet1', index=False)
+def export_to_excel(rows, columns, filename="export.xlsx"):
+    try:
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Sheet1')
+        sheet.append(columns)
+        for row in rows:
+            sheet.append(row)
 
+        # Small exports stay in memory, large ones roll over to a temp file.
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        workbook.save(output)
         output.seek(0)
         return send_file(output, download_name=filename, as_attachment=True,  mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    
+
     except Exception as e:
         logger.exception('Error exporting data to Excel')
         return jsonify({'msg': 'Failed to export Excel file', 'error': str(e)}), 500
-    
-def export_to_csv(data, columns, filename="export.csv"):
+
+def export_to_csv(rows, columns, filename="export.csv"):
     try:
-        if not data or not isinstance(data, list):
-            return jsonify({"msg": "No data available to export"}), 400
-        
-        df = pd.DataFrame(data, columns=columns)
-        output = BytesIO()
-        df.to_csv(output, index=False)
-        output.seek(0)
+        response = Response(stream_with_context(_csv_chunks(rows, columns)), mimetype='text/csv')
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+        return response
 
-        return send_file(output, download_name=filename, as_attachment=True, mimetype='text/csv')
-    
     except Exception as e:
         logger.exception('Error exporting data to CSV')
-        return jsonify({'msg': 'Failed to export CSV file', 'error': str(e)}),
+        return jsonify({'msg': 'Failed to export CSV file', 'error': str(e)}), 500
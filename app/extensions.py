@@ -5,8 +5,9 @@ from flask_jwt_extended import JWTManager
 from flask_bcrypt import Bcrypt
 from flask_marshmallow import Marshmallow
 from flask_mail import Mail
+from app.utils.db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 jwt = JWTManager()
 bcrypt = Bcrypt()
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
-from .extensions import db, bcrypt
+from .extensions import db
+from .utils.password_hasher import password_hasher
 from datetime import datetime, timedelta
 
 class User(db.Model):
@@ -8,23 +9,50 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
     role = db.Column(db.String(64), default='member')
+    # Normalized to 2547XXXXXXXX / 2541XXXXXXXX, the form M-Pesa callbacks use.
+    phone = db.Column(db.String(12), unique=True, index=True)
 
 
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+        if not password_hasher.check(self.password_hash, password):
+            return False
+        if password_hasher.needs_rehash(self.password_hash):
+            # Cost factor changed since this hash was made; upgrade it while we have the plaintext.
+            self.set_password(password)
+        return True
 
 
 class Book(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     author = db.Column(db.String(100), nullable=False)
+    isbn = db.Column(db.String(13), unique=True, nullable=True)
     category = db.Column(db.String(100))
     total_copies = db.Column(db.Integer, nullable=False)
     available_copies = db.Column(db.Integer, nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_book_title_author', 'title', 'author'),
+        db.Index('ix_book_category_copies', 'category', 'total_copies', 'available_copies'),
+    )
+
+
+class BookSearchTerm(db.Model):
+    __tablename__ = 'book_search_terms'
+    id = db.Column(db.Integer, primary_key=True)
+    book_id = db.Column(db.Integer, db.ForeignKey('book.id', ondelete='CASCADE'), nullable=False, index=True)
+    field = db.Column(db.String(16), nullable=False)
+    kind = db.Column(db.String(1), nullable=False)
+    term = db.Column(db.String(64), nullable=False)
+    weight = db.Column(db.Float, nullable=False, default=1.0)
+
+    __table_args__ = (
+        db.Index('ix_book_search_terms_lookup', 'kind', 'field', 'term', 'book_id'),
+    )
+
 
 class Borrow(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -33,20 +61,146 @@ class Borrow(db.Model):
     borrow_date = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
     due_date = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
     fine = db.Column(db.Float, default=0.0)
+    fine_paid = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
     returned = db.Column(db.Boolean, default=False)
+    returned_at = db.Column(db.DateTime)
+    reminder_sent_at = db.Column(db.DateTime)
 
     user = db.relationship('User', backref='borrows')
     book = db.relationship('Book', backref='borrows')
 
+    __table_args__ = (
+        db.Index('ix_borrow_user_book_returned', 'user_id', 'book_id', 'returned'),
+        db.Index('ix_borrow_open', 'returned', 'id', sqlite_where=returned == False, postgresql_where=returned == False),
+        db.Index('ix_borrow_reminder_scan', 'returned', 'reminder_sent_at', 'user_id', 'id', 'due_date'),
+        db.Index('ix_borrow_open_due', 'returned', 'due_date'),
+    )
+
 class Debt(db.Model):
     __tablename__ = 'debts'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     book_id = db.Column(db.Integer, db.ForeignKey('book.id'), nullable=False)
+    borrow_id = db.Column(db.Integer, db.ForeignKey('borrow.id'), nullable=True)
     days_overdue = db.Column(db.Integer, nullable=False)
     fine_amount = db.Column(db.Float, nullable=False)
     paid = db.Column(db.Boolean, default=False)
+    paid_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=lambda: datetime.utcnow() + timedelta(hours=3))
 
     user = db.relationship('User', backref='debts')
-    book = db.relationship('Book', backref='debts')
\ No newline at end of file
+    book = db.relationship('Book', backref='debts')
+
+    __table_args__ = (
+        db.Index('ix_debts_user_paid', 'user_id', 'paid'),
+        db.Index('ix_debts_user_id', 'user_id', 'id'),
+        db.Index('ix_debts_borrow_paid', 'borrow_id', 'paid'),
+    )
+
+
+class UserBalance(db.Model):
+    __tablename__ = 'user_balance'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    outstanding = db.Column(db.Float, nullable=False, default=0.0)
+    unpaid_debts = db.Column(db.Integer, nullable=False, default=0)
+    credit = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Hold(db.Model):
+    __tablename__ = 'holds'
+    id = db.Column(db.Integer, primary_key=True)
+    book_id = db.Column(db.Integer, db.ForeignKey('book.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='waiting')
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    ready_at = db.Column(db.DateTime)
+    expires_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    user = db.relationship('User', backref=db.backref('holds', passive_deletes=True))
+    book = db.relationship('Book', backref=db.backref('holds', passive_deletes=True))
+
+    __table_args__ = (
+        # Queue head: waiting holds of a book by priority, then arrival.
+        db.Index('ix_holds_book_status_priority', 'book_id', 'status', 'priority', 'id'),
+        db.Index('ix_holds_user_status', 'user_id', 'status'),
+        db.Index('ix_holds_user_updated', 'user_id', 'updated_at'),
+        db.Index('ix_holds_status_expires', 'status', 'expires_at'),
+    )
+
+
+class Payment(db.Model):
+    __tablename__ = 'payments'
+    id = db.Column(db.Integer, primary_key=True)
+    checkout_request_id = db.Column(db.String(64), unique=True, nullable=False)
+    merchant_request_id = db.Column(db.String(64))
+    mpesa_receipt = db.Column(db.String(32), unique=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'), index=True)
+    phone = db.Column(db.String(12), index=True)
+    amount = db.Column(db.Float, nullable=False)
+    settled_amount = db.Column(db.Float, nullable=False, default=0.0)
+    status = db.Column(db.String(16), nullable=False, default='pending')
+    result_code = db.Column(db.Integer)
+    result_desc = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+
+    user = db.relationship('User', backref='payments')
+
+
+class DailyCirculation(db.Model):
+    __tablename__ = 'daily_circulation'
+    day = db.Column(db.Date, primary_key=True)
+    borrows = db.Column(db.Integer, nullable=False, default=0)
+    returns = db.Column(db.Integer, nullable=False, default=0)
+    overdue_returns = db.Column(db.Integer, nullable=False, default=0)
+    fines_collected = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class MonthlyTitleBorrows(db.Model):
+    __tablename__ = 'monthly_title_borrows'
+    month = db.Column(db.Date, primary_key=True)
+    book_id = db.Column(db.Integer, db.ForeignKey('book.id', ondelete='CASCADE'), primary_key=True)
+    borrows = db.Column(db.Integer, nullable=False, default=0)
+
+
+class VerificationCode(db.Model):
+    __tablename__ = 'verification_codes'
+    email = db.Column(db.String(120), primary_key=True)
+    code = db.Column(db.String(16), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_tokens'
+    jti = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class CacheVersion(db.Model):
+    __tablename__ = 'cache_versions'
+    name = db.Column(db.String(32), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = db.Column(db.DateTime)
+    idempotency_key = db.Column(db.String(128), unique=True)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
@@ -6,6 +6,10 @@ from .borrow import borrow_bp
 from .debt import debt_bp
 from .export import export_bp
 from .mpesa import mpesa_bp
+from .stats import stats_bp
+from .holds import holds_bp
+from .metrics import metrics_bp
+from .admin import admin_bp
 
 def register_routes(app):
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -15,4 +19,8 @@ def register_routes(app):
     app.register_blueprint(debt_bp, url_prefix='/api/debts')
     app.register_blueprint(export_bp, url_prefix='/api/export')
     app.register_blueprint(mpesa_bp, url_prefix='/api/mpesa')
+    app.register_blueprint(stats_bp, url_prefix='/api/stats')
+    app.register_blueprint(holds_bp, url_prefix='/api/holds')
+    app.register_blueprint(metrics_bp, url_prefix='/metrics')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
     return app
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+from flask import Blueprint, current_app, request, jsonify, send_file
+from flask_jwt_extended import get_jwt_identity
+from app.utils.decorators import jwt_required, role_required
+from app.utils.profiler import FORMATS, HEADER, delete_profile, issue_token, list_profiles, profile_path
+from app.utils.slow_queries import get_slow_query_log
+
+admin_bp = Blueprint('admin', __name__)
+
+MAX_LIMIT = 500
+
+
+@admin_bp.route('/slow-queries', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def slow_queries():
+    try:
+        log = get_slow_query_log()
+        if log is None:
+            return jsonify({'msg': 'Slow query log is disabled (SLOW_QUERY_THRESHOLD_MS=0)'}), 404
+        try:
+            limit = min(max(int(request.args.get('limit', 50)), 1), MAX_LIMIT)
+        except ValueError:
+            return jsonify({'msg': 'limit must be an integer'}), 400
+        sort = request.args.get('sort', 'max')
+        if sort not in ('max', 'total', 'count'):
+            return jsonify({'msg': 'sort must be one of max, total, count'}), 400
+        return jsonify({
+            'threshold_ms': log.threshold * 1000,
+            'worst': log.worst(limit, sort),
+            'recent': log.recent(limit),
+        }), 200
+    except Exception as e:
+        return jsonify({'msg': str(e)}), 500
+
+
+@admin_bp.route('/slow-queries', methods=['DELETE'])
+@jwt_required()
+@role_required('admin')
+def clear_slow_queries():
+    log = get_slow_query_log()
+    if log is None:
+        return jsonify({'msg': 'Slow query log is disabled (SLOW_QUERY_THRESHOLD_MS=0)'}), 404
+    log.clear()
+    return jsonify({'msg': 'Slow query log cleared'}), 200
+
+
+@admin_bp.route('/profiles/token', methods=['POST'])
+@jwt_required()
+@role_required('admin')
+def profile_token():
+    if not current_app.config['PROFILING_ENABLED']:
+        return jsonify({'msg': 'Profiling is disabled (PROFILING_ENABLED=false)'}), 404
+    return jsonify({
+        'header': HEADER,
+        'token': issue_token(get_jwt_identity()),
+        'expires_in': current_app.config['PROFILE_TOKEN_MAX_AGE'],
+    }), 200
+
+
+@admin_bp.route('/profiles', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def profiles():
+    try:
+        return jsonify({'profiles': list_profiles()}), 200
+    except Exception as e:
+        return jsonify({'msg': str(e)}), 500
+
+
+@admin_bp.route('/profiles/<string:profile_id>.<string:fmt>', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def download_profile(profile_id, fmt):
+    path = profile_path(profile_id, fmt)
+    if path is None:
+        return jsonify({'msg': 'Profile not found'}), 404
+    return send_file(path, mimetype=FORMATS[fmt], as_attachment=True, download_name=f'{profile_id}.{fmt}')
+
+
+@admin_bp.route('/profiles/<string:profile_id>', methods=['DELETE'])
+@jwt_required()
+@role_required('admin')
+def remove_profile(profile_id):
+    if not delete_profile(profile_id):
+        return jsonify({'msg': 'Profile not found'}), 404
+    return jsonify({'msg': 'Profile deleted'}), 200
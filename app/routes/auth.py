@@ -1,47 +1,43 @@
 #!/usr/bin/env python3
 import re
 import html
-import random
-import time
+import secrets
 from datetime import timedelta
 from flask import Blueprint, request, jsonify
-from app.extensions import db, mail
+from app.extensions import db
 from app.models import User
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from flask_mail import Message
+from app.schemas.user import EMAIL_REGEX, NAME_REGEX, PASSWORD_REGEX
+from flask_jwt_extended import create_access_token, get_jwt_identity
+from app.utils.decorators import jwt_required
+from app.utils.token_auth import revoke_current_token
+from app.utils.emailer import queue_email
+from app.utils.code_store import get_code_store
+from app.utils.password_hasher import HasherBusy
 
 
-EMAIL_REGEX = r'^[a-zA-Z0-9_.+]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$'
-NAME_REGEX = r'^[a-zA-Z0-9-_ ]+$'
-PASSWORD_REGEX = r"^(?=.*[A-Za-z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{8,}$"
+auth_bp =Blueprint('auth', __name__)
 
+BUSY_RETRY_AFTER = '2'
 
-auth_bp =Blueprint('auth', __name__)
+def server_busy():
+    response = jsonify({'msg': 'Server is busy, please try again shortly'})
+    response.headers['Retry-After'] = BUSY_RETRY_AFTER
+    return response, 503
 
-VERIFICATION_CODES = {}
+@auth_bp.errorhandler(HasherBusy)
+def handle_hasher_busy(e):
+    db.session.rollback()
+    return server_busy()
 
 EXPIRATION_TIME = 36000
 
 def generate_verification_code(email):
-    code = random.randint(100000, 999999)
-    VERIFICATION_CODES[email] = {
-        'code': code,
-        'timestamp': time.time()
-    }
+    code = secrets.randbelow(900000) + 100000
+    get_code_store().put(email, code, EXPIRATION_TIME)
     return code
 
-def is_code_valid(email, code):
-    if email not in VERIFICATION_CODES:
-        return False
-    stored_data = VERIFICATION_CODES[email]
-
-    if stored_data['code'] != int(code):
-        return False
-    if time.time() - stored_data['timestamp'] > EXPIRATION_TIME:
-        del VERIFICATION_CODES[email]
-        return False
-    
-    return True
+def consume_code(email, code):
+    return get_code_store().consume(email, str(code).strip())
 
 @auth_bp.route('/register', methods=['POST'])
 def register():
@@ -84,6 +80,9 @@ def register():
         db.session.commit()
 
         return jsonify({'msg': 'User registered successfully'}), 201
+    except HasherBusy:
+        db.session.rollback()
+        return server_busy()
     except Exception as e:
         db.session.rollback()
         return jsonify({'msg': 'An error occurred', 'error': str(e)}), 500
@@ -117,9 +116,9 @@ def login():
             return jsonify({'msg': 'Invalid email or password'}), 401
         
         verification_code = generate_verification_code(email)
-        msg = Message('Kenya Library Verification Code', recipients=[email])
-        msg.body = f"Your 2FA verification code is: {verification_code}\nThis code expires in 10 minutes."
-        mail.send(msg)
+        queue_email([email], 'Kenya Library Verification Code',
+                    f"Your 2FA verification code is: {verification_code}\nThis code expires in 10 minutes.")
+        db.session.commit()
 
         return jsonify({'msg': '2FA code sent to email', 'email': email}), 200
         # expires = timedelta(hours=9)
@@ -135,6 +134,9 @@ def login():
         #     'user': {'id': user.id, 'role': user.role, 'email': user.email}
         # }), 200
 
+    except HasherBusy:
+        db.session.rollback()
+        return server_busy()
     except Exception as e:
         db.session.rollback()
         return jsonify({'msg': 'An error occurred', 'error': str(e)}), 500
@@ -150,7 +152,7 @@ def verify_2fa():
 
         if not email or not verification_code:
             return jsonify({'msg': 'Please fill in all fields'}), 400
-        if not is_code_valid(email, verification_code):
+        if not consume_code(email, verification_code):
             return jsonify({'msg': 'Invalid verification code'}), 400
         
         user = User.query.filter_by(email=email).first()
@@ -163,8 +165,6 @@ def verify_2fa():
             "email": user.email
         }, expires_delta=expires)
 
-        del VERIFICATION_CODES[email]
-
         return jsonify({
             'msg': 'Login successfully',
             'access_token': access_token,
@@ -185,6 +185,16 @@ def protected():
     current_user = get_jwt_identity()
     return jsonify({'logged_in_as': current_user}), 200
 
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    try:
+        revoke_current_token()
+        return jsonify({'msg': 'Logged out successfully'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'msg': 'An error occurred', 'error': str(e)}), 500
+
 @auth_bp.route('/forgot-password', methods=['POST'])
 def forgot_password():
     data = request.get_json()
@@ -196,9 +206,9 @@ def forgot_password():
     
     verification_code = generate_verification_code(email)
 
-    msg = Message('Password Reset Code', recipients=[email])
-    msg.body = f"You password reset code is: {verification_code}\nThis code expires in 10 minutes."
-    mail.send(msg)
+    queue_email([email], 'Password Reset Code',
+                f"You password reset code is: {verification_code}\nThis code expires in 10 minutes.")
+    db.session.commit()
 
     return jsonify({'msg': 'Verification code sent to email'}), 200
 
@@ -211,7 +221,7 @@ def reset_password():
 
     if not email or not verification_code or not new_password:
         return jsonify({'msg': 'Missing required fields'}), 400
-    if not is_code_valid(email, verification_code):
+    if not consume_code(email, verification_code):
         return jsonify({'msg': 'Invalid verification code'}), 400
     user = User.query.filter_by(email=email).first()
     if not user:
@@ -220,5 +230,4 @@ def reset_password():
     user.set_password(new_password)
     db.session.commit()
 
-    del VERIFICATION_CODES[email]
     return jsonify({'msg': 'Password reset successfully'}), 200
@@ -1,36 +1,43 @@
 #!/usr/bin/env python3
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from app.extensions import db
 from app.models import Book
 from app.schemas.book import BookSchema
-from flask_jwt_extended import jwt_required
-from app.utils.decorators import role_required
+from app.utils.decorators import jwt_required, read_only, role_required
+from app.utils import search_index
+from app.utils.bulk_import import BulkImportError, detect_format, import_books, normalize_isbn, read_records
+from app.utils.response_cache import CATALOG, cached_response, get_response_cache
+from app.utils.holds import promote_waiting
+from app.utils.pagination import PaginationError, keyset_page, page_limit, project, requested_fields, with_cursor
 
 
 books_bp = Blueprint('books', __name__)
 book_schema = BookSchema()
 books_schema = BookSchema(many=True)
 
+BOOK_FIELDS = ('id', 'isbn', 'title', 'author', 'category', 'total_copies', 'available_copies')
+SEARCH_FIELDS = ('id', 'title', 'author', 'category', 'available_copies')
+
 @books_bp.route('/', methods=['GET'])
 @jwt_required()
+@cached_response(CATALOG)
+@read_only
 def get_books():
     try:
-        query = Book.query
-        title = request.args.get('title')
-        author = request.args.get('author')
-        category = request.args.get('category')
-
-        if title:
-            query = query.filter(Book.title.ilike(f'%{title}%'))
-
-        if author:
-                query = query.filter(Book.ilike(f'%{author}%'))
-
-        if category:
-             query = query.filter(Book.category.ilike(f'%{category}%'))
-
-        books = query.all()
-        return jsonify(books_schema.dump(books)), 200
+        criteria = {
+            'title': request.args.get('title'),
+            'author': request.args.get('author'),
+            'category': request.args.get('category'),
+        }
+        fields = requested_fields(BOOK_FIELDS)
+        query = search_index.filter_books(Book.query, fuzzy=True, **criteria)
+        query = project(query, Book, fields)
+
+        books, next_cursor = keyset_page(query, [(Book.id, False)])
+        schema = BookSchema(many=True, only=fields) if fields else books_schema
+        return with_cursor(jsonify(schema.dump(books)), next_cursor), 200
+    except PaginationError as e:
+        return jsonify({'msg': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'msg': 'An error occurred', 'error': str(e)}), 500
@@ -47,6 +54,7 @@ def add_book():
           book = Book(
                title=data['title'],
                author=data['author'],
+               isbn=normalize_isbn(data.get('isbn')),
                category=data['category'],
                total_copies=data['total_copies'],
                available_copies=data['total_copies']
@@ -59,6 +67,28 @@ def add_book():
         return jsonify({'msg': 'An error occurred', 'error': str(e)}), 500
      
 
+@books_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+@role_required('admin', 'librarian')
+def bulk_import_books():
+    try:
+        fmt = detect_format(request.args.get('format'), request.content_type)
+        offset = request.args.get('offset', 0, type=int)
+        chunk_size = request.args.get('chunk_size', current_app.config['BULK_IMPORT_CHUNK_SIZE'], type=int)
+        if offset < 0 or chunk_size < 1:
+            return jsonify({'msg': 'offset must be >= 0 and chunk_size >= 1'}), 400
+
+        report, error = import_books(read_records(request.stream, fmt), offset=offset, chunk_size=chunk_size)
+        if error is not None:
+            return jsonify(report.as_dict(msg='Import stopped; resume from resume_offset', error=str(error))), 500
+        return jsonify(report.as_dict(msg='Import finished')), 200
+    except BulkImportError as e:
+        return jsonify({'msg': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'msg': 'An error occurred', 'error': str(e)}), 500
+
+
 @books_bp.route('/<int:book_id>', methods=['PUT'])
 @jwt_required()
 @role_required('admin', 'librarian')
@@ -73,12 +103,15 @@ def update_book(book_id):
         book.title = data.get('title', book.title)
         book.author = data.get('author', book.author)
         book.category = data.get('category', book.category)
-        book.total_copies = data.get( 'total_copies', book.total_copies)
-
+        if 'isbn' in data:
+            book.isbn = normalize_isbn(data['isbn'])
         new_total = data.get('total_copies')
         if new_total is not None and new_total >= (book.total_copies - book.available_copies):
              diff = new_total - book.total_copies
              book.available_copies += diff if diff > 0 else 0
+             if diff > 0:
+                 promote_waiting(book.id)
+        book.total_copies = data.get( 'total_copies', book.total_copies)
 
         db.session.commit()
         return jsonify(book_schema.dump(book)), 200
@@ -101,35 +134,39 @@ def delete_book(book_id):
         return jsonify({'msg': 'An error occurred', 'error': str(e)}), 500
 
 @books_bp.route('/search', methods=['GET'])
+@cached_response(CATALOG)
+@read_only
 def search_books():
     try:
           title = request.args.get('title', '').strip().lower()
           author = request.args.get('author', '').strip().lower()
           category = request.args.get('category', '').strip().lower()
 
-          query = Book.query
-          if title:
-               query = query.filter(Book.title.ilike(f'%{title}%'))
-          if author:
-               query = query.filter(Book.author.ilike(f"%{author}%"))
-          if category:
-               query = query.filter(Book.category.ilike(f"%{category}%"))
-          
-          books = query.all()
+          fields = requested_fields(SEARCH_FIELDS) or SEARCH_FIELDS
+          ranked = search_index.search_books(
+               limit=page_limit(), title=title, author=author, category=category
+          )
+          ids = [book_id for book_id, _ in ranked]
+          found = {b.id: b for b in project(Book.query.filter(Book.id.in_(ids)), Book, fields)} if ids else {}
+          books = [found[book_id] for book_id in ids if book_id in found]
           if not books:
                return jsonify({'msg': 'No books found'}), 404
           
           return jsonify({
-            'books': [
-                {'id': book.id, 'title': book.title, 'author': book.author, 
-                 'category': book.category, 'available_copies': book.available_copies}
-                for book in books
-                    ]
+            'books': [{f: getattr(book, f) for f in fields} for book in books]
                }), 200
+    except PaginationError as e:
+         return jsonify({'msg': str(e)}), 400
     except Exception as e:
-         return jsonify({'msg': 'An error occurred', 'error': str(e)})
-
-
+         db.session.rollback()
+         return jsonify({'msg': 'An error occurred', 'error': str(e)}), 500
 
 
-                
\ No newline at end of file
+@books_bp.route('/cache/stats', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def cache_stats():
+    cache = get_response_cache()
+    if cache is None:
+        return jsonify({'msg': 'Response cache is disabled (RESPONSE_CACHE_ENABLED=false)'}), 404
+    return jsonify(cache.stats()), 200
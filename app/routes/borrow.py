@@ -1,32 +1,34 @@
 #!/usr/bin/env python3
-import time
 import pytz
-from flask import Blueprint, request, jsonify, current_app
-from app.extensions import db, mail
-from app.models import Book, Borrow, Debt
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
-from app.utils.decorators import role_required
+from flask import Blueprint, request, jsonify
+from app.extensions import db
+from app.models import Book, Borrow
+from flask_jwt_extended import get_jwt_identity, get_jwt
+from app.utils.decorators import jwt_required, role_required
 from datetime import datetime, timedelta
-from flask_mail import Message
-from threading import Thread
+from app.utils.emailer import queue_email
+from app.utils.inventory import OutOfStock, take_copy, run_in_transaction
+from app.utils.holds import fulfil_hold, ready_hold, release_copy
+from app.utils.fines import FINE_PER_DAY, charge_on_return, get_balance
+from app.utils.stats import record_borrow, record_return
+from sqlalchemy import update
+from app.utils.pagination import PaginationError, keyset_page, project, requested_fields, with_cursor
 
 borrow_bp = Blueprint('borrow', __name__)
 
 BORROW_DAYS_LIMIT = -14
-FINE_PER_DAY = 20  
+BORROW_FIELDS = {
+    'borrow_id': lambda b: b.id,
+    'user_id': lambda b: b.user_id,
+    'book_id': lambda b: b.book_id,
+    'borrow_date': lambda b: b.borrow_date.strftime('%Y-%m-%d'),
+    'due_date': lambda b: b.due_date.strftime('%Y-%m-%d'),
+    'returned': lambda b: b.returned,
+}
 kenya_tz = pytz.timezone("Africa/Nairobi")
 
-def send_async_email(app, msg):
-    with app.app_context():
-        try:
-            mail.send(msg)
-        except Exception as e:
-            print(f"Email sending failed: {str(e)}")
-
-def send_borrow_email(user_email, book_title, due_date):
-    app = current_app._get_current_object()
-    msg = Message('Book Borrowed Successfully', recipients=[user_email])
-    msg.body = f"""
+def send_borrow_email(borrow_id, user_email, book_title, due_date):
+    body = f"""
     Hello,
 
     You have successfully borrowed the book **"{book_title}"**.
@@ -37,41 +39,7 @@ def send_borrow_email(user_email, book_title, due_date):
 
     Kenya Library Management System
     """
-    Thread(target=send_async_email, args=(app, msg)).start()
-
-def delayed_email_send(app, msg, delay):
-    time.sleep(delay) 
-    with app.app_context():
-        try:
-            mail.send(msg)
-        except Exception as e:
-            print(f"Failed to send reminder email: {str(e)}")
-
-    
-def schedule_reminder_email(user_email, book_title, due_date):
-    """Schedule an email reminder 2 days before the due date."""
-    reminder_date = due_date - timedelta(days=2)
-
-    if datetime.utcnow() > reminder_date:
-        return  # Don't send if past reminder date
-
-    app = current_app._get_current_object()  # Get Flask app context
-
-    msg = Message("⏳ Book Return Reminder!",
-                  recipients=[user_email])
-    msg.body = f"""
-    Hello,
-
-    This is a reminder that your borrowed book **"{book_title}"** is due on **{due_date.strftime('%Y-%m-%d')}**.
-    Please return it on time to avoid late fees.
-
-    Thank you!
-
-    Library Management System
-    """
-
-    delay_seconds = (reminder_date - datetime.utcnow()).total_seconds()
-    Thread(target=delayed_email_send, args=(app, msg, delay_seconds)).start()
+    queue_email([user_email], 'Book Borrowed Successfully', body, idempotency_key=f'borrow-email:{borrow_id}')
 
 
 @borrow_bp.route('/', methods=['POST'], strict_slashes=False)
@@ -95,10 +63,13 @@ def borrow_book():
         if not book:
             return jsonify({'msg': 'Book not found'}), 404
 
-        if book.available_copies < 1:
-            return jsonify({'msg': 'Book is currently unavailable'}), 400
-
         user_id = get_jwt_identity()
+        hold = ready_hold(user_id, book_id)
+        if book.available_copies < 1 and hold is None:
+            return jsonify({
+                'msg': 'Book is currently unavailable. Place a hold to be notified when a copy is free.',
+            }), 400
+
         claims = get_jwt()
         role = claims.get("role")
         user_email = claims.get("email")
@@ -108,8 +79,8 @@ def borrow_book():
         # print(f"Decoded JWT Email: {user_email}")
 
         if role == "member":
-            unpaid_debt = Debt.query.filter_by(user_id=user_id, paid=False).first()
-            if unpaid_debt:
+            _, unpaid_debts = get_balance(user_id)
+            if unpaid_debts:
                 return jsonify({
                     'msg': 'You have an unpaid debt. Please settle it before borrowing more books.',
                 }), 403
@@ -121,21 +92,30 @@ def borrow_book():
         borrow_date = datetime.now(kenya_tz).replace(microsecond=0)
         due_date = borrow_date + timedelta(days=BORROW_DAYS_LIMIT)
 
-        new_borrow = Borrow(
-            user_id=user_id,
-            book_id=book_id,
-            borrow_date=borrow_date,
-            due_date=due_date,
-            returned=False
-        )
-
-        book.available_copies -= 1
-        db.session.add(new_borrow)
-        db.session.commit()
-
-        send_borrow_email(user_email, book.title, due_date)
+        def create_borrow():
+            # A ready hold already has a copy set aside for this reader.
+            if hold is not None:
+                if not fulfil_hold(hold):
+                    raise OutOfStock()
+            elif not take_copy(book_id):
+                raise OutOfStock()
+            new_borrow = Borrow(
+                user_id=user_id,
+                book_id=book_id,
+                borrow_date=borrow_date,
+                due_date=due_date,
+                returned=False
+            )
+            db.session.add(new_borrow)
+            db.session.flush()
+            record_borrow(book_id, borrow_date)
+            send_borrow_email(new_borrow.id, user_email, book.title, due_date)
+            return new_borrow
 
-        schedule_reminder_email(user_email, book.title, due_date)
+        try:
+            run_in_transaction(create_borrow)
+        except OutOfStock:
+            return jsonify({'msg': 'Book is currently unavailable'}), 400
 
         return jsonify({
             'msg': f'Book "{book.title}" borrowed successfully!',
@@ -170,22 +150,23 @@ def return_book(book_id):
         overdue_days = max((return_date - borrow_record.due_date).days, 0)
         fine_amount = overdue_days * FINE_PER_DAY
 
-        borrow_record.return_date = return_date
-        borrow_record.fine = fine_amount
-        borrow_record.returned = True
-        book.available_copies += 1
-
-        if overdue_days > 0:
-            debt = Debt(
-                user_id=user_id,
-                book_id=book_id,
-                days_overdue=overdue_days,
-                fine_amount=fine_amount,
-                paid=False
+        def close_borrow():
+            result = db.session.execute(
+                update(Borrow)
+                .where(Borrow.id == borrow_record.id, Borrow.returned == False)
+                .values(returned=True, returned_at=return_date, fine=fine_amount)
+                .execution_options(synchronize_session=False)
             )
-            db.session.add(debt)
-
-        db.session.commit()
+            if result.rowcount != 1:
+                # A concurrent request already returned this borrow.
+                return False
+            release_copy(book_id)
+            charge_on_return(borrow_record, overdue_days)
+            record_return(return_date, overdue_days > 0)
+            return True
+
+        if not run_in_transaction(close_borrow):
+            return jsonify({'msg': 'Book already returned or Book never borrowed'}), 400
 
         return jsonify({
             'msg': f'Book \"{book.title}\" returned successfully!',
@@ -201,19 +182,16 @@ def return_book(book_id):
 @role_required('admin', 'librarian')
 def list_borrowed_books():
     try:
-        borrowed_books = Borrow.query.filter_by(returned=False).all()
-        if not borrowed_books:
+        fields = requested_fields(BORROW_FIELDS) or list(BORROW_FIELDS)
+        query = project(Borrow.query.filter_by(returned=False), Borrow, fields)
+        borrowed_books, next_cursor = keyset_page(query, [(Borrow.id, False)])
+        if not borrowed_books and not request.args.get('cursor'):
             return jsonify({'msg': 'No books are currently borrowed'}), 200
 
-        borrowed_list = [{
-            'borrow_id': b.id,
-            'user_id': b.user_id,
-            'book_id': b.book_id,
-            'borrow_date': b.borrow_date.strftime('%Y-%m-%d'),
-            'due_date': b.due_date.strftime('%Y-%m-%d'),
-            'returned': b.returned
-        } for b in borrowed_books]
+        borrowed_list = [{f: BORROW_FIELDS[f](b) for f in fields} for b in borrowed_books]
 
-        return jsonify(borrowed_list), 200
+        return with_cursor(jsonify(borrowed_list), next_cursor), 200
+    except PaginationError as e:
+        return jsonify({'msg': str(e)}), 400
     except Exception as e:
         return jsonify({'msg': str(e)}), 500
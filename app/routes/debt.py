@@ -1,69 +1,82 @@
 #!/usr/bin/env python3
 from flask import Blueprint, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from flask_jwt_extended import get_jwt_identity, get_jwt
+from app.utils.decorators import jwt_required, read_only
+from app.extensions import db
 from app.models import Debt
+from sqlalchemy import func
 from sqlalchemy.orm import joinedload
+from app.utils.fines import get_balance
+from app.utils.pagination import PaginationError, keyset_page, requested_fields, with_cursor
 
 debt_bp = Blueprint('debt', __name__)
+
+DEBT_FIELDS = ('book_title', 'days_overdue', 'fine_amount', 'paid', 'created_at', 'user')
+
 @debt_bp.route('/my-fines', methods=['GET'])
 @jwt_required()
+@read_only
 def get_user_fines():
     try:
         user_id = get_jwt_identity()
         claims = get_jwt()
         role = claims.get('role')
-
-        debts = []
-        total_fines = 0
+        fields = requested_fields(DEBT_FIELDS) or DEBT_FIELDS
 
         if role in ['admin', 'librarian']:
-            debts = Debt.query.options(
-                joinedload(Debt.user), joinedload(Debt.book)
-            ).order_by(Debt.created_at.desc()).all()
+            query = Debt.query
+            if 'user' in fields:
+                query = query.options(joinedload(Debt.user))
 
         elif role == 'member':
-            debts = Debt.query.options(joinedload(Debt.book)).filter_by(user_id=user_id).order_by(Debt.created_at.desc()).all()
+            query = Debt.query.filter_by(user_id=user_id)
 
         else:
             return jsonify({'error': 'Unauthorized access'}), 403
 
+        if 'book_title' in fields:
+            query = query.options(joinedload(Debt.book))
+
+        # Ids are assigned in created_at order, and unlike created_at the id is never NULL.
+        debts, next_cursor = keyset_page(query, [(Debt.id, True)])
+
         debt_list = []
 
         for debt in debts:
-            book = debt.book
-            user = debt.user
-
             debt_data = {
-                "book_title": book.title if book else "Unknown",
                 "days_overdue": debt.days_overdue,
                 "fine_amount": debt.fine_amount,
                 "paid": debt.paid,
                 "created_at": debt.created_at.strftime("%Y-%m-%d") if debt.created_at else None,
             }
 
-            if role == 'member':
-                if not debt.paid:
-                    total_fines += debt.fine_amount
+            if 'book_title' in fields:
+                book = debt.book
+                debt_data["book_title"] = book.title if book else "Unknown"
 
-            if role in ['admin', 'librarian'] and user:
+            if role in ['admin', 'librarian'] and 'user' in fields and debt.user:
+                user = debt.user
                 debt_data["user"] = {
                     "id": user.id,
                     "email": user.email,
                     "name": user.name,
                 }
 
-            debt_list.append(debt_data)
+            debt_list.append({k: v for k, v in debt_data.items() if k in fields})
 
         response = {
-            "debts": debt_list
+            "debts": debt_list,
+            "next_cursor": next_cursor
         }
 
         if role == 'member':
-            response["total_fines"] = total_fines
+            response["total_fines"], _ = get_balance(user_id)
         else:
-            response["total_debts"] = len(debt_list)
+            response["total_debts"] = db.session.query(func.count(Debt.id)).scalar()
 
-        return jsonify(response), 200
+        return with_cursor(jsonify(response), next_cursor), 200
 
+    except PaginationError as e:
+        return jsonify({'msg': str(e)}), 400
     except Exception as e:
         return jsonify({'msg': f"Error fetching fines: {str(e)}"}), 500
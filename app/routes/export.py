@@ -1,40 +1,52 @@
 #!/usr/bin/env python3
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt
+from flask_jwt_extended import get_jwt
+from app.utils.decorators import jwt_required, read_only
 from app.exports.exporter import export_to_csv, export_to_excel
+from app.extensions import db
 from app.models import Book, User, Borrow, Debt
 from sqlalchemy.exc import SQLAlchemyError
+from itertools import chain
 import logging
 
 export_bp = Blueprint("export", __name__)
 
 logger = logging.getLogger(__name__)
 
+EXPORT_BATCH_SIZE = 1000
+
 def is_admin_or_librarian():
     role = get_jwt().get('role')
     return role in ["admin", "librarian"]
 
-def handle_export(data, columns, format, filename):
-    if not data:
+def stream_rows(query, to_row):
+    # yield_per keeps a server-side cursor open and only holds one batch of rows at a time.
+    for item in query.yield_per(EXPORT_BATCH_SIZE):
+        yield to_row(item)
+
+def handle_export(rows, columns, format, name):
+    if format not in ('excel', 'csv'):
+        return jsonify({'msg': 'Invalid format'}), 400
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
         return jsonify({'msg': 'No record found to export'}), 404
+    rows = chain([first], rows)
     if format == 'excel':
-        return export_to_excel(data, columns, filename)
-    elif format == 'csv':
-        return export_to_csv(data, columns, filename)
-    else:
-        return jsonify({'msg': 'Invalid format'}), 400
+        return export_to_excel(rows, columns, f'{name}.xlsx')
+    return export_to_csv(rows, columns, f'{name}.csv')
     
 
 @export_bp.route('/books/<string:format>', methods=['GET'])
 @jwt_required()
+@read_only
 def export_books(format):
     if not is_admin_or_librarian():
         return jsonify({'msg': 'Access denied'}), 403
     try:
-        books = Book.query.all()
-        data = [[b.id, b.title, b.author, b.category, b.total_copies, b.available_copies] for b in books]
+        data = stream_rows(Book.query.order_by(Book.id), lambda b: [b.id, b.title, b.author, b.category, b.total_copies, b.available_copies])
         columns = ['ID', 'Title', 'Author', 'Category', 'Total Copies', 'Available Copies']
-        return handle_export(data, columns, format, 'books.xlsx')
+        return handle_export(data, columns, format, 'books')
     
     except SQLAlchemyError as e:
         logger.exception('Error exporting books')
@@ -42,14 +54,14 @@ def export_books(format):
     
 @export_bp.route('/members/<string:format>', methods=['GET'])
 @jwt_required()
+@read_only
 def export_members(format):
     if not is_admin_or_librarian():
         return jsonify({'msg': 'Access denied'}), 403
     try:
-        users = User.query.all()
-        data = [[u.id, u.name, u.email, u.role] for u in users]
+        data = stream_rows(User.query.order_by(User.id), lambda u: [u.id, u.name, u.email, u.role])
         columns = ['ID', 'Name', 'Email', 'Role']
-        return handle_export(data, columns, format, 'members.xlsx')
+        return handle_export(data, columns, format, 'members')
     
     except SQLAlchemyError as e:
         logger.exception('Error exporting members')
@@ -57,28 +69,34 @@ def export_members(format):
     
 @export_bp.route('/borrows/<string:format>', methods=['GET'])
 @jwt_required()
+@read_only
 def export_borrows(format):
     if not is_admin_or_librarian():
         return jsonify({'msg': 'Access denied'}), 403
     try:
-        borrows = Borrow.query.all()
-        data = [[b.id, b.user.name if b.user else 'Unknown', b.book.title if b.book else 'Unknown', b.borrow_date.strftime('%Y-%m-%d'), b.due_date.strftime('%Y-%m-%d'), b.returned] for b in borrows]
+        query = db.session.query(
+            Borrow.id, User.name, Book.title, Borrow.borrow_date, Borrow.due_date, Borrow.returned
+        ).outerjoin(User, Borrow.user_id == User.id).outerjoin(Book, Borrow.book_id == Book.id).order_by(Borrow.id)
+        data = stream_rows(query, lambda b: [b.id, b.name or 'Unknown', b.title or 'Unknown', b.borrow_date.strftime('%Y-%m-%d'), b.due_date.strftime('%Y-%m-%d'), b.returned])
         columns = ['ID', 'User', 'Book', 'Borrow Date', 'Due Date', 'Returned']
-        return handle_export(data, columns, format, 'borrows.xlsx')
+        return handle_export(data, columns, format, 'borrows')
     except SQLAlchemyError as e:
         logger.exception('Error exporting borrows')
         return jsonify({'msg': 'Failed to export borrows', 'error': str(e)}), 500
 
 @export_bp.route('/fines/<string:format>', methods=['GET'])
 @jwt_required()
+@read_only
 def export_fines(format):
     if not is_admin_or_librarian():
         return jsonify({'msg': 'Access denied'}), 403
     try:
-        debts = Debt.query.all()
-        data = [[d.id, d.user.name if d.user else 'Unknown', d.user.email if d.user else 'Unknown', d.book.title if d.book else 'Unknown', d.days_overdue, d.fine_amount, "Yes" if d.paid else "No"] for d in debts]
+        query = db.session.query(
+            Debt.id, User.name, User.email, Book.title, Debt.days_overdue, Debt.fine_amount, Debt.paid
+        ).outerjoin(User, Debt.user_id == User.id).outerjoin(Book, Debt.book_id == Book.id).order_by(Debt.id)
+        data = stream_rows(query, lambda d: [d.id, d.name or 'Unknown', d.email or 'Unknown', d.title or 'Unknown', d.days_overdue, d.fine_amount, "Yes" if d.paid else "No"])
         columns = ['ID', 'User', 'Email', 'Book', 'Days Overdue', 'Fine', 'Paid']
-        return handle_export(data, columns, format, 'fines.xlsx')
+        return handle_export(data, columns, format, 'fines')
     except SQLAlchemyError as e:
         logger.exception('Error exporting fines')
         return jsonify({'msg': 'Failed to export fines', 'error': str(e)}), 500
\ No newline at end of file
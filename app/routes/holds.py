@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from flask_jwt_extended import get_jwt_identity
+from app.extensions import db
+from app.models import Hold
+from app.utils.decorators import jwt_required, role_required
+from app.utils.holds import (ACTIVE, WAITING, HoldError, cancel_hold, parse_event_id, place_hold,
+                             queue_position, stream_events)
+
+holds_bp = Blueprint('holds', __name__)
+
+
+def serialize_hold(hold):
+    return {
+        'id': hold.id,
+        'book_id': hold.book_id,
+        'title': hold.book.title if hold.book else None,
+        'status': hold.status,
+        'position': queue_position(hold) if hold.status == WAITING else None,
+        'created_at': hold.created_at.isoformat(),
+        'expires_at': hold.expires_at.isoformat() if hold.expires_at else None,
+    }
+
+
+@holds_bp.route('/', methods=['POST'], strict_slashes=False)
+@jwt_required()
+@role_required('member', 'admin', 'librarian')
+def create_hold():
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not data.get('book_id'):
+            return jsonify({'msg': 'Book ID is required'}), 400
+        hold = place_hold(int(get_jwt_identity()), data['book_id'])
+        db.session.commit()
+        return jsonify(serialize_hold(hold)), 201
+    except HoldError as e:
+        db.session.rollback()
+        return jsonify({'msg': str(e)}), e.status
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'msg': str(e)}), 500
+
+
+@holds_bp.route('/', methods=['GET'], strict_slashes=False)
+@jwt_required()
+def list_holds():
+    try:
+        holds = (
+            Hold.query.filter(Hold.user_id == int(get_jwt_identity()), Hold.status.in_(ACTIVE))
+            .order_by(Hold.id).all()
+        )
+        return jsonify([serialize_hold(h) for h in holds]), 200
+    except Exception as e:
+        return jsonify({'msg': str(e)}), 500
+
+
+@holds_bp.route('/<int:hold_id>', methods=['DELETE'])
+@jwt_required()
+def delete_hold(hold_id):
+    try:
+        cancel_hold(int(get_jwt_identity()), hold_id)
+        db.session.commit()
+        return jsonify({'msg': 'Hold cancelled'}), 200
+    except HoldError as e:
+        db.session.rollback()
+        return jsonify({'msg': str(e)}), e.status
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'msg': str(e)}), 500
+
+
+@holds_bp.route('/stream', methods=['GET'])
+@jwt_required()
+def hold_stream():
+    cursor = parse_event_id(request.headers.get('Last-Event-ID'))
+    return Response(
+        stream_with_context(stream_events(int(get_jwt_identity()), cursor)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
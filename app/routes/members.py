@@ -1,28 +1,92 @@
 #!/usr/bin/env python3
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from app.extensions import db
 from app.models import User
 from app.schemas.user import UserSchema
-from flask_jwt_extended import jwt_required
-from app.utils.decorators import role_required
+from app.utils.decorators import jwt_required, role_required
 from sqlalchemy.exc import IntegrityError
+from app.utils.bulk_import import BulkImportError, detect_format, import_members, read_records, update_members
+from app.utils.pagination import PaginationError, keyset_page, project, requested_fields, with_cursor
 
 members_bp = Blueprint('members', __name__)
 user_schema = UserSchema()
 users_schema = UserSchema(many=True)
 
+MEMBER_FIELDS = ('id', 'name', 'email', 'role')
+
 
 @members_bp.route('/', methods=['GET'])
 @jwt_required()
 @role_required('admin', 'librarian')
 def get_members():
     try:
-        members = User.query.filter(User.role != 'admin').all()
-        return jsonify(users_schema.dump(members)), 200
+        fields = requested_fields(MEMBER_FIELDS)
+        query = project(User.query.filter(User.role != 'admin'), User, fields)
+        members, next_cursor = keyset_page(query, [(User.id, False)])
+        schema = UserSchema(many=True, only=fields) if fields else users_schema
+        return with_cursor(jsonify(schema.dump(members)), next_cursor), 200
+    except PaginationError as e:
+        return jsonify({'msg': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@members_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+@role_required('admin')
+def bulk_import_members():
+    try:
+        fmt = detect_format(request.args.get('format'), request.content_type)
+        offset = request.args.get('offset', 0, type=int)
+        chunk_size = request.args.get('chunk_size', current_app.config['BULK_IMPORT_CHUNK_SIZE'], type=int)
+        if offset < 0 or chunk_size < 1:
+            return jsonify({'msg': 'offset must be >= 0 and chunk_size >= 1'}), 400
+
+        report, error = import_members(read_records(request.stream, fmt), offset=offset, chunk_size=chunk_size)
+        if error is not None:
+            return jsonify(report.as_dict(msg='Import stopped; resume from resume_offset', error=str(error))), 500
+        return jsonify(report.as_dict(msg='Import finished')), 200
+    except BulkImportError as e:
+        return jsonify({'msg': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'msg': 'An error occurred', 'error': str(e)}), 500
+
+
+@members_bp.route('/bulk', methods=['PATCH'])
+@jwt_required()
+@role_required('admin')
+def bulk_update_members():
+    try:
+        data = request.get_json()
+        if not isinstance(data, dict):
+            return jsonify({'msg': 'Invalid request format'}), 400
+        if 'ids' in data:
+            # Same change for many members, e.g. {"ids": [...], "set": {"role": "librarian"}}
+            ids, values = data.get('ids'), data.get('set')
+            if not isinstance(ids, list) or not isinstance(values, dict):
+                return jsonify({'msg': 'ids must be a list and set an object'}), 400
+            if set(values) - {'role'}:
+                return jsonify({'msg': 'Only role can be set for many members at once'}), 400
+            changes = [dict(values, id=user_id) for user_id in ids]
+        else:
+            changes = data.get('updates')
+            if not isinstance(changes, list):
+                return jsonify({'msg': 'Provide updates: [{id, name|email|role}, ...] or ids + set'}), 400
+        if len(changes) > current_app.config['BULK_UPDATE_MAX_ROWS']:
+            return jsonify({'msg': f"At most {current_app.config['BULK_UPDATE_MAX_ROWS']} members per request"}), 400
+
+        updated, errors = update_members(changes)
+        db.session.commit()
+        return jsonify({'updated': updated, 'failed': len(errors), 'errors': errors}), 200
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'msg': 'Name or email already in use'}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'msg': 'An error occurred', 'error': str(e)}), 500
+
+
 @members_bp.route('/<int:user_id>', methods=['GET'])
 @jwt_required()
 @role_required('admin', 'librarian')
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+import hmac
+from flask import Blueprint, Response, current_app, jsonify, request
+from app.utils.metrics import CONTENT_TYPE, render_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('', methods=['GET'])
+def metrics():
+    if current_app.extensions.get('metrics') is None:
+        return jsonify({'msg': 'Metrics are disabled'}), 404
+    token = current_app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'msg': 'Unauthorized'}), 401
+    try:
+        return Response(render_metrics(), content_type=CONTENT_TYPE)
+    except Exception as e:
+        current_app.logger.exception('Rendering metrics failed')
+        return jsonify({'msg': str(e)}), 500
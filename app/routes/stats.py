@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+from datetime import date, datetime, timedelta
+from flask import Blueprint, request, jsonify
+from app.utils.decorators import jwt_required, role_required
+from app.utils import stats
+
+stats_bp = Blueprint('stats', __name__)
+
+DEFAULT_RANGE_DAYS = 30
+MAX_RANGE_DAYS = 366
+MAX_TOP = 100
+
+
+def _parse_day(name, default):
+    value = request.args.get(name)
+    if not value:
+        return default
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+@stats_bp.route('/', methods=['GET'], strict_slashes=False)
+@jwt_required()
+@role_required('admin', 'librarian')
+def dashboard():
+    try:
+        try:
+            end = _parse_day('to', date.today())
+            start = _parse_day('from', end - timedelta(days=DEFAULT_RANGE_DAYS - 1))
+            top = min(max(int(request.args.get('top', 10)), 1), MAX_TOP)
+        except ValueError:
+            return jsonify({'msg': 'from/to must be YYYY-MM-DD and top an integer'}), 400
+        if start > end:
+            return jsonify({'msg': '"from" must not be after "to"'}), 400
+        if (end - start).days >= MAX_RANGE_DAYS:
+            return jsonify({'msg': f'Range is limited to {MAX_RANGE_DAYS} days'}), 400
+
+        days = stats.circulation(start, end)
+        totals = {name: sum(day[name] for day in days) for name in stats.DAILY_COUNTERS}
+        return jsonify({
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'totals': totals,
+            'borrows_per_day': days,
+            'top_titles': stats.top_titles(start, end, top),
+            'overdue_open': stats.open_overdue(),
+            'fines_collected': totals['fines_collected'],
+            'utilization': stats.utilization(),
+        }), 200
+    except Exception as e:
+        return jsonify({'msg': str(e)}), 500
@@ -6,6 +6,7 @@ class BookSchema(ma.Schema):
     id = fields.Int(dump_only=True)
     title = fields.Str(required=True, validate=validate.Length(min=1))
     author = fields.Str(required=True, validate=validate.Length(min=1))
+    isbn = fields.Str(validate=validate.Length(min=10, max=17))
     category = fields.Str()
     total_copies = fields.Int(required=True, validate=validate.Range(min=1))
     available_copies = fields.Int(dump_only=True)
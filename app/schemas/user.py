@@ -2,8 +2,20 @@
 from app.extensions import ma
 from marshmallow import fields, validate
 
+EMAIL_REGEX = r'^[a-zA-Z0-9_.+]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$'
+NAME_REGEX = r'^[a-zA-Z0-9-_ ]+$'
+PASSWORD_REGEX = r"^(?=.*[A-Za-z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{8,}$"
+PASSWORD_MESSAGE = ('Password must be at least 8 characters long, include one letter, '
+                    'one number, and one special character (@$!%*?&)')
+
 class UserSchema(ma.Schema):
     id = fields.Int(dump_only=True)
     name = fields.Str(required=True, validate=validate.Length(min=1))
     email = fields.Email(required=True)
     role = fields.Str(validate=validate.OneOf(["member", "librarian", "admin"]))
+
+class MemberImportSchema(ma.Schema):
+    name = fields.Str(required=True, validate=validate.Regexp(NAME_REGEX, error='Invalid username format'))
+    email = fields.Str(required=True, validate=validate.Regexp(EMAIL_REGEX, error='Invalid email format'))
+    password = fields.Str(required=True, load_only=True, validate=validate.Regexp(PASSWORD_REGEX, error=PASSWORD_MESSAGE))
+    role = fields.Str(load_default='member', validate=validate.OneOf(["member", "librarian"]))
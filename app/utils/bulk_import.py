@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+import csv
+import io
+import json
+import re
+from itertools import islice
+from marshmallow import EXCLUDE, ValidationError
+from sqlalchemy import bindparam, insert, select, tuple_, update
+from app.extensions import db
+from app.models import Book, User
+from app.schemas.book import BookSchema
+from app.schemas.user import MemberImportSchema, UserSchema
+from app.utils.holds import promote_waiting
+from app.utils.password_hasher import password_hasher
+from app.utils.response_cache import mark_stale
+from app.utils.search_index import index_books
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+FORMATS = {'csv': 'csv', 'text/csv': 'csv', 'jsonl': 'jsonl', 'ndjson': 'jsonl',
+           'application/x-ndjson': 'jsonl', 'application/jsonl': 'jsonl', 'application/json-lines': 'jsonl'}
+
+ISBN_REGEX = re.compile(r'^(\d{9}[\dX]|\d{13})$')
+
+
+class BulkImportError(ValueError):
+    pass
+
+
+def detect_format(requested, content_type):
+    fmt = FORMATS.get((requested or '').lower()) or FORMATS.get((content_type or '').split(';')[0].strip().lower())
+    if fmt is None:
+        raise BulkImportError('Send text/csv or application/x-ndjson, or pass ?format=csv|jsonl')
+    return fmt
+
+
+def read_records(stream, fmt):
+    """Yield ``(record, parse_error)`` per data row without reading the whole body into memory."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        for record in csv.DictReader(text):
+            yield record, None
+        return
+    for line in text:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield None, {'_line': [f'Invalid JSON: {e}']}
+            continue
+        if not isinstance(record, dict):
+            yield None, {'_line': ['Each line must be a JSON object']}
+            continue
+        yield record, None
+
+
+def clean_record(record):
+    # CSV gives '' for missing cells; treat them like absent JSON keys.
+    return {k.strip(): v.strip() if isinstance(v, str) else v
+            for k, v in record.items() if k and v not in ('', None)}
+
+
+def normalize_isbn(value):
+    return re.sub(r'[\s-]', '', str(value)).upper() if value else None
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ImportReport:
+    def __init__(self, offset):
+        self.offset = offset
+        self.processed = offset
+        self.inserted = self.updated = 0
+        self.errors = []
+        self.error_count = 0
+
+    def add_error(self, row, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'errors': errors})
+
+    def checkpoint(self):
+        return self.inserted, self.updated, self.error_count, len(self.errors)
+
+    def restore(self, checkpoint):
+        self.inserted, self.updated, self.error_count, reported = checkpoint
+        del self.errors[reported:]
+
+    def as_dict(self, **extra):
+        return {
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'failed': self.error_count,
+            'errors': sorted(self.errors, key=lambda e: e['row']),
+            'errors_truncated': self.error_count > len(self.errors),
+            'resume_offset': self.processed,
+            **extra,
+        }
+
+
+def validate_books(batch, report):
+    """Validate ``[(row_number, record, parse_error)]`` with BookSchema; return ``[(row, data)]``."""
+    schema = BookSchema(many=True, unknown=EXCLUDE)
+    rows, records = [], []
+    for row, record, parse_error in batch:
+        if parse_error:
+            report.add_error(row, parse_error)
+        else:
+            rows.append(row)
+            records.append(clean_record(record))
+    try:
+        loaded, errors = schema.load(records), {}
+    except ValidationError as e:
+        # With many=True, valid_data still holds every row, in input order.
+        loaded, errors = e.valid_data, e.messages
+    valid = []
+    for i, (row, data) in enumerate(zip(rows, loaded)):
+        row_errors = dict(errors.get(i, {}))
+        data['isbn'] = normalize_isbn(data.get('isbn'))
+        if data['isbn'] and not ISBN_REGEX.match(data['isbn']):
+            row_errors['isbn'] = ['Not a valid ISBN-10 or ISBN-13.']
+        if row_errors:
+            report.add_error(row, row_errors)
+        else:
+            valid.append((row, data))
+    return valid
+
+
+def natural_key(data):
+    if data['isbn']:
+        return ('isbn', data['isbn'])
+    return ('title_author', data['title'], data['author'])
+
+
+def _select_books(keys):
+    """Fetch the catalog rows matching the given natural keys, keyed the same way."""
+    isbns = [k[1] for k in keys if k[0] == 'isbn']
+    pairs = [(k[1], k[2]) for k in keys if k[0] == 'title_author']
+    columns = (Book.id, Book.isbn, Book.title, Book.author, Book.category,
+               Book.total_copies, Book.available_copies)
+    found = {}
+    if isbns:
+        for row in db.session.execute(select(*columns).where(Book.isbn.in_(isbns))):
+            found[('isbn', row.isbn)] = row
+    if pairs:
+        # Oldest match wins if the catalog already holds duplicates.
+        stmt = (
+            select(*columns)
+            .where(Book.isbn.is_(None), tuple_(Book.title, Book.author).in_(pairs))
+            .order_by(Book.id.desc())
+        )
+        for row in db.session.execute(stmt):
+            found[('title_author', row.title, row.author)] = row
+    return found
+
+
+def upsert_books(rows, report):
+    """Insert new books and update existing ones with one executemany each. Caller commits."""
+    by_key = {}
+    for row, data in rows:
+        # Last occurrence of a key in the chunk wins.
+        by_key[natural_key(data)] = (row, data)
+    existing = _select_books(list(by_key))
+
+    inserts, updates, restocked = [], [], []
+    for key, (row, data) in by_key.items():
+        current = existing.get(key)
+        if current is None:
+            inserts.append({
+                'isbn': data['isbn'], 'title': data['title'], 'author': data['author'],
+                'category': data.get('category'), 'total_copies': data['total_copies'],
+                'available_copies': data['total_copies'],
+            })
+        elif data['total_copies'] < current.total_copies - current.available_copies:
+            report.add_error(row, {'total_copies': ['Fewer than the copies currently on loan.']})
+        else:
+            updates.append({
+                'b_id': current.id, 'b_title': data['title'], 'b_author': data['author'],
+                'b_category': data.get('category'), 'b_total': data['total_copies'],
+            })
+            if data['total_copies'] > current.total_copies:
+                restocked.append(current.id)
+
+    table = Book.__table__
+    if inserts:
+        db.session.execute(insert(table), inserts)
+    if updates:
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam('b_id'),
+                   table.c.total_copies - table.c.available_copies <= bindparam('b_total'))
+            .values(title=bindparam('b_title'), author=bindparam('b_author'),
+                    category=bindparam('b_category'), total_copies=bindparam('b_total'),
+                    available_copies=table.c.available_copies + bindparam('b_total') - table.c.total_copies),
+            updates,
+        )
+    if inserts or updates:
+        # Core statements skip the ORM flush hooks, so index and invalidate here.
+        index_books(db.session.connection(), list(_select_books(list(by_key)).values()))
+        mark_stale(db.session)
+    for book_id in restocked:
+        # New copies go to readers already waiting, as update_book does.
+        promote_waiting(book_id)
+    report.inserted += len(inserts)
+    report.updated += len(updates)
+
+
+def run_import(records, import_chunk, offset=0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Feed ``read_records`` output to ``import_chunk`` in chunks, committing once per chunk.
+
+    Rows before ``offset`` are skipped so a failed import can be resumed from the
+    ``resume_offset`` of its report. Returns ``(report, error)`` where ``error``
+    is the database exception that stopped the import, if any.
+    """
+    report = ImportReport(offset)
+    numbered = ((n, record, parse_error) for n, (record, parse_error) in enumerate(records, start=1))
+    for batch in chunked(islice(numbered, offset, None), chunk_size):
+        checkpoint = report.checkpoint()
+        try:
+            import_chunk(batch, report)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            report.restore(checkpoint)
+            return report, e
+        report.processed = batch[-1][0]
+    return report, None
+
+
+def import_books(records, offset=0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Upsert books by ISBN, or title+author when there is none."""
+    return run_import(records, lambda batch, report: upsert_books(validate_books(batch, report), report),
+                      offset, chunk_size)
+
+
+def validate_members(batch, report, seen):
+    """Validate member rows and drop names/emails already used earlier in the file."""
+    schema = MemberImportSchema(many=True, unknown=EXCLUDE)
+    rows, records = [], []
+    for row, record, parse_error in batch:
+        if parse_error:
+            report.add_error(row, parse_error)
+        else:
+            rows.append(row)
+            records.append(clean_record(record))
+    try:
+        loaded, errors = schema.load(records), {}
+    except ValidationError as e:
+        loaded, errors = e.valid_data, e.messages
+    valid = []
+    for i, (row, data) in enumerate(zip(rows, loaded)):
+        row_errors = dict(errors.get(i, {}))
+        if not row_errors:
+            data['email'] = data['email'].lower()
+            # Compared case-insensitively, like MySQL's default collation compares them.
+            if data['name'].lower() in seen['name']:
+                row_errors['name'] = ['Duplicate name earlier in the file.']
+            if data['email'] in seen['email']:
+                row_errors['email'] = ['Duplicate email earlier in the file.']
+        if row_errors:
+            report.add_error(row, row_errors)
+            continue
+        seen['name'].add(data['name'].lower())
+        seen['email'].add(data['email'])
+        valid.append((row, data))
+    return valid
+
+
+def insert_members(rows, report):
+    """Skip names/emails already in the DB, hash passwords on the bulk pool and insert the rest."""
+    # A case-insensitive collation matches 'Alice' for 'alice', so compare lowered values.
+    names = select(User.name).where(User.name.in_([d['name'] for _, d in rows]))
+    emails = select(User.email).where(User.email.in_([d['email'] for _, d in rows]))
+    taken_names = {name.lower() for name in db.session.scalars(names)}
+    taken_emails = {email.lower() for email in db.session.scalars(emails)}
+    fresh = []
+    for row, data in rows:
+        row_errors = {}
+        if data['name'].lower() in taken_names:
+            row_errors['name'] = ['Username already exists']
+        if data['email'] in taken_emails:
+            row_errors['email'] = ['Email already registered']
+        if row_errors:
+            report.add_error(row, row_errors)
+        else:
+            fresh.append(data)
+    if not fresh:
+        return
+    hashes = password_hasher.hash_many([d['password'] for d in fresh])
+    db.session.execute(insert(User.__table__), [
+        {'name': d['name'], 'email': d['email'], 'role': d['role'], 'password_hash': h}
+        for d, h in zip(fresh, hashes)
+    ])
+    report.inserted += len(fresh)
+
+
+def import_members(records, offset=0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Create members in bulk. Existing names/emails are reported per row, never overwritten."""
+    # Names/emails seen before the resume offset were committed and are caught by the DB check.
+    seen = {'name': set(), 'email': set()}
+    return run_import(records, lambda batch, report: insert_members(validate_members(batch, report, seen), report),
+                      offset, chunk_size)
+
+
+MEMBER_UPDATE_FIELDS = ('name', 'email', 'role')
+
+
+def update_members(changes):
+    """Apply ``[{'id': .., 'role'|'name'|'email': ..}, ...]`` with one executemany per field set.
+
+    Admin accounts are never touched. Returns ``(updated, errors)``; the caller commits.
+    """
+    schema = UserSchema(partial=True)
+    errors = []
+    valid = {}
+    for i, change in enumerate(changes):
+        if not isinstance(change, dict) or not isinstance(change.get('id'), int):
+            errors.append({'index': i, 'errors': {'id': ['An integer id is required.']}})
+            continue
+        values = {k: v for k, v in change.items() if k in MEMBER_UPDATE_FIELDS}
+        row_errors = schema.validate(values)
+        if not values:
+            row_errors['_schema'] = [f"Nothing to update; allowed fields: {', '.join(MEMBER_UPDATE_FIELDS)}"]
+        elif values.get('role') == 'admin':
+            row_errors['role'] = ['Members cannot be promoted to admin in bulk.']
+        if 'email' in values and not row_errors:
+            values['email'] = values['email'].lower()
+        if change['id'] in valid:
+            row_errors['id'] = ['Member listed more than once in this batch.']
+        if row_errors:
+            errors.append({'index': i, 'id': change.get('id'), 'errors': row_errors})
+        else:
+            valid[change['id']] = (i, values)
+
+    editable = set(db.session.scalars(select(User.id).where(User.id.in_(list(valid)), User.role != 'admin'))) if valid else set()
+    for user_id in [u for u in valid if u not in editable]:
+        i, _ = valid.pop(user_id)
+        errors.append({'index': i, 'id': user_id, 'errors': {'id': ['Member not found or not editable.']}})
+
+    for field in ('name', 'email'):
+        wanted = {}
+        for user_id, (i, values) in list(valid.items()):
+            if field not in values:
+                continue
+            if values[field].lower() in wanted:
+                valid.pop(user_id)
+                errors.append({'index': i, 'id': user_id, 'errors': {field: [f'Same {field} given twice in this batch.']}})
+            else:
+                wanted[values[field].lower()] = (values[field], user_id)
+        if not wanted:
+            continue
+        column = getattr(User, field)
+        clashes = db.session.execute(select(User.id, column).where(column.in_([v for v, _ in wanted.values()]))).all()
+        for other_id, value in clashes:
+            user_id = wanted[value.lower()][1]
+            if other_id != user_id and user_id in valid:
+                i, _ = valid.pop(user_id)
+                errors.append({'index': i, 'id': user_id, 'errors': {field: [f'{field.capitalize()} already in use.']}})
+
+    groups = {}
+    for user_id, (_, values) in valid.items():
+        groups.setdefault(tuple(sorted(values)), []).append(dict({f'u_{k}': v for k, v in values.items()}, u_id=user_id))
+    table = User.__table__
+    for fields, params in groups.items():
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam('u_id'), table.c.role != 'admin')
+            .values({f: bindparam(f'u_{f}') for f in fields}),
+            params,
+        )
+    return len(valid), sorted(errors, key=lambda e: e['index'])
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+import hmac
+import heapq
+import time
+from datetime import datetime, timedelta
+from threading import Lock
+from flask import current_app
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import VerificationCode
+
+DB_SWEEP_INTERVAL = 60
+
+
+class MemoryCodeStore:
+    """Per-process code store with a bounded size and heap-ordered expiry.
+
+    Only suitable for a single worker process; use the database backend when
+    requests can land on different workers.
+    """
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self._codes = {}
+        self._expiry = []
+        self._lock = Lock()
+
+    def _sweep(self, now):
+        # Heap entries can be stale after a key is overwritten; only drop ones that still match.
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expiry)
+            entry = self._codes.get(key)
+            if entry and entry[1] == expires_at:
+                del self._codes[key]
+
+    def put(self, key, code, ttl):
+        now = time.monotonic()
+        expires_at = now + ttl
+        with self._lock:
+            self._sweep(now)
+            while len(self._codes) >= self.max_size and key not in self._codes and self._expiry:
+                # Full of live codes: evict the one closest to expiring.
+                _, victim = heapq.heappop(self._expiry)
+                self._codes.pop(victim, None)
+            self._codes[key] = (str(code), expires_at)
+            heapq.heappush(self._expiry, (expires_at, key))
+            if len(self._expiry) > 2 * self.max_size:
+                self._expiry = [(e, k) for e, k in self._expiry if self._codes.get(k, (None, None))[1] == e]
+                heapq.heapify(self._expiry)
+
+    def verify(self, key, code):
+        with self._lock:
+            self._sweep(time.monotonic())
+            entry = self._codes.get(key)
+        return entry is not None and hmac.compare_digest(entry[0], str(code))
+
+    def consume(self, key, code):
+        """Verify and delete in one step, so a code can only be used once."""
+        with self._lock:
+            self._sweep(time.monotonic())
+            entry = self._codes.get(key)
+            if entry is None or not hmac.compare_digest(entry[0], str(code)):
+                return False
+            del self._codes[key]
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._codes.pop(key, None)
+
+    def __len__(self):
+        return len(self._codes)
+
+
+class DatabaseCodeStore:
+    """Code store backed by the verification_codes table, shared by every worker.
+
+    ``put`` and ``delete`` only flush, so a new code commits together with the
+    caller's email job. ``consume`` commits on its own connection: a code must
+    stay used whatever the request does afterwards.
+    """
+
+    def __init__(self):
+        self._last_sweep = 0.0
+        self._lock = Lock()
+
+    def _maybe_sweep(self, now):
+        with self._lock:
+            if time.monotonic() - self._last_sweep < DB_SWEEP_INTERVAL:
+                return
+            self._last_sweep = time.monotonic()
+        db.session.execute(delete(VerificationCode).where(VerificationCode.expires_at <= now))
+
+    def put(self, key, code, ttl):
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=ttl)
+        self._maybe_sweep(now)
+        values = {'code': str(code), 'expires_at': expires_at}
+        result = db.session.execute(
+            update(VerificationCode).where(VerificationCode.email == key).values(**values)
+        )
+        if result.rowcount == 0:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(VerificationCode(email=key, **values))
+            except IntegrityError:
+                # Another worker inserted the same email first; overwrite it.
+                db.session.execute(update(VerificationCode).where(VerificationCode.email == key).values(**values))
+        db.session.flush()
+
+    def verify(self, key, code):
+        entry = db.session.get(VerificationCode, key)
+        return (entry is not None and entry.expires_at > datetime.utcnow()
+                and hmac.compare_digest(entry.code, str(code)))
+
+    def consume(self, key, code):
+        """Verify and delete in one statement, so a code can only be used once."""
+        with db.engine.begin() as connection:
+            result = connection.execute(
+                delete(VerificationCode).where(
+                    VerificationCode.email == key,
+                    VerificationCode.code == str(code),
+                    VerificationCode.expires_at > datetime.utcnow(),
+                )
+            )
+        return result.rowcount == 1
+
+    def delete(self, key):
+        db.session.execute(delete(VerificationCode).where(VerificationCode.email == key))
+        db.session.flush()
+
+
+def init_code_store(app):
+    backend = app.config['VERIFICATION_CODE_BACKEND']
+    if backend == 'memory':
+        store = MemoryCodeStore(max_size=app.config['VERIFICATION_CODE_MAX_ENTRIES'])
+    elif backend == 'database':
+        store = DatabaseCodeStore()
+    else:
+        raise ValueError(f'Unknown VERIFICATION_CODE_BACKEND: {backend}')
+    app.extensions['code_store'] = store
+    return store
+
+
+def get_code_store():
+    return current_app.extensions['code_store']
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+import logging
+import time
+from threading import Lock
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.sql import Select
+
+logger = logging.getLogger(__name__)
+
+READ_ONLY = 'read_only'
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    """Sends SELECTs issued inside read_only views to the replica while it is healthy.
+
+    Everything else (writes, flushes, raw text statements, and any query
+    outside a read_only view) uses the normal Flask-SQLAlchemy bind lookup.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get(READ_ONLY) and isinstance(clause, Select) and not self._flushing:
+            monitor = current_app.extensions.get('replica_monitor')
+            if monitor is not None and monitor.route():
+                return monitor.engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaMonitor:
+    """Tracks whether the replica is reachable and within ``max_lag`` seconds of the primary.
+
+    Lag is measured at most once per ``check_interval``; in between, routing
+    decisions reuse the last result.
+    """
+
+    def __init__(self, engine, max_lag=5.0, check_interval=2.0):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.healthy = True
+        self.last_lag = None
+        self._checked_at = float('-inf')
+        self._lock = Lock()
+        self.replica_reads = 0
+        self.primary_fallbacks = 0
+
+    def measure_lag(self):
+        """Seconds the replica is behind, 0 when it is not replicating, inf when replication is broken."""
+        dialect = self.engine.dialect.name
+        with self.engine.connect() as connection:
+            if dialect == 'mysql':
+                try:
+                    row = connection.execute(text('SHOW REPLICA STATUS')).mappings().first()
+                except Exception:
+                    # Servers older than 8.0.22.
+                    row = connection.execute(text('SHOW SLAVE STATUS')).mappings().first()
+                if row is None:
+                    return 0.0
+                lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+                return float('inf') if lag is None else float(lag)
+            if dialect == 'postgresql':
+                return float(connection.scalar(text(
+                    'SELECT CASE WHEN pg_is_in_recovery() '
+                    'THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) '
+                    'ELSE 0 END'
+                )))
+            connection.execute(text('SELECT 1'))
+            return 0.0
+
+    def _refresh(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return self.healthy
+            # Claim this check so concurrent requests keep using the previous answer.
+            self._checked_at = now
+        try:
+            lag = self.measure_lag()
+            healthy = lag <= self.max_lag
+            if not healthy:
+                logger.warning('Replica is %.1fs behind; reading from the primary', lag)
+        except Exception as e:
+            lag, healthy = None, False
+            logger.warning('Replica check failed; reading from the primary: %s', e)
+        with self._lock:
+            self.last_lag, self.healthy = lag, healthy
+        return healthy
+
+    def route(self):
+        healthy = self._refresh()
+        with self._lock:
+            if healthy:
+                self.replica_reads += 1
+            else:
+                self.primary_fallbacks += 1
+        return healthy
+
+    def stats(self):
+        with self._lock:
+            return {
+                'healthy': self.healthy,
+                'lag_seconds': self.last_lag,
+                'replica_reads': self.replica_reads,
+                'primary_fallbacks': self.primary_fallbacks,
+            }
+
+
+def _statement_timeout_sql(dialect, timeout_ms):
+    if dialect == 'mysql':
+        # Applies to read-only SELECTs, which is what runs away in practice.
+        return f'SET SESSION max_execution_time = {int(timeout_ms)}'
+    if dialect == 'postgresql':
+        return f'SET statement_timeout = {int(timeout_ms)}'
+    return None
+
+
+def set_statement_timeout(engine, timeout_ms):
+    sql = _statement_timeout_sql(engine.dialect.name, timeout_ms)
+    if sql is None:
+        logger.info('No statement timeout support for %s; skipping', engine.dialect.name)
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(sql)
+        cursor.close()
+        # Commit so the pool's reset-on-return rollback cannot undo the setting.
+        dbapi_connection.commit()
+
+
+def init_database(app):
+    db = app.extensions['sqlalchemy']
+    with app.app_context():
+        engines = db.engines
+        if app.config['DB_STATEMENT_TIMEOUT_MS']:
+            for engine in engines.values():
+                set_statement_timeout(engine, app.config['DB_STATEMENT_TIMEOUT_MS'])
+        replica = engines.get(REPLICA_BIND)
+    if replica is not None:
+        app.extensions['replica_monitor'] = ReplicaMonitor(
+            replica, app.config['REPLICA_MAX_LAG'], app.config['REPLICA_LAG_CHECK_INTERVAL'],
+        )
+    return app
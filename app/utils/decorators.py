@@ -1,16 +1,46 @@
 #!/usr/bin/env python3
 from functools import wraps
-from flask_jwt_extended import verify_jwt_in_request, get_jwt
 from flask import jsonify
+from app.extensions import db
+from app.utils.db_routing import READ_ONLY
+from app.utils.token_auth import verify_request
+
+
+def jwt_required():
+    """Like flask_jwt_extended's jwt_required, but verifies at most once per request."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            verify_request()
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
 
 def role_required(*roles):
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            verify_jwt_in_request()
-            claims = get_jwt()
+            claims = verify_request()
             if claims.get("role") not in roles:
                 return jsonify({"msg": "Unauthorized - Insufficient role"}), 403
             return fn(*args, **kwargs)
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
+
+
+def read_only(fn):
+    """Let the view's SELECTs go to the read replica, when one is configured and healthy.
+
+    Put it below auth and caching decorators so token and cache-version
+    checks still read the primary.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        previous = db.session.info.get(READ_ONLY)
+        db.session.info[READ_ONLY] = True
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            db.session.info[READ_ONLY] = previous
+    return wrapper
@@ -1,30 +1,65 @@
 #!/usr/bin/env python3
 import os
+import base64
 from flask_mail import Message
-from app.extensions import mail
 from flask import current_app
-from threading import Thread
+from app.utils.job_queue import enqueue, job_handler
+from app.utils.mail_pool import mail_pool
+
+EMAIL_JOB = 'email'
+EMAIL_BATCH_SIZE = 20
+
+def queue_email(recipients, subject, body, attachment_path=None, run_at=None, idempotency_key=None,
+                attachment=None):
+    """Queue an email on the job table; it is sent once the caller commits.
+
+    ``attachment`` is a ``(filename, bytes)`` pair carried in the job payload,
+    for documents rendered in memory; ``attachment_path`` is read at send time.
+    """
+    payload = {
+        'recipients': list(recipients),
+        'subject': subject,
+        'body': body,
+        'attachment_path': attachment_path,
+    }
+    if attachment is not None:
+        filename, data = attachment
+        payload['attachment'] = {'filename': filename, 'data': base64.b64encode(data).decode('ascii')}
+    return enqueue(EMAIL_JOB, payload, run_at=run_at, idempotency_key=idempotency_key)
+
+def build_message(payload):
+    msg = Message(payload['subject'], recipients=payload['recipients'], body=payload['body'])
+    attachment_path = payload.get('attachment_path')
+    if attachment_path:
+        with open(attachment_path, 'rb') as f:
+            msg.attach(filename=os.path.basename(attachment_path), content_type='application/pdf', data=f.read())
+    attachment = payload.get('attachment')
+    if attachment:
+        msg.attach(filename=attachment['filename'], content_type='application/pdf',
+                   data=base64.b64decode(attachment['data']))
+    return msg
+
+@job_handler(EMAIL_JOB, batch_size=EMAIL_BATCH_SIZE)
+def deliver_emails(payloads):
+    errors = [None] * len(payloads)
+    messages, positions = [], []
+    for i, payload in enumerate(payloads):
+        try:
+            messages.append(build_message(payload))
+            positions.append(i)
+        except Exception as e:
+            errors[i] = e
+    for i, error in zip(positions, mail_pool.send_batch(messages) if messages else []):
+        errors[i] = error
+    current_app.logger.info(f"Sent {errors.count(None)} of {len(payloads)} queued emails")
+    return errors
 
 def send_email_with_attachment(recipient, subject, body, attachment_path):
-    app = current_app._get_current_object()
     try:
-        if not os.path.exists(attachment_path):
+        if not attachment_path or not os.path.exists(attachment_path):
             current_app.logger.error(f"Attachment not fount: {attachment_path}")
             return False
-        msg = Message(subject, recipients=[recipient], body=body)
-        with open(attachment_path, 'rb') as f:
-            msg.attach(filename=os.path.basename(attachment_path), content_type='application/pdf', data=f.read()
-            )
-
-        Thread(target=send_async_email, args=(app, msg)).start()
+        queue_email([recipient], subject, body, attachment_path=attachment_path)
         return True
     except Exception as e:
         current_app.logger.error(f"Error sending email: {recipient}: {str(e)}")
-
-def send_async_email(app, msg):
-    with app.app_context():
-        try:
-            mail.send(msg)
-            current_app.logger.info(f"Email sent to {msg.recipients}")
-        except Exception as e:
-            current_app.logger.error(f"Error sending email: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import Integer, and_, bindparam, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from app.extensions import db
+from app.models import Borrow, Debt, UserBalance
+from app.utils.job_queue import enqueue, job_handler
+from app.utils.stats import LOCAL_TZ, record_payment
+
+logger = logging.getLogger(__name__)
+
+FINE_PER_DAY = 20
+ACCRUAL_JOB = 'fines-accrue'
+
+
+class days_between(FunctionElement):
+    """Whole days from ``start`` to ``end``, rounded down like ``timedelta.days``."""
+    type = Integer()
+    inherit_cache = True
+    name = 'days_between'
+
+
+@compiles(days_between)
+def _days_between_default(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return f'CAST(FLOOR(EXTRACT(EPOCH FROM ({compiler.process(end, **kw)} - {compiler.process(start, **kw)})) / 86400) AS INTEGER)'
+
+
+@compiles(days_between, 'sqlite')
+def _days_between_sqlite(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return f'CAST(julianday({compiler.process(end, **kw)}) - julianday({compiler.process(start, **kw)}) AS INTEGER)'
+
+
+@compiles(days_between, 'mysql')
+def _days_between_mysql(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return f'TIMESTAMPDIFF(DAY, {compiler.process(start, **kw)}, {compiler.process(end, **kw)})'
+
+
+def debt_timestamp():
+    # Same clock as the Debt.created_at default.
+    return datetime.utcnow() + timedelta(hours=3)
+
+
+def adjust_balance(user_id, amount, debts, credit=0):
+    """Add ``amount`` to the user's outstanding total, ``debts`` to their unpaid count and ``credit`` to their credit."""
+    if not amount and not debts and not credit:
+        return
+    table = UserBalance.__table__
+    stmt = (
+        update(table).where(table.c.user_id == user_id)
+        .values(outstanding=table.c.outstanding + amount, unpaid_debts=table.c.unpaid_debts + debts,
+                credit=table.c.credit + credit)
+    )
+    if db.session.execute(stmt).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(table).values(
+                user_id=user_id, outstanding=amount, unpaid_debts=debts, credit=credit,
+            ))
+    except IntegrityError:
+        # Another transaction created the row first.
+        db.session.execute(stmt)
+
+
+def get_balance(user_id):
+    """Fines still owed after credit, and unpaid debt count, for a user from a single primary-key read."""
+    balance = db.session.get(UserBalance, int(user_id))
+    if balance is None:
+        return 0.0, 0
+    return max(balance.outstanding - (balance.credit or 0.0), 0.0), balance.unpaid_debts
+
+
+def take_credit(user_id):
+    """Claim the user's stored credit and return it; 0 if there is none or another payment took it first."""
+    table = UserBalance.__table__
+    credit = db.session.scalar(select(table.c.credit).where(table.c.user_id == user_id)) or 0.0
+    if credit <= 0:
+        return 0.0
+    claimed = db.session.execute(
+        update(table).where(table.c.user_id == user_id, table.c.credit >= credit)
+        .values(credit=table.c.credit - credit)
+    ).rowcount
+    return credit if claimed else 0.0
+
+
+def charge_on_return(borrow, overdue_days):
+    """Bring the borrow's fine up to ``overdue_days`` at return time. Returns the total fine.
+
+    Fines accrued nightly on this borrow are topped up rather than charged again;
+    anything the member already paid while the book was out is subtracted.
+    """
+    total = overdue_days * FINE_PER_DAY
+    remainder = max(total - (borrow.fine_paid or 0), 0)
+    open_debt = Debt.query.filter_by(borrow_id=borrow.id, paid=False).first()
+    if open_debt is not None and remainder == 0:
+        # Everything owed was already paid while the book was out.
+        db.session.delete(open_debt)
+        adjust_balance(borrow.user_id, -open_debt.fine_amount, -1)
+    elif open_debt is not None:
+        delta = remainder - open_debt.fine_amount
+        open_debt.days_overdue = overdue_days
+        open_debt.fine_amount = remainder
+        adjust_balance(borrow.user_id, delta, 0)
+    elif remainder > 0:
+        db.session.add(Debt(
+            user_id=borrow.user_id,
+            book_id=borrow.book_id,
+            borrow_id=borrow.id,
+            days_overdue=overdue_days,
+            fine_amount=remainder,
+            paid=False,
+        ))
+        adjust_balance(borrow.user_id, remainder, 1)
+    return total
+
+
+def settle_debts(user_id, debts):
+    """Mark ``debts`` paid and take them off the user's balance. Caller commits."""
+    if not debts:
+        return 0
+    paid_at = debt_timestamp()
+    for debt in debts:
+        debt.paid = True
+        debt.paid_at = paid_at
+    paid_on_borrows = [{'b_id': d.borrow_id, 'b_amount': d.fine_amount} for d in debts if d.borrow_id]
+    if paid_on_borrows:
+        table = Borrow.__table__
+        db.session.execute(
+            update(table).where(table.c.id == bindparam('b_id'))
+            .values(fine_paid=table.c.fine_paid + bindparam('b_amount')),
+            paid_on_borrows,
+        )
+    total = sum(d.fine_amount for d in debts)
+    adjust_balance(int(user_id), -total, -len(debts))
+    record_payment(total, paid_at.replace(tzinfo=LOCAL_TZ))
+    return total
+
+
+def accrue_fines(now=None, rate=FINE_PER_DAY):
+    """Accrue fines on every overdue open borrow with a handful of set-based statements.
+
+    Each open borrow keeps at most one unpaid accrual debt whose amount is
+    ``days overdue * rate`` minus whatever was already paid on that borrow. The
+    balances of affected users are recomputed from their unpaid debts. Caller commits.
+    Returns the number of debts inserted and updated.
+    """
+    now = now or datetime.utcnow()
+    borrow, debts, balance = Borrow.__table__, Debt.__table__, UserBalance.__table__
+    days = days_between(borrow.c.due_date, literal(now))
+    owed = days * rate - borrow.c.fine_paid
+    overdue = and_(borrow.c.returned == False, borrow.c.due_date < now, days >= 1)
+
+    def from_borrow(expr):
+        return select(expr).where(borrow.c.id == debts.c.borrow_id).scalar_subquery()
+
+    updated = db.session.execute(
+        update(debts)
+        .where(debts.c.paid == False, debts.c.borrow_id.in_(select(borrow.c.id).where(overdue)))
+        .values(days_overdue=from_borrow(days), fine_amount=from_borrow(owed))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    # MySQL refuses INSERT ... SELECT with the target table in a subquery, so
+    # "has no open debt" / "has no balance row" are anti-joins in the FROM clause.
+    open_debt = debts.alias('open_debt')
+    inserted = db.session.execute(
+        insert(debts).from_select(
+            ['user_id', 'book_id', 'borrow_id', 'days_overdue', 'fine_amount', 'paid', 'created_at'],
+            select(borrow.c.user_id, borrow.c.book_id, borrow.c.id, days, owed, literal(False),
+                   literal(debt_timestamp()))
+            .select_from(borrow.outerjoin(
+                open_debt, and_(open_debt.c.borrow_id == borrow.c.id, open_debt.c.paid == False)))
+            .where(overdue, owed > 0, open_debt.c.id.is_(None)),
+        )
+    ).rowcount
+
+    _insert_missing_balances(select(borrow.c.user_id).where(overdue))
+    recompute_balances(balance.c.user_id.in_(select(borrow.c.user_id).where(overdue)))
+    return inserted + updated
+
+
+def _insert_missing_balances(user_ids):
+    balance = UserBalance.__table__
+    users = user_ids.distinct().subquery()
+    existing = balance.alias('existing')
+    db.session.execute(
+        insert(balance).from_select(
+            ['user_id', 'outstanding', 'unpaid_debts'],
+            select(users.c.user_id, literal(0.0), literal(0))
+            .select_from(users.outerjoin(existing, existing.c.user_id == users.c.user_id))
+            .where(existing.c.user_id.is_(None)),
+        )
+    )
+
+
+def recompute_balances(condition=None):
+    """Recompute user_balance rows (all, or those matching ``condition``) from unpaid debts.
+
+    Stored credit is money already received, so it is left as it is.
+    """
+    debts, balance = Debt.__table__, UserBalance.__table__
+    unpaid = and_(debts.c.user_id == balance.c.user_id, debts.c.paid == False)
+    stmt = update(balance).values(
+        outstanding=select(func.coalesce(func.sum(debts.c.fine_amount), 0.0)).where(unpaid).scalar_subquery(),
+        unpaid_debts=select(func.count(debts.c.id)).where(unpaid).scalar_subquery(),
+    )
+    if condition is not None:
+        stmt = stmt.where(condition)
+    return db.session.execute(stmt.execution_options(synchronize_session=False)).rowcount
+
+
+def rebuild_balances():
+    """Create missing user_balance rows and recompute every balance from the debts table."""
+    _insert_missing_balances(select(Debt.__table__.c.user_id))
+    return recompute_balances()
+
+
+@job_handler(ACCRUAL_JOB)
+def run_accrual(payload):
+    changed = accrue_fines()
+    db.session.commit()
+    logger.info('Fine accrual touched %s debts', changed)
+
+
+def schedule_accrual(now=None):
+    """Queue today's accrual run once, however many workers call this."""
+    now = now or datetime.utcnow()
+    run_at = now.replace(hour=current_app.config['FINES_ACCRUAL_HOUR'], minute=0, second=0, microsecond=0)
+    enqueue(ACCRUAL_JOB, {}, run_at=run_at, idempotency_key=f'{ACCRUAL_JOB}:{run_at.date().isoformat()}')
+    db.session.commit()
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from queue import Empty, Queue
+from threading import Lock
+from flask import current_app
+from sqlalchemy import and_, event, func, or_, select, update
+from app.extensions import db
+from app.models import Book, Borrow, Hold, User
+from app.utils.emailer import queue_email
+from app.utils.inventory import return_copy, take_copy
+from app.utils.job_queue import enqueue, job_handler
+
+logger = logging.getLogger(__name__)
+
+WAITING = 'waiting'
+READY = 'ready'
+FULFILLED = 'fulfilled'
+EXPIRED = 'expired'
+CANCELLED = 'cancelled'
+ACTIVE = (WAITING, READY)
+
+EXPIRY_JOB = 'hold-expire'
+CLAIM_CANDIDATES = 5
+
+
+class HoldError(Exception):
+    def __init__(self, msg, status=400):
+        super().__init__(msg)
+        self.status = status
+
+
+class HoldBroker:
+    """Wakes the SSE streams open in this process when one of their user's holds changes.
+
+    Streams re-read the holds table when woken, so a wake-up carries no data
+    and a missed one only delays delivery until the stream's next poll.
+    """
+
+    def __init__(self):
+        self._streams = {}
+        self._lock = Lock()
+
+    def subscribe(self, user_id):
+        queue = Queue(maxsize=1)
+        with self._lock:
+            self._streams.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self._lock:
+            streams = self._streams.get(user_id)
+            if streams:
+                streams.discard(queue)
+                if not streams:
+                    del self._streams[user_id]
+
+    def wake(self, user_id):
+        with self._lock:
+            streams = list(self._streams.get(user_id, ()))
+        for queue in streams:
+            if queue.empty():
+                try:
+                    queue.put_nowait(True)
+                except Exception:
+                    pass
+
+    def open_streams(self):
+        with self._lock:
+            return sum(len(streams) for streams in self._streams.values())
+
+
+broker = HoldBroker()
+
+
+def _changed(user_id):
+    db.session.info.setdefault('hold_changes', set()).add(int(user_id))
+
+
+@event.listens_for(db.session, 'after_commit')
+def _wake_after_commit(session):
+    if session.in_nested_transaction():
+        return
+    for user_id in session.info.pop('hold_changes', ()):
+        broker.wake(user_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_after_rollback(session):
+    if session.in_nested_transaction():
+        return
+    session.info.pop('hold_changes', None)
+
+
+def _transition(hold_id, from_statuses, **values):
+    """Conditionally move a hold between states; False if someone else moved it first."""
+    values.setdefault('updated_at', datetime.utcnow())
+    return db.session.execute(
+        update(Hold)
+        .where(Hold.id == hold_id, Hold.status.in_(from_statuses))
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+
+
+def queue_position(hold):
+    """1-based place of a waiting hold in its book's queue."""
+    ahead = db.session.scalar(
+        select(func.count(Hold.id)).where(
+            Hold.book_id == hold.book_id,
+            Hold.status == WAITING,
+            or_(Hold.priority > hold.priority, and_(Hold.priority == hold.priority, Hold.id < hold.id)),
+        )
+    )
+    return ahead + 1
+
+
+def place_hold(user_id, book_id, priority=0):
+    """Join the book's queue. Caller commits."""
+    book = db.session.get(Book, book_id)
+    if book is None:
+        raise HoldError('Book not found', 404)
+    if Borrow.query.filter_by(user_id=user_id, book_id=book_id, returned=False).first():
+        raise HoldError('You already borrowed this book and have not returned it')
+    if Hold.query.filter(Hold.user_id == user_id, Hold.book_id == book_id, Hold.status.in_(ACTIVE)).first():
+        raise HoldError('You already have a hold on this book')
+    queue_exists = db.session.scalar(
+        select(Hold.id).where(Hold.book_id == book_id, Hold.status == WAITING).limit(1)
+    )
+    if book.available_copies > 0 and queue_exists is None:
+        raise HoldError('Book is available; borrow it instead', 409)
+    hold = Hold(book_id=book_id, user_id=user_id, status=WAITING, priority=priority)
+    db.session.add(hold)
+    db.session.flush()
+    _changed(user_id)
+    return hold
+
+
+def assign_next(book_id, now=None):
+    """Give a freed copy of the book to the head of its queue. Returns the hold, or None if nobody waits."""
+    now = now or datetime.utcnow()
+    expires_at = now + timedelta(hours=current_app.config['HOLD_CLAIM_HOURS'])
+    candidates = db.session.scalars(
+        select(Hold.id)
+        .where(Hold.book_id == book_id, Hold.status == WAITING)
+        .order_by(Hold.priority.desc(), Hold.id)
+        .limit(CLAIM_CANDIDATES)
+    ).all()
+    for hold_id in candidates:
+        if not _transition(hold_id, (WAITING,), status=READY, ready_at=now, expires_at=expires_at, updated_at=now):
+            continue
+        hold = db.session.get(Hold, hold_id, populate_existing=True)
+        enqueue(EXPIRY_JOB, {'hold_id': hold_id}, run_at=expires_at, idempotency_key=f'{EXPIRY_JOB}:{hold_id}')
+        user = db.session.get(User, hold.user_id)
+        queue_email(
+            [user.email], 'Your reserved book is ready',
+            f'Hello {user.name},\n\nA copy of "{hold.book.title}" is being held for you until '
+            f'{expires_at:%Y-%m-%d %H:%M} UTC. Borrow it before then or it goes to the next reader.\n\n'
+            'Thank you,\nLibrary Management Team',
+            idempotency_key=f'hold-ready:{hold_id}',
+        )
+        _changed(hold.user_id)
+        return hold
+    return None
+
+
+def release_copy(book_id):
+    """A copy came back: hand it to the next holder, or return it to the shelf. Caller commits."""
+    if assign_next(book_id) is None:
+        return_copy(book_id)
+
+
+def ready_hold(user_id, book_id, now=None):
+    now = now or datetime.utcnow()
+    return Hold.query.filter(
+        Hold.user_id == user_id, Hold.book_id == book_id, Hold.status == READY, Hold.expires_at > now,
+    ).first()
+
+
+def fulfil_hold(hold, now=None):
+    """Consume the copy reserved by a ready hold. False if the claim lapsed or was taken meanwhile."""
+    now = now or datetime.utcnow()
+    fulfilled = db.session.execute(
+        update(Hold)
+        .where(Hold.id == hold.id, Hold.status == READY, Hold.expires_at > now)
+        .values(status=FULFILLED, updated_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    if fulfilled:
+        _changed(hold.user_id)
+    return fulfilled
+
+
+def cancel_hold(user_id, hold_id):
+    """Cancel one of the user's holds; a ready hold's copy moves on. Caller commits."""
+    hold = Hold.query.filter_by(id=hold_id, user_id=user_id).first()
+    if hold is None:
+        raise HoldError('Hold not found', 404)
+    if hold.status not in ACTIVE or not _transition(hold.id, (hold.status,), status=CANCELLED):
+        raise HoldError('Hold is no longer active')
+    if hold.status == READY:
+        release_copy(hold.book_id)
+    _changed(user_id)
+
+
+def expire_holds(now=None, hold_id=None):
+    """Expire ready holds whose claim window has passed and pass their copies on. Caller commits."""
+    now = now or datetime.utcnow()
+    query = select(Hold.id, Hold.book_id, Hold.user_id).where(Hold.status == READY, Hold.expires_at <= now)
+    if hold_id is not None:
+        query = query.where(Hold.id == hold_id)
+    expired = 0
+    for row in db.session.execute(query).all():
+        if _transition(row.id, (READY,), status=EXPIRED, updated_at=now):
+            release_copy(row.book_id)
+            _changed(row.user_id)
+            expired += 1
+    return expired
+
+
+def promote_waiting(book_id=None):
+    """Assign shelf copies to waiting holders, e.g. after copies were added. Caller commits."""
+    query = (
+        select(Book.id).join(Hold, Hold.book_id == Book.id)
+        .where(Hold.status == WAITING, Book.available_copies > 0)
+        .distinct()
+    )
+    if book_id is not None:
+        query = query.where(Book.id == book_id)
+    promoted = 0
+    for candidate in db.session.scalars(query).all():
+        while take_copy(candidate):
+            if assign_next(candidate) is None:
+                return_copy(candidate)
+                break
+            promoted += 1
+    return promoted
+
+
+def sweep_holds():
+    """Periodic safety net for the expiry jobs and for copies added while readers wait."""
+    expired = expire_holds()
+    promoted = promote_waiting()
+    db.session.commit()
+    if expired or promoted:
+        logger.info('Hold sweep expired %s and promoted %s holds', expired, promoted)
+
+
+@job_handler(EXPIRY_JOB)
+def run_expiry(payload):
+    expire_holds(hold_id=payload['hold_id'])
+    db.session.commit()
+
+
+def hold_event(hold, title):
+    return {
+        'hold_id': hold.id,
+        'book_id': hold.book_id,
+        'title': title,
+        'status': hold.status,
+        'expires_at': hold.expires_at.isoformat() if hold.expires_at else None,
+    }
+
+
+def _event_id(hold):
+    return f'{hold.updated_at.isoformat()}_{hold.id}'
+
+
+def parse_event_id(value):
+    try:
+        stamp, hold_id = value.rsplit('_', 1)
+        return datetime.fromisoformat(stamp), int(hold_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _changes_since(user_id, since):
+    query = select(Hold, Book.title).join(Book, Book.id == Hold.book_id).where(Hold.user_id == user_id)
+    if since is None:
+        query = query.where(Hold.status.in_(ACTIVE))
+    else:
+        query = query.where(Hold.updated_at >= since)
+    rows = db.session.execute(query.order_by(Hold.updated_at, Hold.id)).all()
+    # End the read transaction so an idle stream does not pin a pooled connection.
+    db.session.rollback()
+    return rows
+
+
+def stream_events(user_id, cursor=None):
+    """Server-Sent Events for the user's holds, ending after HOLD_STREAM_MAX_SECONDS.
+
+    Without a Last-Event-ID cursor the stream starts with the user's active
+    holds. It then wakes on changes made in this process and polls the
+    indexed (user_id, updated_at) range every HOLD_STREAM_POLL_INTERVAL
+    seconds for changes made by other workers.
+
+    updated_at is stamped before commit, so a change can become visible after
+    a later-stamped one was already sent. Each poll therefore re-reads the last
+    HOLD_STREAM_OVERLAP_SECONDS and skips (hold, updated_at) pairs already sent.
+    """
+    config = current_app.config
+    poll_interval = config['HOLD_STREAM_POLL_INTERVAL']
+    heartbeat = config['HOLD_STREAM_HEARTBEAT']
+    overlap = timedelta(seconds=config['HOLD_STREAM_OVERLAP_SECONDS'])
+    high_water = sent = None
+    if cursor is not None:
+        high_water, sent = cursor[0], {(cursor[1], cursor[0])}
+    wakeups = broker.subscribe(user_id)
+    try:
+        yield 'retry: 3000\n\n'
+        started = last_sent = time.monotonic()
+        while time.monotonic() - started < config['HOLD_STREAM_MAX_SECONDS']:
+            if high_water is None:
+                high_water, sent = datetime.utcnow(), set()
+                rows = _changes_since(user_id, None)
+            else:
+                rows = _changes_since(user_id, high_water - overlap)
+            for hold, title in rows:
+                key = (hold.id, hold.updated_at)
+                if key in sent:
+                    continue
+                sent.add(key)
+                high_water = max(high_water, hold.updated_at)
+                last_sent = time.monotonic()
+                yield f'id: {_event_id(hold)}\nevent: hold\ndata: {json.dumps(hold_event(hold, title))}\n\n'
+            # Only changes inside the overlap window can be read again.
+            sent = {key for key in sent if key[1] >= high_water - overlap}
+            if time.monotonic() - last_sent >= heartbeat:
+                last_sent = time.monotonic()
+                yield ': keep-alive\n\n'
+            try:
+                wakeups.get(timeout=min(poll_interval, heartbeat))
+            except Empty:
+                pass
+    finally:
+        broker.unsubscribe(user_id, wakeups)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+import random
+import time
+import logging
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+from app.extensions import db
+from app.models import Book
+from app.utils.response_cache import mark_stale
+
+logger = logging.getLogger(__name__)
+
+DEADLOCK_RETRIES = 3
+RETRY_BASE_DELAY = 0.05
+
+# MySQL: 1213 deadlock, 1205 lock wait timeout. SQLite reports a busy database as text.
+RETRYABLE_ERROR_CODES = {1213, 1205}
+RETRYABLE_MESSAGES = ('deadlock', 'database is locked')
+
+
+class OutOfStock(Exception):
+    pass
+
+
+def take_copy(book_id):
+    """Decrement available_copies only if a copy is left. Returns False when none is."""
+    result = db.session.execute(
+        update(Book)
+        .where(Book.id == book_id, Book.available_copies > 0)
+        .values(available_copies=Book.available_copies - 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 1:
+        mark_stale(db.session)
+    return result.rowcount == 1
+
+
+def return_copy(book_id):
+    result = db.session.execute(
+        update(Book)
+        .where(Book.id == book_id, Book.available_copies < Book.total_copies)
+        .values(available_copies=Book.available_copies + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 1:
+        mark_stale(db.session)
+    return result.rowcount == 1
+
+
+def is_retryable(error):
+    orig = getattr(error, 'orig', None)
+    code = orig.args[0] if orig is not None and orig.args else None
+    if code in RETRYABLE_ERROR_CODES:
+        return True
+    return any(m in str(error).lower() for m in RETRYABLE_MESSAGES)
+
+
+def run_in_transaction(fn, retries=DEADLOCK_RETRIES):
+    """Run ``fn`` and commit, retrying the whole unit on deadlocks and lock timeouts."""
+    for attempt in range(retries + 1):
+        try:
+            result = fn()
+            db.session.commit()
+            return result
+        except OperationalError as e:
+            db.session.rollback()
+            if attempt == retries or not is_retryable(e):
+                raise
+            logger.warning('Retrying transaction after lock conflict (attempt %s): %s', attempt + 1, e)
+            time.sleep(RETRY_BASE_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5))
+        except Exception:
+            db.session.rollback()
+            raise
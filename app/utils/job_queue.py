@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+import json
+import random
+import logging
+from datetime import datetime, timedelta
+from threading import Thread, Event, Lock
+from flask import current_app
+from sqlalchemy import or_, and_, delete, update
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import Job
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 6 * 60 * 60
+CLAIM_CANDIDATES = 5
+PRUNE_BATCH_SIZE = 1000
+
+HANDLERS = {}
+
+_worker = None
+_worker_lock = Lock()
+
+
+def job_handler(kind, batch_size=1):
+    """Register ``fn`` for ``kind``.
+
+    With ``batch_size > 1`` the worker leases up to that many due jobs of the
+    kind at once and calls ``fn`` with the list of payloads; ``fn`` returns a
+    list holding ``None`` or an exception for each job.
+    """
+    def decorator(fn):
+        HANDLERS[kind] = (fn, batch_size)
+        return fn
+    return decorator
+
+
+def enqueue(kind, payload, run_at=None, idempotency_key=None, max_attempts=None):
+    """Add a job to the current session; it becomes visible when the caller commits.
+
+    A job whose idempotency key already exists is not added again and the
+    existing job is returned instead.
+    """
+    if idempotency_key:
+        existing = Job.query.filter_by(idempotency_key=idempotency_key).first()
+        if existing:
+            return existing
+
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload),
+        status=PENDING,
+        run_at=run_at or datetime.utcnow(),
+        idempotency_key=idempotency_key,
+    )
+    if max_attempts:
+        job.max_attempts = max_attempts
+    try:
+        with db.session.begin_nested():
+            db.session.add(job)
+    except IntegrityError:
+        # Lost a race with another request enqueueing the same key.
+        return Job.query.filter_by(idempotency_key=idempotency_key).first()
+    return job
+
+
+def backoff_delay(attempts):
+    delay = min(BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)), BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _claimable(now):
+    return or_(
+        and_(Job.status == PENDING, Job.run_at <= now),
+        and_(Job.status == RUNNING, Job.locked_until < now),
+    )
+
+
+def claim_jobs(visibility_timeout, limit=1, kinds=None):
+    """Atomically lease up to ``limit`` due jobs."""
+    now = datetime.utcnow()
+    query = db.session.query(Job.id).filter(_claimable(now))
+    if kinds:
+        query = query.filter(Job.kind.in_(kinds))
+    candidates = [row.id for row in query.order_by(Job.run_at).limit(limit + CLAIM_CANDIDATES)]
+
+    claimed = []
+    for job_id in candidates:
+        # The conditional UPDATE is the lease: only one worker can flip a given row.
+        result = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, _claimable(now))
+            .values(status=RUNNING, attempts=Job.attempts + 1, locked_until=now + timedelta(seconds=visibility_timeout))
+        )
+        if result.rowcount == 1:
+            claimed.append(job_id)
+            if len(claimed) >= limit:
+                break
+    db.session.commit()
+    return [db.session.get(Job, job_id) for job_id in claimed]
+
+
+def claim_job(visibility_timeout, kinds=None):
+    jobs = claim_jobs(visibility_timeout, 1, kinds)
+    return jobs[0] if jobs else None
+
+
+def complete_job(job):
+    job.status = DONE
+    job.locked_until = None
+    job.last_error = None
+    db.session.commit()
+
+
+def fail_job(job, error):
+    db.session.rollback()
+    job = db.session.get(Job, job.id)
+    job.last_error = str(error)[:2000]
+    job.locked_until = None
+    if job.attempts >= job.max_attempts:
+        job.status = FAILED
+        logger.error('Job %s (%s) failed permanently: %s', job.id, job.kind, error)
+    else:
+        job.status = PENDING
+        job.run_at = datetime.utcnow() + backoff_delay(job.attempts)
+    db.session.commit()
+
+
+def run_job(job):
+    handler, batch_size = HANDLERS.get(job.kind, (None, 1))
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for job kind {job.kind!r}')
+        if batch_size > 1:
+            error = handler([json.loads(job.payload)])[0]
+            if error is not None:
+                raise error
+        else:
+            handler(json.loads(job.payload))
+    except Exception as e:
+        logger.exception('Job %s (%s) raised', job.id, job.kind)
+        fail_job(job, e)
+        return False
+    complete_job(job)
+    return True
+
+
+def run_batch(jobs):
+    handler, _ = HANDLERS[jobs[0].kind]
+    try:
+        errors = handler([json.loads(job.payload) for job in jobs])
+    except Exception as e:
+        logger.exception('Batch of %s %s jobs raised', len(jobs), jobs[0].kind)
+        errors = [e] * len(jobs)
+    for job, error in zip(jobs, errors):
+        if error is None:
+            complete_job(job)
+        else:
+            fail_job(job, error)
+
+
+def pending_count():
+    return db.session.query(db.func.count(Job.id)).filter(Job.status.in_([PENDING, RUNNING])).scalar()
+
+
+def prune_jobs(done_days, failed_days, batch_size=PRUNE_BATCH_SIZE):
+    """Delete done jobs older than ``done_days`` and failed ones older than ``failed_days``.
+
+    Runs in small batches so no single DELETE holds locks on the jobs table
+    for long. A pruned job's idempotency key can be enqueued again.
+    """
+    now = datetime.utcnow()
+    removed = 0
+    for status, days in ((DONE, done_days), (FAILED, failed_days)):
+        cutoff = now - timedelta(days=days)
+        while True:
+            ids = [row.id for row in db.session.query(Job.id).filter(Job.status == status, Job.run_at < cutoff).limit(batch_size)]
+            if not ids:
+                break
+            db.session.execute(delete(Job).where(Job.id.in_(ids)).execution_options(synchronize_session=False))
+            db.session.commit()
+            removed += len(ids)
+            if len(ids) < batch_size:
+                break
+    return removed
+
+
+def prune_finished_jobs():
+    removed = prune_jobs(current_app.config['JOB_RETENTION_DAYS'], current_app.config['JOB_FAILED_RETENTION_DAYS'])
+    if removed:
+        logger.info('Pruned %s finished jobs', removed)
+    return removed
+
+
+class JobWorker:
+    """A fixed number of threads that lease and run due jobs from the jobs table."""
+
+    def __init__(self, app, concurrency=4, poll_interval=1.0, visibility_timeout=300):
+        self.app = app
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self._stop = Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.concurrency):
+            thread = Thread(target=self._loop, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def run_once(self):
+        job = claim_job(self.visibility_timeout)
+        if job is None:
+            return False
+        _, batch_size = HANDLERS.get(job.kind, (None, 1))
+        if batch_size > 1:
+            jobs = [job] + claim_jobs(self.visibility_timeout, batch_size - 1, kinds=[job.kind])
+            run_batch(jobs)
+        else:
+            run_job(job)
+        return True
+
+    def _loop(self):
+        while not self._stop.is_set():
+            worked = False
+            with self.app.app_context():
+                try:
+                    worked = self.run_once()
+                except Exception:
+                    logger.exception('Job worker loop error')
+                    db.session.rollback()
+            if not worked:
+                self._stop.wait(self.poll_interval)
+
+
+def start_worker(app):
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = JobWorker(
+                app,
+                concurrency=app.config['JOB_WORKERS'],
+                poll_interval=app.config['JOB_POLL_INTERVAL'],
+                visibility_timeout=app.config['JOB_VISIBILITY_TIMEOUT'],
+            ).start()
+        return _worker
+
+
+def drain(app, max_jobs=None):
+    """Run due jobs in the calling thread until none are left."""
+    worker = JobWorker(app, visibility_timeout=app.config['JOB_VISIBILITY_TIMEOUT'])
+    done = 0
+    with app.app_context():
+        while (max_jobs is None or done < max_jobs) and worker.run_once():
+            done += 1
+    return done
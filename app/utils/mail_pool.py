@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+import smtplib
+import time
+import logging
+from contextlib import contextmanager
+from queue import LifoQueue, Empty
+from threading import BoundedSemaphore, Lock
+from app.extensions import mail
+
+logger = logging.getLogger(__name__)
+
+# Errors after which the SMTP session itself can no longer be trusted.
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class MailPool:
+    """A small pool of persistent SMTP connections shared by the email job workers.
+
+    Each connection is opened once with ``mail.connect()`` (TCP + STARTTLS +
+    login) and reused for many messages. Connections idle for longer than
+    ``max_idle`` seconds are probed with NOOP before reuse and reopened when
+    the server has dropped them.
+    """
+
+    def __init__(self, size=2, max_idle=60, checkout_timeout=30):
+        self.configure(size, max_idle, checkout_timeout)
+        self._stats_lock = Lock()
+        self.sent = 0
+        self.failed = 0
+        self.connects = 0
+        self.send_seconds = 0.0
+
+    def configure(self, size, max_idle, checkout_timeout=30):
+        self.size = size
+        self.max_idle = max_idle
+        self.checkout_timeout = checkout_timeout
+        self._slots = BoundedSemaphore(size)
+        self._idle = LifoQueue()
+
+    def _open(self):
+        connection = mail.connect()
+        connection.__enter__()
+        with self._stats_lock:
+            self.connects += 1
+        return connection
+
+    @staticmethod
+    def _close(connection):
+        try:
+            if connection.host is not None:
+                connection.host.quit()
+        except Exception:
+            pass
+
+    def _is_alive(self, connection, last_used):
+        if connection.host is None or time.monotonic() - last_used < self.max_idle:
+            return True
+        try:
+            return connection.host.noop()[0] == 250
+        except Exception:
+            return False
+
+    @contextmanager
+    def checkout(self):
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise TimeoutError('Timed out waiting for an SMTP connection')
+        connection = None
+        try:
+            try:
+                connection, last_used = self._idle.get_nowait()
+                if not self._is_alive(connection, last_used):
+                    self._close(connection)
+                    connection = None
+            except Empty:
+                pass
+            if connection is None:
+                connection = self._open()
+            holder = [connection]
+            yield holder
+            connection = holder[0]
+            if connection is not None:
+                self._idle.put((connection, time.monotonic()))
+        except Exception:
+            if connection is not None:
+                self._close(connection)
+            raise
+        finally:
+            self._slots.release()
+
+    def send_batch(self, messages):
+        """Send messages over one pooled connection. Returns one error (or None) per message."""
+        errors = []
+        with self.checkout() as holder:
+            for msg in messages:
+                started = time.perf_counter()
+                try:
+                    try:
+                        holder[0].send(msg)
+                    except CONNECTION_ERRORS:
+                        # Stale session: reconnect once and retry this message.
+                        self._close(holder[0])
+                        holder[0] = None
+                        holder[0] = self._open()
+                        holder[0].send(msg)
+                    errors.append(None)
+                    self._record(time.perf_counter() - started, ok=True)
+                except Exception as e:
+                    logger.error('Error sending email to %s: %s', msg.recipients, e)
+                    errors.append(e)
+                    self._record(time.perf_counter() - started, ok=False)
+                    if holder[0] is None:
+                        break
+        errors.extend([ConnectionError('SMTP connection lost')] * (len(messages) - len(errors)))
+        return errors
+
+    def send(self, msg):
+        error = self.send_batch([msg])[0]
+        if error is not None:
+            raise error
+
+    def _record(self, seconds, ok):
+        with self._stats_lock:
+            if ok:
+                self.sent += 1
+            else:
+                self.failed += 1
+            self.send_seconds += seconds
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'sent': self.sent,
+                'failed': self.failed,
+                'connects': self.connects,
+                'send_seconds': self.send_seconds,
+                'idle_connections': self._idle.qsize(),
+            }
+
+    def close_all(self):
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except Empty:
+                return
+            self._close(connection)
+
+
+mail_pool = MailPool()
+
+
+def init_mail_pool(app):
+    mail_pool.configure(app.config['MAIL_POOL_SIZE'], app.config['MAIL_POOL_MAX_IDLE'])
+    return mail_pool
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+import logging
+import time
+from bisect import bisect_left
+from threading import Lock
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event, func
+from sqlalchemy.engine import Engine
+from app.extensions import db
+from app.models import Job
+from app.utils.job_queue import PENDING, RUNNING
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+UNMATCHED = '<unmatched>'
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, _labels(self.labels, key), value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+
+class Histogram:
+    """Cumulative-bucket histogram; one lock round-trip and a bisect per observation."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            snapshot = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        out = []
+        for key, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket
+                out.append((f'{self.name}_bucket', _labels(self.labels, key, [('le', _number(bound))]), cumulative))
+            out.append((f'{self.name}_sum', _labels(self.labels, key), total))
+            out.append((f'{self.name}_count', _labels(self.labels, key), count))
+        return out
+
+
+class Registry:
+    """Metrics owned by this process plus collectors that read other components' stats at scrape time.
+
+    Under a multi-worker server every worker keeps its own numbers; Prometheus
+    sums them per instance.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        families = [(m.name, m.kind, m.help, m.samples()) for m in self._metrics]
+        for collect in self._collectors:
+            try:
+                families.extend(collect())
+            except Exception:
+                logger.exception('Metrics collector %s failed', collect.__name__)
+        lines = []
+        for name, kind, help, samples in families:
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for sample_name, labels, value in samples:
+                lines.append(f'{sample_name}{labels} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.add(Histogram(
+    'http_request_duration_seconds', 'Time from before_request to the response being returned.',
+    ('method', 'endpoint'),
+))
+REQUESTS = registry.add(Counter(
+    'http_requests_total', 'Responses by endpoint and status code.', ('method', 'endpoint', 'status'),
+))
+IN_FLIGHT = registry.add(Gauge('http_requests_in_flight', 'Requests currently being handled.'))
+REQUEST_SQL_STATEMENTS = registry.add(Histogram(
+    'http_request_sql_statements', 'SQL statements executed per request.', ('endpoint',), SQL_COUNT_BUCKETS,
+))
+REQUEST_SQL_SECONDS = registry.add(Histogram(
+    'http_request_sql_seconds', 'Time spent executing SQL per request.', ('endpoint',),
+))
+SQL_STATEMENTS = registry.add(Counter(
+    'db_statements_total', 'SQL statements executed, including jobs and CLI commands.',
+))
+SQL_SECONDS = registry.add(Counter('db_statement_seconds_total', 'Time spent executing SQL statements.'))
+POOL_CHECKOUT_SECONDS = registry.add(Histogram(
+    'db_pool_checkout_seconds', 'Time to get a connection from the pool, including opening new ones.',
+    ('bind',), POOL_WAIT_BUCKETS,
+))
+
+
+def _endpoint():
+    rule = request.url_rule
+    return rule.rule if rule is not None else UNMATCHED
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    g.sql_statements = 0
+    g.sql_seconds = 0.0
+    IN_FLIGHT.inc()
+
+
+def _finish_request(response):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return response
+    IN_FLIGHT.dec()
+    endpoint = _endpoint()
+    REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, endpoint)
+    REQUESTS.inc(request.method, endpoint, str(response.status_code))
+    REQUEST_SQL_STATEMENTS.observe(g.sql_statements, endpoint)
+    REQUEST_SQL_SECONDS.observe(g.sql_seconds, endpoint)
+    return response
+
+
+def _abandon_request(exc):
+    # after_request did not run (e.g. the error handler itself failed).
+    if g.pop('metrics_started', None) is not None:
+        IN_FLIGHT.dec()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('metrics_started')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    SQL_STATEMENTS.inc()
+    SQL_SECONDS.inc(amount=elapsed)
+    if has_request_context() and 'sql_statements' in g:
+        g.sql_statements += 1
+        g.sql_seconds += elapsed
+
+
+def _discard_failed_statement(context):
+    # after_cursor_execute does not fire for a statement that raised. This must
+    # never raise itself, or it would replace the original DBAPI error.
+    if context.connection is None:
+        return
+    try:
+        starts = context.connection.info.get('metrics_started')
+    except Exception:
+        return
+    if starts:
+        starts.pop()
+
+
+def instrument_pool(engine, bind):
+    """Time ``pool.connect()``, which is where a request blocks when the pool is exhausted.
+
+    The pool emits no event before a checkout starts, so the bound method is
+    wrapped on this pool instance.
+    """
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started, bind)
+
+    pool.connect = timed_connect
+
+
+def _gauge(name, help, samples, kind='gauge'):
+    return (name, kind, help, samples)
+
+
+def _stat_families(prefix, stats, help, labels=''):
+    """One family per numeric entry of a component's stats() dict."""
+    families = []
+    for key, value in stats.items():
+        if isinstance(value, bool) or isinstance(value, (int, float)):
+            families.append(_gauge(f'{prefix}_{key}', f'{help}: {key}.', [(f'{prefix}_{key}', labels, value)]))
+    return families
+
+
+@registry.collector
+def _pool_families():
+    samples = {'size': [], 'checked_out': [], 'overflow': []}
+    for bind, engine in db.engines.items():
+        pool = engine.pool
+        label = _labels(('bind',), (bind or 'default',))
+        for key, method in (('size', 'size'), ('checked_out', 'checkedout'), ('overflow', 'overflow')):
+            if hasattr(pool, method):
+                samples[key].append((f'db_pool_{key}', label, getattr(pool, method)()))
+    return [_gauge(f'db_pool_{key}', f'Connection pool {key.replace("_", " ")}.', values)
+            for key, values in samples.items()]
+
+
+@registry.collector
+def _job_families():
+    rows = db.session.execute(
+        db.select(Job.kind, Job.status, func.count(Job.id))
+        .where(Job.status.in_((PENDING, RUNNING)))
+        .group_by(Job.kind, Job.status)
+    ).all()
+    db.session.rollback()
+    samples = [('job_queue_depth', _labels(('kind', 'status'), (kind, status)), count) for kind, status, count in rows]
+    return [_gauge('job_queue_depth', 'Jobs waiting or running, by kind (email jobs are the mail queue).', samples)]
+
+
+@registry.collector
+def _component_families():
+    from app.utils.holds import broker
+    from app.utils.mail_pool import mail_pool
+
+    extensions = current_app.extensions
+    families = _stat_families('mail_pool', mail_pool.stats(), 'SMTP connection pool')
+    families.append(_gauge('hold_streams_open', 'Open hold SSE streams.',
+                           [('hold_streams_open', '', broker.open_streams())]))
+    if extensions.get('response_cache') is not None:
+        families += _stat_families('response_cache', extensions['response_cache'].stats(), 'Response cache')
+    if extensions.get('replica_monitor') is not None:
+        families += _stat_families('replica', extensions['replica_monitor'].stats(), 'Read replica')
+    if extensions.get('mpesa') is not None:
+        stats = extensions['mpesa'].stats()
+        families += _stat_families('mpesa', stats, 'M-Pesa client')
+        families.append(_gauge('mpesa_breaker_open', 'M-Pesa circuit breaker open.',
+                               [('mpesa_breaker_open', '', stats['breaker'] == 'open')]))
+    return families
+
+
+def render_metrics():
+    return registry.render()
+
+
+def init_metrics(app):
+    if not app.config['METRICS_ENABLED']:
+        return None
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_abandon_request)
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _discard_failed_statement)
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            instrument_pool(engine, bind or 'default')
+    app.extensions['metrics'] = registry
+    return registry
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+import base64
+import logging
+import time
+from datetime import datetime
+from threading import Lock
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATH = '/oauth/v1/generate'
+STK_PUSH_PATH = '/mpesa/stkpush/v1/processrequest'
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class MpesaError(Exception):
+    def __init__(self, msg, status=None, body=None):
+        super().__init__(msg)
+        self.status = status
+        self.body = body
+
+
+class CircuitOpen(MpesaError):
+    pass
+
+
+class CircuitBreaker:
+    """Stop calling Daraja after ``threshold`` consecutive failures.
+
+    Once open, calls fail fast for ``reset_timeout`` seconds; then a single
+    trial call is let through and its outcome closes or reopens the circuit.
+    """
+
+    def __init__(self, threshold=5, reset_timeout=30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+class MpesaClient:
+    """Daraja API client sharing one pooled HTTP session and OAuth token per process.
+
+    The token is reused until ``token_margin`` seconds before it expires and
+    only one thread fetches a replacement. Connection errors are retried for
+    every call; 5xx/429 responses only for GETs, because a retried STK push
+    would prompt the customer twice.
+    """
+
+    def __init__(self, base_url, consumer_key, consumer_secret, shortcode, passkey, callback_url,
+                 connect_timeout=3.05, read_timeout=10, retries=2, pool_size=10, token_margin=60,
+                 breaker=None):
+        self.base_url = base_url.rstrip('/')
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.shortcode = shortcode
+        self.passkey = passkey
+        self.callback_url = callback_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.token_margin = token_margin
+        self.breaker = breaker or CircuitBreaker()
+        self._token = None
+        self._token_expires_at = 0.0
+        self._token_lock = Lock()
+        self.token_fetches = 0
+
+        retry = Retry(
+            total=retries, connect=retries, read=retries, status=retries,
+            backoff_factor=0.3, status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({'GET'}), raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _request(self, method, path, **kwargs):
+        if not self.breaker.allow():
+            raise CircuitOpen('M-Pesa is temporarily unavailable')
+        failed = True
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+            failed = response.status_code >= 500
+        except requests.exceptions.RequestException as e:
+            raise MpesaError(f'M-Pesa request failed: {e}') from e
+        finally:
+            # Any exception counts as a failure, so a half-open trial is never left in flight.
+            if failed:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+        try:
+            body = response.json()
+        except ValueError:
+            body = {'raw': response.text[:500]}
+        if not response.ok:
+            raise MpesaError(f'M-Pesa returned HTTP {response.status_code}', response.status_code, body)
+        return body
+
+    def access_token(self):
+        if self._token and time.monotonic() < self._token_expires_at:
+            return self._token
+        with self._token_lock:
+            # Another thread may have refreshed it while we waited.
+            if self._token and time.monotonic() < self._token_expires_at:
+                return self._token
+            body = self._request(
+                'GET', TOKEN_PATH, params={'grant_type': 'client_credentials'},
+                auth=(self.consumer_key, self.consumer_secret),
+            )
+            token = body.get('access_token')
+            if not token:
+                raise MpesaError('M-Pesa returned no access token', body=body)
+            expires_in = int(body.get('expires_in', 3599))
+            self._token = token
+            self._token_expires_at = time.monotonic() + max(expires_in - self.token_margin, 0)
+            self.token_fetches += 1
+            return token
+
+    def invalidate_token(self, token):
+        with self._token_lock:
+            if self._token == token:
+                self._token = None
+
+    def stk_payload(self, phone, amount):
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+        password = base64.b64encode((self.shortcode + self.passkey + timestamp).encode()).decode()
+        return {
+            "BusinessShortCode": self.shortcode,
+            "Password": password,
+            "Timestamp": timestamp,
+            "TransactionType": "CustomerPayBillOnline",
+            "Amount": int(amount),
+            "PartyA": phone,
+            "PartyB": self.shortcode,
+            "PhoneNumber": phone,
+            "CallBackURL": self.callback_url,
+            "AccountReference": "LibraryFine",
+            "TransactionDesc": "Library Fine Payment"
+        }
+
+    def stk_push(self, phone, amount):
+        payload = self.stk_payload(phone, amount)
+        token = self.access_token()
+        try:
+            return self._request('POST', STK_PUSH_PATH, json=payload, headers={'Authorization': f'Bearer {token}'})
+        except MpesaError as e:
+            if e.status != 401:
+                raise
+            # Token revoked early on Safaricom's side: fetch a new one and try once more.
+            self.invalidate_token(token)
+            token = self.access_token()
+            return self._request('POST', STK_PUSH_PATH, json=payload, headers={'Authorization': f'Bearer {token}'})
+
+    def stats(self):
+        return {
+            'breaker': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+            'token_fetches': self.token_fetches,
+        }
+
+    def close(self):
+        self.session.close()
+
+
+def init_mpesa_client(app):
+    config = app.config
+    client = MpesaClient(
+        base_url=config['MPESA_BASE_URL'],
+        consumer_key=config['MPESA_CONSUMER_KEY'],
+        consumer_secret=config['MPESA_CONSUMER_SECRET'],
+        shortcode=config['MPESA_SHORTCODE'],
+        passkey=config['MPESA_PASSKEY'] or '',
+        callback_url=config['MPESA_CALLBACK_URL'],
+        connect_timeout=config['MPESA_CONNECT_TIMEOUT'],
+        read_timeout=config['MPESA_READ_TIMEOUT'],
+        retries=config['MPESA_RETRIES'],
+        pool_size=config['MPESA_POOL_SIZE'],
+        breaker=CircuitBreaker(config['MPESA_BREAKER_THRESHOLD'], config['MPESA_BREAKER_RESET']),
+    )
+    app.extensions['mpesa'] = client
+    return client
+
+
+def get_mpesa_client():
+    return current_app.extensions['mpesa']
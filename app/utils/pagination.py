@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+import base64
+import json
+from datetime import datetime
+from flask import request
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import load_only
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def page_limit():
+    raw = request.args.get('limit')
+    if raw is None or raw == '':
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be at least 1')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def requested_fields(allowed):
+    """Parse ``?fields=a,b`` against the allowed names. ``None`` means everything."""
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def project(query, model, fields):
+    """Only load the mapped columns backing ``fields`` (the primary key is always loaded)."""
+    if fields is None:
+        return query
+    columns = [getattr(model, f) for f in fields if f in model.__table__.columns]
+    return query.options(load_only(*columns)) if columns else query.options(load_only(model.id))
+
+
+def _encode_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _decode_value(column, value):
+    python_type = getattr(column.type, 'python_type', None)
+    if python_type is datetime and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def encode_cursor(values):
+    payload = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, sort_keys):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(sort_keys):
+        raise PaginationError('Invalid cursor')
+    return [_decode_value(column, v) for (column, _), v in zip(sort_keys, values)]
+
+
+def _after(sort_keys, values):
+    # (a, b) > (x, y) expanded as a > x OR (a = x AND b > y), honouring each key's direction.
+    clauses = []
+    for i, (column, descending) in enumerate(sort_keys):
+        prefix = [c == v for (c, _), v in zip(sort_keys[:i], values[:i])]
+        step = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*prefix, step))
+    return or_(*clauses)
+
+
+def keyset_page(query, sort_keys, limit=None, cursor=None):
+    """Fetch one page of ``query`` ordered by ``sort_keys``.
+
+    ``sort_keys`` is a list of ``(column, descending)`` pairs whose last entry
+    must be unique (normally the primary key). Returns ``(rows, next_cursor)``.
+    """
+    limit = page_limit() if limit is None else limit
+    cursor = request.args.get('cursor') if cursor is None else cursor
+    if cursor:
+        query = query.filter(_after(sort_keys, decode_cursor(cursor, sort_keys)))
+    order = [column.desc() if descending else column.asc() for column, descending in sort_keys]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column, _ in sort_keys])
+    return rows, next_cursor
+
+
+def with_cursor(response, next_cursor):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+import os
+from concurrent.futures import ProcessPoolExecutor
+from threading import BoundedSemaphore, Lock
+import bcrypt
+
+
+class HasherBusy(Exception):
+    """Raised instead of queueing when the hashing pool is saturated."""
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(password_hash, password):
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+def hash_rounds(password_hash):
+    # $2b$12$<salt+hash>
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """Runs bcrypt in a bounded process pool so request threads only wait on a future.
+
+    At most ``workers + max_pending`` hashes are in flight; beyond that calls
+    fail fast with HasherBusy. ``workers=0`` hashes inline in the caller.
+    Bulk imports use a separate pool of ``bulk_workers`` processes, so a
+    large import never queues ahead of logins and registrations.
+    """
+
+    def __init__(self, workers=0, max_pending=0, rounds=12, timeout=10, bulk_workers=1):
+        self.configure(workers, max_pending, rounds, timeout, bulk_workers)
+        self._executor = None
+        self._bulk_executor = None
+        self._executor_lock = Lock()
+
+    def configure(self, workers, max_pending, rounds, timeout=10, bulk_workers=1):
+        self.workers = workers
+        self.bulk_workers = bulk_workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.timeout = timeout
+        self._slots = BoundedSemaphore(max(workers + max_pending, 1))
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _get_bulk_executor(self):
+        with self._executor_lock:
+            if self._bulk_executor is None:
+                self._bulk_executor = ProcessPoolExecutor(max_workers=self.bulk_workers)
+            return self._bulk_executor
+
+    def _submit(self, fn, *args):
+        if self.workers == 0:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy('Password hashing pool is full')
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # Free the slot when the work finishes, not when the caller stops waiting:
+        # a timed-out hash still occupies a worker.
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result(timeout=self.timeout)
+
+    def hash(self, password):
+        return self._submit(_hash, password, self.rounds)
+
+    def check(self, password_hash, password):
+        return self._submit(_check, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return hash_rounds(password_hash) != self.rounds
+
+    def hash_many(self, passwords, chunksize=16):
+        """Hash a batch (bulk imports) on the bulk pool, leaving the request pool free."""
+        rounds = [self.rounds] * len(passwords)
+        if self.workers == 0:
+            return list(map(_hash, passwords, rounds))
+        return list(self._get_bulk_executor().map(_hash, passwords, rounds, chunksize=chunksize))
+
+    def shutdown(self):
+        with self._executor_lock:
+            for executor in (self._executor, self._bulk_executor):
+                if executor is not None:
+                    executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._bulk_executor = None
+
+
+password_hasher = PasswordHasher()
+
+
+def init_password_hasher(app):
+    workers = app.config['PASSWORD_HASH_WORKERS']
+    if workers is None:
+        workers = os.cpu_count() or 1
+    bulk_workers = app.config['PASSWORD_HASH_BULK_WORKERS']
+    if bulk_workers is None:
+        bulk_workers = max((os.cpu_count() or 1) // 2, 1)
+    password_hasher.configure(
+        workers,
+        app.config['PASSWORD_HASH_MAX_PENDING'],
+        app.config['BCRYPT_LOG_ROUNDS'],
+        app.config['PASSWORD_HASH_TIMEOUT'],
+        bulk_workers,
+    )
+    return password_hasher
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+import logging
+import re
+from datetime import datetime
+from itertools import groupby
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import Debt, Payment, User
+from app.utils.emailer import queue_email
+from app.utils.fines import adjust_balance, settle_debts, take_credit
+from app.utils.job_queue import enqueue, job_handler
+from app.utils.pdf_generator import receipt_document, receipt_renderer, statement_document
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+PAID = 'paid'
+FAILED = 'failed'
+UNMATCHED = 'unmatched'
+RECEIPT_JOB = 'payment-receipt'
+STATEMENT_BATCH_SIZE = 500
+
+PHONE_REGEX = re.compile(r'^(?:\+?254|0)?([17]\d{8})$')
+
+
+def normalize_phone(value):
+    """Kenyan mobile number as 2547XXXXXXXX / 2541XXXXXXXX, or None if it is not one."""
+    if value is None:
+        return None
+    match = PHONE_REGEX.match(re.sub(r'[\s-]', '', str(value)))
+    return f'254{match.group(1)}' if match else None
+
+
+def record_checkout(user_id, phone, amount, response):
+    """Add a pending ledger row for an STK push Safaricom accepted. Caller commits.
+
+    The user's phone is remembered when they have none yet and no one else uses it.
+    """
+    payment = Payment(
+        checkout_request_id=response['CheckoutRequestID'],
+        merchant_request_id=response.get('MerchantRequestID'),
+        user_id=user_id,
+        phone=phone,
+        amount=amount,
+        status=PENDING,
+    )
+    db.session.add(payment)
+    user = db.session.get(User, int(user_id))
+    if user is not None and user.phone is None and not User.query.filter_by(phone=phone).first():
+        user.phone = phone
+    return payment
+
+
+def parse_callback(data):
+    result = (data or {}).get('Body', {}).get('stkCallback', {})
+    items = {item.get('Name'): item.get('Value') for item in result.get('CallbackMetadata', {}).get('Item', [])}
+    return result, items
+
+
+def _claim(checkout_id, result, items):
+    """Move the ledger row out of 'pending'. Returns False when this callback was already applied."""
+    values = {
+        'status': PAID if result.get('ResultCode') == 0 else FAILED,
+        'result_code': result.get('ResultCode'),
+        'result_desc': (result.get('ResultDesc') or '')[:255],
+        'completed_at': datetime.utcnow(),
+    }
+    if values['status'] == PAID:
+        values['mpesa_receipt'] = items.get('MpesaReceiptNumber')
+        if items.get('Amount') is not None:
+            values['amount'] = float(items['Amount'])
+    try:
+        with db.session.begin_nested():
+            # Only one delivery can flip a pending row, however many arrive at once.
+            claimed = db.session.execute(
+                update(Payment)
+                .where(Payment.checkout_request_id == checkout_id, Payment.status == PENDING)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if claimed:
+                return True
+            if db.session.scalar(select(Payment.id).where(Payment.checkout_request_id == checkout_id)):
+                return False
+            # A push this ledger never saw, e.g. one started before it existed.
+            db.session.add(Payment(
+                checkout_request_id=checkout_id,
+                merchant_request_id=result.get('MerchantRequestID'),
+                phone=normalize_phone(items.get('PhoneNumber')),
+                amount=values.pop('amount', 0.0),
+                **values,
+            ))
+            db.session.flush()
+            return True
+    except IntegrityError:
+        # Same receipt number already recorded, or a concurrent delivery inserted first.
+        return False
+
+
+def process_callback(data):
+    """Apply one STK callback to the ledger and settle the payer's debts. Caller commits.
+
+    The payment plus any stored credit settles debts oldest first for as long
+    as it covers them; whatever is left over is stored as credit.
+
+    Returns the payment, or None for a duplicate delivery, which costs one
+    indexed UPDATE and one indexed SELECT. The receipt is left to a job.
+    """
+    result, items = parse_callback(data)
+    checkout_id = result.get('CheckoutRequestID')
+    if not checkout_id:
+        raise ValueError('Callback has no CheckoutRequestID')
+    if not _claim(checkout_id, result, items):
+        return None
+    payment = Payment.query.filter_by(checkout_request_id=checkout_id).one()
+    if payment.status != PAID:
+        return payment
+
+    if payment.user_id is None:
+        user = User.query.filter_by(phone=normalize_phone(items.get('PhoneNumber'))).first()
+        if user is None:
+            payment.status = UNMATCHED
+            return payment
+        payment.user_id = user.id
+    debts, remaining = [], payment.amount + take_credit(payment.user_id)
+    for debt in Debt.query.filter_by(user_id=payment.user_id, paid=False).order_by(Debt.id):
+        if debt.fine_amount > remaining:
+            break
+        debts.append(debt)
+        remaining -= debt.fine_amount
+    payment.settled_amount = settle_debts(payment.user_id, debts)
+    if remaining > 0:
+        # Too little for the next debt (or nothing left owing): stored, and spent with the next payment.
+        adjust_balance(payment.user_id, 0, 0, credit=remaining)
+    if debts:
+        enqueue(RECEIPT_JOB, {'payment_id': payment.id, 'debt_ids': [d.id for d in debts]},
+                idempotency_key=f'{RECEIPT_JOB}:{payment.id}')
+    return payment
+
+
+@job_handler(RECEIPT_JOB)
+def send_receipt(payload):
+    payment = db.session.get(Payment, payload['payment_id'])
+    if payment is None or payment.user is None:
+        logger.warning('Skipping receipt for missing payment %s', payload['payment_id'])
+        return
+    debts = Debt.query.filter(Debt.id.in_(payload['debt_ids'])).order_by(Debt.id).all()
+    document = receipt_document(payment.user, debts, payment.amount, (payment.completed_at or payment.created_at).date())
+    queue_email(
+        [payment.user.email],
+        "Library Receipt for Fine Payment",
+        "Thank you for your payment. Find your receipt attached",
+        attachment=(f'receipt_{payment.id}.pdf', receipt_renderer.render(document)),
+        idempotency_key=f'receipt-email:{payment.id}',
+    )
+    db.session.commit()
+
+
+def send_statements(month, batch_size=STATEMENT_BATCH_SIZE):
+    """Queue a PDF statement for every member with paid payments in ``month``. Returns how many.
+
+    Members are processed ``batch_size`` at a time: their statements are
+    rendered across the whole pool with render_many, then queued and committed.
+    Re-running for the same month does not send anyone a second statement.
+    """
+    start = month.replace(day=1)
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    payments = (
+        Payment.query
+        .filter(Payment.status == PAID, Payment.user_id.isnot(None),
+                Payment.completed_at >= start, Payment.completed_at < end)
+        .order_by(Payment.user_id, Payment.completed_at)
+        .yield_per(1000)
+    )
+    members = [(user_id, list(rows)) for user_id, rows in groupby(payments, key=lambda p: p.user_id)]
+    users = {u.id: u for u in User.query.filter(User.id.in_([user_id for user_id, _ in members]))} if members else {}
+
+    sent = 0
+    for offset in range(0, len(members), batch_size):
+        batch = [(users[user_id], rows) for user_id, rows in members[offset:offset + batch_size]]
+        documents = [statement_document(user, rows, start) for user, rows in batch]
+        for (user, _), pdf in zip(batch, receipt_renderer.render_many(documents)):
+            queue_email(
+                [user.email],
+                f"Library Statement for {start:%B %Y}",
+                "Your fine payments for the month are attached.",
+                attachment=(f'statement_{start:%Y_%m}_{user.id}.pdf', pdf),
+                idempotency_key=f'statement:{start:%Y-%m}:{user.id}',
+            )
+        db.session.commit()
+        sent += len(batch)
+    return sent
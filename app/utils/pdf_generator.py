@@ -3,41 +3,143 @@ from fpdf import FPDF
 import os
 import datetime
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from threading import BoundedSemaphore, Lock
 
 os.makedirs("logs", exist_ok=True)
 
 logging.basicConfig(filename='logs/pdf_errors.log', level=logging.ERROR, format='%(asctime)s %(levelname)s:%(message)s')
 
-def generate_receipt_pdf(user, debts, amount_paid):
-    try:
-        if not user or not debts:
-            raise ValueError('User or debts information missing')
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size = 15)
-
-        pdf.cell(200, 10, txt="Library Payment Receipts", ln=True, align='C')
-        pdf.ln(5)
-        pdf.cell(200, 10, txt=f"Name: {user.name}", ln=True)
-        pdf.cell(200, 10, txt=f"Email: {user.email}", ln=True)
-        pdf.cell(200, 10, txt=f"Amount Paid: KES {amount_paid:.2f}", ln=True)
-        pdf.cell(200, 10, txt=f"Date: {datetime.date.today()}", ln=True)
-        pdf.ln(10)
-
-        pdf.cell(200, 10, txt="Cleared Debt:", ln=True)
-        for d in debts:
-            title = d.book.title if d.book else "Unknown Book"
-            amount = d.fine_amount if d.fine_amount else 0.0
-            pdf.cell(200,10, txt=f"{title} - KES {amount:.2f}", ln=True)
-
-        receipt_dir = "receipts"
-        os.makedirs(receipt_dir, exist_ok=True)
-
-        timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-        path = os.path.join(receipt_dir, f"receipt_{user.id}_{timestamp}.pdf")
-        pdf.output(path)
-        return path
-    except Exception as e:
-        logging.error(f"Error generating receipt PDF: {str(e)}", exc_info=True)
-        return None
-    
\ No newline at end of file
+RECEIPT_TITLE = "Library Payment Receipts"
+STATEMENT_TITLE = "Library Monthly Statement"
+FONT_FAMILY, FONT_SIZE = "Arial", 15
+LINE_WIDTH, LINE_HEIGHT = 200, 10
+
+
+class RendererBusy(Exception):
+    """Raised instead of queueing when the rendering pool is saturated."""
+
+
+def _text(value):
+    # FPDF core fonts are latin-1 only; anything else becomes '?' instead of failing the render.
+    return str(value).encode('latin-1', 'replace').decode('latin-1')
+
+
+def receipt_document(user, debts, amount_paid, date=None):
+    """Everything a receipt shows, as plain data that pickles cheaply to a worker process."""
+    return {
+        'title': RECEIPT_TITLE,
+        'name': user.name,
+        'email': user.email,
+        'amount': float(amount_paid),
+        'date': (date or datetime.date.today()).isoformat(),
+        'heading': "Cleared Debt:",
+        'lines': [
+            (d.book.title if d.book else "Unknown Book", d.fine_amount if d.fine_amount else 0.0)
+            for d in debts
+        ],
+    }
+
+
+def statement_document(user, payments, month):
+    """A month's completed payments for one member, in the receipt_document() shape."""
+    return {
+        'title': STATEMENT_TITLE,
+        'name': user.name,
+        'email': user.email,
+        'amount': float(sum(p.amount for p in payments)),
+        'date': month.strftime('%B %Y'),
+        'heading': "Payments:",
+        'lines': [(f"{p.completed_at:%Y-%m-%d} {p.mpesa_receipt or ''}".strip(), p.amount) for p in payments],
+    }
+
+
+def render_receipt_pdf(document):
+    """Render a receipt_document() to PDF bytes, entirely in memory."""
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font(FONT_FAMILY, size=FONT_SIZE)
+
+    pdf.cell(LINE_WIDTH, LINE_HEIGHT, txt=document['title'], ln=True, align='C')
+    pdf.ln(5)
+    pdf.cell(LINE_WIDTH, LINE_HEIGHT, txt=_text(f"Name: {document['name']}"), ln=True)
+    pdf.cell(LINE_WIDTH, LINE_HEIGHT, txt=_text(f"Email: {document['email']}"), ln=True)
+    pdf.cell(LINE_WIDTH, LINE_HEIGHT, txt=f"Amount Paid: KES {document['amount']:.2f}", ln=True)
+    pdf.cell(LINE_WIDTH, LINE_HEIGHT, txt=f"Date: {document['date']}", ln=True)
+    pdf.ln(10)
+
+    pdf.cell(LINE_WIDTH, LINE_HEIGHT, txt=document['heading'], ln=True)
+    for label, amount in document['lines']:
+        pdf.cell(LINE_WIDTH, LINE_HEIGHT, txt=_text(f"{label} - KES {amount:.2f}"), ln=True)
+    return pdf.output(dest='S').encode('latin-1')
+
+
+class ReceiptRenderer:
+    """Renders receipts in a bounded process pool so PDF work never holds the GIL of a web worker.
+
+    ``workers=0`` renders inline in the caller. Single renders fail fast with
+    RendererBusy once ``workers + max_pending`` are in flight; batches use
+    render_many, which spreads chunks over every worker.
+    """
+
+    def __init__(self, workers=0, max_pending=0, timeout=30):
+        self.configure(workers, max_pending, timeout)
+        self._executor = None
+        self._executor_lock = Lock()
+
+    def configure(self, workers, max_pending, timeout=30):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = BoundedSemaphore(max(workers + max_pending, 1))
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _submit(self, fn, *args):
+        if self.workers == 0:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise RendererBusy('Receipt rendering pool is full')
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # Free the slot when the render finishes, not when the caller stops waiting:
+        # a timed-out render still occupies a worker.
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result(timeout=self.timeout)
+
+    def render(self, document):
+        return self._submit(render_receipt_pdf, document)
+
+    def render_many(self, documents, chunksize=32):
+        """Render a batch (e.g. month-end statements); results come back in input order."""
+        if self.workers == 0:
+            return [render_receipt_pdf(document) for document in documents]
+        return list(self._get_executor().map(render_receipt_pdf, documents, chunksize=chunksize))
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+receipt_renderer = ReceiptRenderer()
+
+
+def init_receipt_renderer(app):
+    workers = app.config['RECEIPT_RENDER_WORKERS']
+    if workers is None:
+        workers = os.cpu_count() or 1
+    receipt_renderer.configure(
+        workers,
+        app.config['RECEIPT_RENDER_MAX_PENDING'],
+        app.config['RECEIPT_RENDER_TIMEOUT'],
+    )
+    return receipt_renderer
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from flask import current_app, g, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'X-Profile'
+QUERY_FLAG = '_profile'
+TOKEN_SALT = 'request-profile'
+PROFILE_ID = re.compile(r'^\d{8}T\d{6}-[0-9a-f]{8}$')
+FORMATS = {'pstats': 'application/octet-stream', 'folded': 'text/plain'}
+
+# One profile at a time per process: cProfile is per thread, but two at once
+# would double the overhead on an already slow worker.
+_active = threading.Lock()
+
+
+class StackSampler:
+    """Samples one thread's Python stack every ``interval`` seconds into collapsed-stack counts."""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}")
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """flamegraph.pl / speedscope input: one 'frame;frame;frame count' line per distinct stack."""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.counts.most_common())
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=TOKEN_SALT)
+
+
+def issue_token(user_id):
+    return _serializer().dumps({'by': user_id})
+
+
+def _requested_by():
+    token = request.headers.get(HEADER) or request.args.get(QUERY_FLAG)
+    if not token:
+        return None
+    try:
+        return _serializer().loads(token, max_age=current_app.config['PROFILE_TOKEN_MAX_AGE'])['by']
+    except (BadSignature, KeyError, TypeError):
+        logger.info('Ignoring invalid %s token on %s', HEADER, request.path)
+        return None
+
+
+def _start_profile():
+    requested_by = _requested_by()
+    if requested_by is None:
+        rate = current_app.config['PROFILE_SAMPLE_RATE']
+        if not rate or random.random() >= rate:
+            return
+    if not _active.acquire(blocking=False):
+        return
+    # A signed request gets cProfile as well; random samples only pay for the stack sampler.
+    profile = cProfile.Profile() if requested_by is not None else None
+    g.profile = {
+        'requested_by': requested_by,
+        'started': time.perf_counter(),
+        'cprofile': profile,
+        'sampler': StackSampler(threading.get_ident(), current_app.config['PROFILE_SAMPLE_INTERVAL_MS'] / 1000.0).start(),
+    }
+    if profile is not None:
+        profile.enable()
+
+
+def _finish_profile(response):
+    state = g.pop('profile', None)
+    if state is None:
+        return response
+    try:
+        if state['cprofile'] is not None:
+            state['cprofile'].disable()
+        state['sampler'].stop()
+        duration = time.perf_counter() - state['started']
+        profile_id = store_profile(state, response.status_code, duration)
+        response.headers['X-Profile-Id'] = profile_id
+    except Exception:
+        logger.exception('Saving request profile failed')
+    finally:
+        _active.release()
+    return response
+
+
+def _abandon_profile(exc):
+    state = g.pop('profile', None)
+    if state is not None:
+        if state['cprofile'] is not None:
+            state['cprofile'].disable()
+        state['sampler'].stop()
+        _active.release()
+
+
+def profile_dir():
+    return current_app.config['PROFILE_DIR']
+
+
+def store_profile(state, status, duration):
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    profile_id = f'{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}'
+    rule = request.url_rule
+    meta = {
+        'id': profile_id,
+        'method': request.method,
+        'path': request.path,
+        'endpoint': rule.rule if rule is not None else None,
+        'status': status,
+        'duration_ms': round(duration * 1000, 2),
+        'trigger': 'signed' if state['requested_by'] is not None else 'sampled',
+        'requested_by': state['requested_by'],
+        'samples': sum(state['sampler'].counts.values()),
+        'created_at': datetime.utcnow().isoformat(),
+        'formats': ['folded'],
+    }
+    with open(os.path.join(directory, f'{profile_id}.folded'), 'w') as f:
+        f.write(state['sampler'].collapsed())
+    if state['cprofile'] is not None:
+        state['cprofile'].dump_stats(os.path.join(directory, f'{profile_id}.pstats'))
+        meta['formats'].append('pstats')
+    with open(os.path.join(directory, f'{profile_id}.json'), 'w') as f:
+        json.dump(meta, f)
+    prune_profiles(directory, current_app.config['PROFILE_MAX_FILES'], current_app.config['PROFILE_MAX_BYTES'])
+    return profile_id
+
+
+def _profile_files(directory, profile_id):
+    return [os.path.join(directory, f'{profile_id}.{ext}') for ext in ('json', *FORMATS)]
+
+
+def prune_profiles(directory, max_profiles, max_bytes):
+    """Delete the oldest profiles until at most ``max_profiles`` remain within ``max_bytes``."""
+    profiles = []
+    for name in os.listdir(directory):
+        profile_id, ext = os.path.splitext(name)
+        if ext == '.json' and PROFILE_ID.match(profile_id):
+            paths = [path for path in _profile_files(directory, profile_id) if os.path.exists(path)]
+            try:
+                profiles.append((os.path.getmtime(paths[0]), profile_id, sum(os.path.getsize(path) for path in paths)))
+            except (IndexError, OSError):
+                # Another worker pruned it meanwhile.
+                continue
+    profiles.sort()
+    total = sum(size for _, _, size in profiles)
+    while profiles and (len(profiles) > max_profiles or total > max_bytes):
+        _, profile_id, size = profiles.pop(0)
+        delete_profile(profile_id, directory)
+        total -= size
+
+
+def list_profiles():
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in os.listdir(directory):
+        profile_id, ext = os.path.splitext(name)
+        if ext == '.json' and PROFILE_ID.match(profile_id):
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return sorted(profiles, key=lambda meta: meta['created_at'], reverse=True)
+
+
+def profile_path(profile_id, fmt):
+    """Path of a stored profile file, or None; ids are validated so they cannot escape PROFILE_DIR."""
+    if not PROFILE_ID.match(profile_id) or fmt not in FORMATS:
+        return None
+    path = os.path.join(os.path.abspath(profile_dir()), f'{profile_id}.{fmt}')
+    return path if os.path.exists(path) else None
+
+
+def delete_profile(profile_id, directory=None):
+    if not PROFILE_ID.match(profile_id):
+        return False
+    removed = False
+    for path in _profile_files(directory or profile_dir(), profile_id):
+        try:
+            os.remove(path)
+            removed = True
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def init_profiler(app):
+    if not app.config['PROFILING_ENABLED']:
+        return None
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_abandon_profile)
+    return app
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+import logging
+from datetime import datetime, timedelta
+from threading import Thread, Event, Lock
+from sqlalchemy import and_, or_, update
+from app.extensions import db
+from app.models import Book, Borrow, User
+from app.utils.emailer import queue_email
+from app.utils.fines import schedule_accrual
+from app.utils.holds import sweep_holds
+from app.utils.job_queue import prune_finished_jobs
+
+logger = logging.getLogger(__name__)
+
+REMINDER_WINDOW = timedelta(days=2)
+SWEEP_CHUNK_SIZE = 1000
+
+_scheduler = None
+_scheduler_lock = Lock()
+
+
+def _digest_body(items):
+    lines = '\n'.join(
+        f"    - **\"{title}\"** due on **{due_date.strftime('%Y-%m-%d')}**" for _, title, due_date in items
+    )
+    return f"""
+    Hello,
+
+    This is a reminder that the following borrowed books are due soon:
+
+{lines}
+
+    Please return them on time to avoid late fees.
+
+    Thank you!
+
+    Library Management System
+    """
+
+
+def _send_digest(user_id, email, items, now):
+    borrow_ids = [borrow_id for borrow_id, _, _ in items]
+    # The marker update and the email job commit together, so a restart never resends.
+    with db.session.begin_nested() as savepoint:
+        result = db.session.execute(
+            update(Borrow)
+            .where(Borrow.id.in_(borrow_ids), Borrow.reminder_sent_at.is_(None))
+            .values(reminder_sent_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(borrow_ids):
+            # Another sweeper got to some of these rows first; let it send the digest.
+            savepoint.rollback()
+            return False
+        queue_email(
+            [email], "⏳ Book Return Reminder!", _digest_body(items),
+            idempotency_key=f'reminder-digest:{user_id}:{borrow_ids[0]}:{len(borrow_ids)}'
+        )
+    return True
+
+
+def sweep_reminders(now=None, chunk_size=SWEEP_CHUNK_SIZE):
+    """Send one digest per user for open borrows due within the reminder window.
+
+    Open, un-reminded borrows are walked in (user_id, id) keyset chunks along
+    ix_borrow_reminder_scan, so no chunk is sorted and memory stays bounded by
+    one chunk plus one user's borrows. The due-date window is checked against
+    the index's trailing due_date column, so rows outside it are skipped
+    without reading the table.
+    """
+    now = now or datetime.utcnow()
+    window_end = now + REMINDER_WINDOW
+    last_user_id, last_id = 0, 0
+    current_user, current_email, items = None, None, []
+    sent = 0
+
+    while True:
+        rows = (
+            db.session.query(Borrow.id, Borrow.user_id, Borrow.due_date, User.email, Book.title)
+            .join(User, Borrow.user_id == User.id)
+            .join(Book, Borrow.book_id == Book.id)
+            .filter(
+                Borrow.returned == False,
+                Borrow.reminder_sent_at.is_(None),
+                Borrow.due_date >= now,
+                Borrow.due_date <= window_end,
+                or_(Borrow.user_id > last_user_id, and_(Borrow.user_id == last_user_id, Borrow.id > last_id)),
+            )
+            .order_by(Borrow.user_id, Borrow.id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not rows:
+            break
+
+        for row in rows:
+            if row.user_id != current_user:
+                if items and _send_digest(current_user, current_email, items, now):
+                    sent += 1
+                current_user, current_email, items = row.user_id, row.email, []
+            items.append((row.id, row.title, row.due_date))
+
+        last_user_id, last_id = rows[-1].user_id, rows[-1].id
+        db.session.commit()
+
+    if items and _send_digest(current_user, current_email, items, now):
+        sent += 1
+    db.session.commit()
+    return sent
+
+
+class ReminderScheduler:
+    """Runs the sweeper, plus any extra periodic tasks, on a fixed interval in a background thread."""
+
+    def __init__(self, app, interval, tasks=()):
+        self.app = app
+        self.interval = interval
+        self.tasks = tasks
+        self._stop = Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = Thread(target=self._loop, name='reminder-scheduler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    sent = sweep_reminders()
+                    if sent:
+                        logger.info('Queued %s reminder digests', sent)
+                except Exception:
+                    logger.exception('Reminder sweep failed')
+                    db.session.rollback()
+                for task in self.tasks:
+                    try:
+                        task()
+                    except Exception:
+                        logger.exception('Scheduled task %s failed', task.__name__)
+                        db.session.rollback()
+
+
+def start_scheduler(app):
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            # Accrual enqueueing is idempotent per day, hold sweeps use conditional
+            # updates and pruning only deletes, so every worker may run them.
+            _scheduler = ReminderScheduler(
+                app, app.config['REMINDER_SWEEP_INTERVAL'], tasks=(schedule_accrual, sweep_holds, prune_finished_jobs)
+            ).start()
+        return _scheduler
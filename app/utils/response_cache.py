@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from flask import current_app, make_response, request
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import Book, CacheVersion
+
+logger = logging.getLogger(__name__)
+
+CATALOG = 'catalog'
+ENTRY_OVERHEAD = 512
+CACHED_HEADERS = ('X-Next-Cursor',)
+# Filters the catalog matches case-insensitively, so 'Tolkien' and ' tolkien' share an entry.
+CASE_INSENSITIVE_PARAMS = frozenset(('title', 'author', 'category'))
+
+
+class ResponseCache:
+    """LRU + TTL cache of rendered GET responses, bounded by entry count and bytes.
+
+    Entries are tagged with their namespace's version. A write bumps the version
+    in this process right after commit and in the cache_versions table for the
+    other workers, which pick it up within ``version_check`` seconds.
+    """
+
+    def __init__(self, max_entries=2048, max_bytes=64 * 1024 * 1024, ttl=300, version_check=1.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version_check = version_check
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._local = {}
+        self._shared = {}
+        self._checked_at = {}
+        self._lock = Lock()
+        self.hits = self.misses = self.not_modified = self.evictions = self.invalidations = 0
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry['size']
+
+    def version(self, namespace):
+        """(local, shared) version pair; either moving on makes existing entries stale."""
+        now = time.monotonic()
+        with self._lock:
+            stale = now - self._checked_at.get(namespace, float('-inf')) >= self.version_check
+            if stale:
+                self._checked_at[namespace] = now
+        if stale:
+            shared = db.session.scalar(select(CacheVersion.version).where(CacheVersion.name == namespace)) or 0
+            with self._lock:
+                self._shared[namespace] = shared
+        with self._lock:
+            return self._local.get(namespace, 0), self._shared.get(namespace, 0)
+
+    def get(self, key, version):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['version'] != version or entry['expires_at'] <= now:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, body, status, mimetype, headers, etag):
+        size = len(body) + ENTRY_OVERHEAD
+        entry = {
+            'version': version, 'body': body, 'status': status, 'mimetype': mimetype,
+            'headers': headers, 'etag': etag, 'size': size, 'expires_at': time.monotonic() + self.ttl,
+        }
+        if size > self.max_bytes // 4:
+            return entry
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    def count_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def invalidate(self, namespace):
+        with self._lock:
+            self._local[namespace] = self._local.get(namespace, 0) + 1
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'versions': {ns: [self._local.get(ns, 0), self._shared.get(ns, 0)]
+                             for ns in set(self._local) | set(self._shared)},
+            }
+
+
+def init_response_cache(app):
+    if not app.config['RESPONSE_CACHE_ENABLED']:
+        return None
+    cache = ResponseCache(
+        max_entries=app.config['RESPONSE_CACHE_MAX_ENTRIES'],
+        max_bytes=app.config['RESPONSE_CACHE_MAX_BYTES'],
+        ttl=app.config['RESPONSE_CACHE_TTL'],
+        version_check=app.config['RESPONSE_CACHE_VERSION_CHECK'],
+    )
+    app.extensions['response_cache'] = cache
+    return cache
+
+
+def get_response_cache():
+    return current_app.extensions.get('response_cache')
+
+
+def _normalize_param(name, value):
+    if name in CASE_INSENSITIVE_PARAMS:
+        return value.strip().lower()
+    # cursor is base64 and fields names are case-sensitive: keep them byte-exact.
+    return value
+
+
+def cache_key():
+    """Endpoint plus its query string with keys sorted; only the catalog filters are trimmed/lowercased."""
+    params = sorted(
+        (k, _normalize_param(k, v)) for k, values in request.args.lists() for v in values if v.strip()
+    )
+    return (request.endpoint, tuple(params))
+
+
+def compute_etag(body):
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def cached_response(namespace):
+    """Serve a GET endpoint from the response cache and answer If-None-Match with 304."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            cache = get_response_cache()
+            if cache is None or not current_app.config['RESPONSE_CACHE_ENABLED']:
+                return fn(*args, **kwargs)
+            key = cache_key()
+            version = cache.version(namespace)
+            entry = cache.get(key, version)
+            if entry is not None:
+                response = current_app.response_class(
+                    entry['body'], status=entry['status'], mimetype=entry['mimetype']
+                )
+                response.headers.update(entry['headers'])
+                response.headers['X-Cache'] = 'HIT'
+            else:
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                body = response.get_data()
+                headers = {h: response.headers[h] for h in CACHED_HEADERS if h in response.headers}
+                entry = cache.put(key, version, body, response.status_code, response.mimetype,
+                                  headers, compute_etag(body))
+                response.headers['X-Cache'] = 'MISS'
+            response.set_etag(entry['etag'])
+            response.make_conditional(request)
+            if response.status_code == 304:
+                cache.count_not_modified()
+            return response
+        return wrapper
+    return decorator
+
+
+def mark_stale(session, namespace=CATALOG):
+    """Invalidate ``namespace`` once the session's current transaction commits."""
+    session.info.setdefault('stale_namespaces', set()).add(namespace)
+
+
+def bump_shared_version(namespace):
+    with db.engine.begin() as connection:
+        result = connection.execute(
+            update(CacheVersion).where(CacheVersion.name == namespace)
+            .values(version=CacheVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            try:
+                with connection.begin_nested():
+                    connection.execute(insert(CacheVersion).values(name=namespace, version=1))
+            except IntegrityError:
+                # Another worker created the row first; the next write bumps it.
+                pass
+
+
+@event.listens_for(db.session, 'before_flush')
+def _track_catalog_changes(session, flush_context, instances):
+    if any(isinstance(obj, Book) for obj in (*session.new, *session.dirty, *session.deleted)):
+        mark_stale(session)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.in_nested_transaction():
+        return
+    namespaces = session.info.pop('stale_namespaces', None)
+    cache = get_response_cache() if namespaces else None
+    if cache is None:
+        # Nothing to invalidate: spare every circulation commit a write to cache_versions.
+        return
+    for namespace in namespaces:
+        cache.invalidate(namespace)
+        try:
+            bump_shared_version(namespace)
+        except Exception:
+            # Other workers fall back to the TTL until the next successful bump.
+            logger.exception('Could not publish cache version for %s', namespace)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_after_rollback(session):
+    if session.in_nested_transaction():
+        return
+    session.info.pop('stale_namespaces', None)
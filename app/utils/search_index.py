@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+import re
+from sqlalchemy import event, inspect, select, func, literal, union_all, case
+from app.extensions import db
+from app.models import Book, BookSearchTerm
+
+WORD = 'w'
+TRIGRAM = 't'
+
+INDEXED_FIELDS = ('title', 'author', 'category')
+FIELD_WEIGHTS = {'title': 3.0, 'author': 2.0, 'category': 1.0}
+MAX_TERM_LENGTH = 64
+FUZZY_MIN_SIMILARITY = 0.5
+
+TOKEN_REGEX = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return [t[:MAX_TERM_LENGTH] for t in TOKEN_REGEX.findall(text.lower())]
+
+
+def trigrams(word):
+    padded = f' {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def build_terms(book_id, title, author, category):
+    rows = []
+    for field, value in (('title', title), ('author', author), ('category', category)):
+        weight = FIELD_WEIGHTS[field]
+        words = set(tokenize(value))
+        grams = set()
+        for word in words:
+            rows.append({'book_id': book_id, 'field': field, 'kind': WORD, 'term': word, 'weight': weight})
+            grams |= trigrams(word)
+        for gram in grams:
+            rows.append({'book_id': book_id, 'field': field, 'kind': TRIGRAM, 'term': gram, 'weight': weight})
+    return rows
+
+
+def index_books(connection, books):
+    """Replace the index rows of the given books in a single delete + executemany."""
+    table = BookSearchTerm.__table__
+    ids = [b.id for b in books]
+    if not ids:
+        return
+    connection.execute(table.delete().where(table.c.book_id.in_(ids)))
+    rows = []
+    for b in books:
+        rows.extend(build_terms(b.id, b.title, b.author, b.category))
+    if rows:
+        connection.execute(table.insert(), rows)
+
+
+def unindex_books(connection, book_ids):
+    table = BookSearchTerm.__table__
+    if book_ids:
+        connection.execute(table.delete().where(table.c.book_id.in_(list(book_ids))))
+
+
+@event.listens_for(db.session, 'after_flush')
+def _sync_search_index(session, flush_context):
+    changed = [obj for obj in session.new if isinstance(obj, Book)]
+    for obj in session.dirty:
+        if isinstance(obj, Book) and session.is_modified(obj, include_collections=False):
+            state = inspect(obj)
+            if any(state.attrs[f].history.has_changes() for f in INDEXED_FIELDS):
+                changed.append(obj)
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, Book)]
+
+    if not changed and not deleted:
+        return
+    connection = session.connection()
+    unindex_books(connection, deleted)
+    index_books(connection, changed)
+
+
+def _prefix_range(column, prefix):
+    # Range comparison instead of LIKE so both SQLite and MySQL can walk the index.
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return (column >= prefix) & (column < upper)
+
+
+def _word_matches(field, word):
+    term = BookSearchTerm.term
+    score = case((term == word, 2 * BookSearchTerm.weight), else_=BookSearchTerm.weight)
+    return (
+        select(BookSearchTerm.book_id, func.max(score).label('score'))
+        .where(BookSearchTerm.kind == WORD, BookSearchTerm.field == field, _prefix_range(term, word))
+        .group_by(BookSearchTerm.book_id)
+    )
+
+
+def _fuzzy_matches(field, word):
+    grams = trigrams(word)
+    needed = max(1, int(len(grams) * FUZZY_MIN_SIMILARITY + 0.5))
+    hits = func.count(func.distinct(BookSearchTerm.term))
+    return (
+        select(BookSearchTerm.book_id, (hits * func.max(BookSearchTerm.weight) / (2.0 * len(grams))).label('score'))
+        .where(BookSearchTerm.kind == TRIGRAM, BookSearchTerm.field == field, BookSearchTerm.term.in_(grams))
+        .group_by(BookSearchTerm.book_id)
+        .having(hits >= needed)
+    )
+
+
+def _has_prefix_match(field, word):
+    stmt = (
+        select(BookSearchTerm.id)
+        .where(BookSearchTerm.kind == WORD, BookSearchTerm.field == field, _prefix_range(BookSearchTerm.term, word))
+        .limit(1)
+    )
+    return db.session.execute(stmt).first() is not None
+
+
+def _term_queries(criteria, fuzzy):
+    queries = []
+    for field, text in criteria.items():
+        if field not in FIELD_WEIGHTS:
+            continue
+        for word in set(tokenize(text)):
+            if fuzzy and not _has_prefix_match(field, word):
+                queries.append(_fuzzy_matches(field, word))
+            else:
+                queries.append(_word_matches(field, word))
+    return queries
+
+
+def filter_books(query, fuzzy=False, **criteria):
+    """Restrict a Book query to rows matching every term of every given field."""
+    for subquery in _term_queries(criteria, fuzzy):
+        ids = subquery.with_only_columns(subquery.selected_columns[0])
+        query = query.filter(Book.id.in_(ids))
+    return query
+
+
+def search_books(limit=50, fuzzy=True, **criteria):
+    """Return ``[(book_id, score), ...]`` ranked by relevance, best first."""
+    queries = _term_queries(criteria, fuzzy)
+    if not queries:
+        return []
+    matches = union_all(*[
+        q.add_columns(literal(i).label('term_no')) for i, q in enumerate(queries)
+    ]).subquery()
+    stmt = (
+        select(matches.c.book_id, func.sum(matches.c.score).label('score'))
+        .group_by(matches.c.book_id)
+        .having(func.count(func.distinct(matches.c.term_no)) == len(queries))
+        .order_by(func.sum(matches.c.score).desc(), matches.c.book_id)
+        .limit(limit)
+    )
+    return [(row.book_id, row.score) for row in db.session.execute(stmt)]
+
+
+def rebuild_index(batch_size=1000):
+    """Re-index the whole catalog in id order, one batch per transaction."""
+    last_id = 0
+    total = 0
+    while True:
+        books = Book.query.filter(Book.id > last_id).order_by(Book.id).limit(batch_size).all()
+        if not books:
+            break
+        index_books(db.session.connection(), books)
+        db.session.commit()
+        last_id = books[-1].id
+        total += len(books)
+    return total
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+import logging
+import re
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+from queue import Full, Queue
+from flask import current_app, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|:\w+|\$\d+')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE = re.compile(r'\s+')
+EXPLAINABLE = ('select', 'with')
+EXPLAIN_PREFIX = {'sqlite': 'EXPLAIN QUERY PLAN ', 'mysql': 'EXPLAIN ', 'postgresql': 'EXPLAIN '}
+
+
+def normalize_sql(statement):
+    """Literals and placeholders become ``?`` so one query shape is one entry, whatever its values."""
+    sql = _STRING.sub('?', statement)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(?, ...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def _redact_value(value):
+    if value is None or isinstance(value, (bool, int, float, date, datetime)):
+        return value if not isinstance(value, (date, datetime)) else value.isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        return f'<{len(value)} bytes>'
+    # Strings carry emails, phone numbers, names and password hashes.
+    return f'<str {len(str(value))}>'
+
+
+def redact_parameters(parameters, executemany=False):
+    if executemany:
+        rows = list(parameters or ())
+        return {'rows': len(rows), 'first': redact_parameters(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: _redact_value(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_redact_value(value) for value in parameters]
+    return _redact_value(parameters)
+
+
+def _origin():
+    if has_request_context():
+        rule = request.url_rule
+        return f'{request.method} {rule.rule if rule is not None else request.path}'
+    return threading.current_thread().name
+
+
+class SlowQueryLog:
+    """Worst statements by shape, plus a ring buffer of the most recent slow executions.
+
+    ``worst`` keeps at most ``max_entries`` query shapes; when full, the shape
+    with the lowest max duration makes room. Plans are captured by one
+    background thread with its own connection, at most once per
+    ``explain_interval`` seconds per shape, so the request that ran the slow
+    statement never waits for EXPLAIN.
+    """
+
+    def __init__(self, threshold_ms=200, max_entries=100, recent_size=200, explain=True, explain_interval=600):
+        self._lock = threading.Lock()
+        self.configure(threshold_ms, max_entries, recent_size, explain, explain_interval)
+        self._explain_queue = Queue(maxsize=64)
+        self._explainer = None
+        self._local = threading.local()
+
+    def configure(self, threshold_ms, max_entries=100, recent_size=200, explain=True, explain_interval=600):
+        with self._lock:
+            self.threshold = threshold_ms / 1000.0
+            self.max_entries = max_entries
+            self.explain = explain
+            self.explain_interval = explain_interval
+            self._worst = {}
+            self._recent = deque(maxlen=recent_size)
+
+    def record(self, engine, statement, parameters, executemany, seconds):
+        sql = normalize_sql(statement)
+        origin = _origin()
+        params = redact_parameters(parameters, executemany)
+        now = datetime.utcnow()
+        logger.warning('Slow query (%.1f ms) from %s: %s params=%s', seconds * 1000, origin, sql, params)
+        with self._lock:
+            self._recent.append({
+                'sql': sql, 'ms': round(seconds * 1000, 2), 'origin': origin, 'params': params, 'at': now.isoformat(),
+            })
+            entry = self._worst.get(sql)
+            if entry is None:
+                if len(self._worst) >= self.max_entries:
+                    weakest = min(self._worst, key=lambda key: self._worst[key]['max'])
+                    if self._worst[weakest]['max'] >= seconds:
+                        return
+                    del self._worst[weakest]
+                entry = self._worst[sql] = {
+                    'count': 0, 'total': 0.0, 'max': 0.0, 'origins': {}, 'plan': None, 'explained_at': None,
+                }
+            entry['count'] += 1
+            entry['total'] += seconds
+            entry['origins'][origin] = entry['origins'].get(origin, 0) + 1
+            entry['last_seen'] = now
+            if seconds >= entry['max']:
+                entry['max'], entry['params'] = seconds, params
+            wants_plan = (
+                self.explain and not executemany
+                and sql.split(' ', 1)[0].lower() in EXPLAINABLE
+                and engine.dialect.name in EXPLAIN_PREFIX
+                and (entry['explained_at'] is None or time.monotonic() - entry['explained_at'] >= self.explain_interval)
+            )
+            if wants_plan:
+                entry['explained_at'] = time.monotonic()
+        if wants_plan:
+            self._queue_explain(engine, sql, statement, parameters)
+
+    def _queue_explain(self, engine, sql, statement, parameters):
+        if self._explainer is None or not self._explainer.is_alive():
+            with self._lock:
+                if self._explainer is None or not self._explainer.is_alive():
+                    self._explainer = threading.Thread(target=self._explain_loop, name='slow-query-explain', daemon=True)
+                    self._explainer.start()
+        try:
+            self._explain_queue.put_nowait((engine, sql, statement, parameters))
+        except Full:
+            pass
+
+    def _explain_loop(self):
+        self._local.explaining = True
+        while True:
+            engine, sql, statement, parameters = self._explain_queue.get()
+            try:
+                with engine.connect() as connection:
+                    rows = connection.exec_driver_sql(EXPLAIN_PREFIX[engine.dialect.name] + statement, parameters)
+                    plan = [' | '.join(str(value) for value in row) for row in rows]
+            except Exception as e:
+                plan = [f'EXPLAIN failed: {e}']
+            with self._lock:
+                if sql in self._worst:
+                    self._worst[sql]['plan'] = plan
+
+    def is_explaining(self):
+        return getattr(self._local, 'explaining', False)
+
+    def worst(self, limit=None, sort='max'):
+        with self._lock:
+            entries = [
+                {
+                    'sql': sql,
+                    'count': entry['count'],
+                    'max_ms': round(entry['max'] * 1000, 2),
+                    'avg_ms': round(entry['total'] / entry['count'] * 1000, 2),
+                    'total_ms': round(entry['total'] * 1000, 2),
+                    'origins': dict(entry['origins']),
+                    'params': entry['params'],
+                    'plan': entry['plan'],
+                    'last_seen': entry['last_seen'].isoformat(),
+                }
+                for sql, entry in self._worst.items()
+            ]
+        key = {'max': 'max_ms', 'total': 'total_ms', 'count': 'count'}.get(sort, 'max_ms')
+        entries.sort(key=lambda entry: entry[key], reverse=True)
+        return entries[:limit] if limit else entries
+
+    def recent(self, limit=None):
+        with self._lock:
+            entries = list(self._recent)[::-1]
+        return entries[:limit] if limit else entries
+
+    def clear(self):
+        with self._lock:
+            self._worst.clear()
+            self._recent.clear()
+
+
+slow_query_log = SlowQueryLog()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._slow_query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_slow_query_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    if elapsed >= slow_query_log.threshold and not slow_query_log.is_explaining():
+        try:
+            slow_query_log.record(conn.engine, statement, parameters, executemany, elapsed)
+        except Exception:
+            logger.exception('Recording a slow query failed')
+
+
+def get_slow_query_log():
+    return current_app.extensions.get('slow_query_log')
+
+
+def init_slow_queries(app):
+    threshold = app.config['SLOW_QUERY_THRESHOLD_MS']
+    if threshold <= 0:
+        return None
+    slow_query_log.configure(
+        threshold_ms=threshold,
+        max_entries=app.config['SLOW_QUERY_MAX_ENTRIES'],
+        recent_size=app.config['SLOW_QUERY_RECENT_SIZE'],
+        explain=app.config['SLOW_QUERY_EXPLAIN'],
+        explain_interval=app.config['SLOW_QUERY_EXPLAIN_INTERVAL'],
+    )
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.extensions['slow_query_log'] = slow_query_log
+    return slow_query_log
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import Book, Borrow, DailyCirculation, Debt, MonthlyTitleBorrows
+
+REBUILD_CHUNK_SIZE = 100000
+DAILY_COUNTERS = ('borrows', 'returns', 'overdue_returns', 'fines_collected')
+# Rollups count Nairobi calendar days (no DST). borrow_date and paid_at are
+# stored in that clock already; returned_at is stored in UTC.
+LOCAL_TZ = timezone(timedelta(hours=3))
+
+
+def local_day(moment):
+    """Nairobi calendar day of ``moment``; naive values are taken as UTC."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(LOCAL_TZ).date()
+
+
+def local_now():
+    return datetime.now(LOCAL_TZ).replace(tzinfo=None)
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def increment(model, key, **amounts):
+    """Add ``amounts`` to the rollup row identified by ``key``, creating it if needed."""
+    table = model.__table__
+    where = [table.c[k] == v for k, v in key.items()]
+    stmt = update(table).where(*where).values({k: table.c[k] + v for k, v in amounts.items()})
+    if db.session.execute(stmt).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(table).values(**key, **amounts))
+    except IntegrityError:
+        # Another transaction created the row first.
+        db.session.execute(stmt)
+
+
+def record_borrow(book_id, borrowed_at):
+    day = local_day(borrowed_at)
+    increment(DailyCirculation, {'day': day}, borrows=1)
+    increment(MonthlyTitleBorrows, {'month': month_start(day), 'book_id': book_id}, borrows=1)
+
+
+def record_return(returned_at, overdue):
+    increment(DailyCirculation, {'day': local_day(returned_at)}, returns=1, overdue_returns=1 if overdue else 0)
+
+
+def record_payment(amount, paid_at):
+    if amount:
+        increment(DailyCirculation, {'day': local_day(paid_at)}, fines_collected=amount)
+
+
+def circulation(start, end):
+    rows = db.session.execute(
+        select(DailyCirculation).where(DailyCirculation.day.between(start, end)).order_by(DailyCirculation.day)
+    ).scalars()
+    return [{'day': r.day.isoformat(), **{c: getattr(r, c) for c in DAILY_COUNTERS}} for r in rows]
+
+
+def top_titles(start, end, limit=10):
+    """Most borrowed titles over the whole months touching ``start``..``end``."""
+    borrows = func.sum(MonthlyTitleBorrows.borrows).label('borrows')
+    stmt = (
+        select(Book.id, Book.title, Book.author, borrows)
+        .join(Book, Book.id == MonthlyTitleBorrows.book_id)
+        .where(MonthlyTitleBorrows.month.between(month_start(start), month_start(end)))
+        .group_by(Book.id, Book.title, Book.author)
+        .order_by(borrows.desc(), Book.id)
+        .limit(limit)
+    )
+    return [{'book_id': r.id, 'title': r.title, 'author': r.author, 'borrows': int(r.borrows)}
+            for r in db.session.execute(stmt)]
+
+
+def open_overdue(now=None):
+    # due_date is stored in Nairobi time, like borrow_date.
+    now = now or local_now()
+    return db.session.scalar(
+        select(func.count(Borrow.id)).where(Borrow.returned == False, Borrow.due_date < now)
+    )
+
+
+def utilization():
+    total = func.sum(Book.total_copies)
+    available = func.sum(Book.available_copies)
+    stmt = (
+        select(Book.category, func.count(Book.id).label('titles'), total.label('total'), available.label('available'))
+        .group_by(Book.category)
+        .order_by(Book.category)
+    )
+    result = []
+    for r in db.session.execute(stmt):
+        total_copies, available_copies = int(r.total or 0), int(r.available or 0)
+        result.append({
+            'category': r.category,
+            'titles': r.titles,
+            'total_copies': total_copies,
+            'available_copies': available_copies,
+            'available_ratio': round(available_copies / total_copies, 4) if total_copies else None,
+            'on_loan_ratio': round(1 - available_copies / total_copies, 4) if total_copies else None,
+        })
+    return result
+
+
+def _count_by_day(pd, values, offset=None):
+    days = pd.to_datetime(values)
+    if offset is not None:
+        days = days + offset
+    return days.dt.normalize().value_counts()
+
+
+def rebuild_rollups(chunk_size=REBUILD_CHUNK_SIZE):
+    """Recompute every rollup row from borrow and debt history. Caller commits.
+
+    History is read in chunks and aggregated with pandas, so memory stays
+    bounded by ``chunk_size`` plus the size of the rollups themselves.
+    """
+    import pandas as pd
+
+    utc_offset = pd.Timedelta(LOCAL_TZ.utcoffset(None))
+    connection = db.session.connection()
+    daily = {name: [] for name in DAILY_COUNTERS}
+    titles = []
+
+    history = select(Borrow.book_id, Borrow.borrow_date, Borrow.due_date, Borrow.returned_at)
+    for chunk in pd.read_sql(history, connection, chunksize=chunk_size):
+        borrowed = pd.to_datetime(chunk['borrow_date']).dt.normalize()
+        daily['borrows'].append(borrowed.value_counts())
+        titles.append(chunk.assign(month=borrowed.dt.to_period('M').dt.to_timestamp())
+                      .groupby(['month', 'book_id']).size())
+        returned = chunk.dropna(subset=['returned_at'])
+        daily['returns'].append(_count_by_day(pd, returned['returned_at'], utc_offset))
+        late = (pd.to_datetime(returned['returned_at']) - pd.to_datetime(returned['due_date'])).dt.days >= 1
+        daily['overdue_returns'].append(_count_by_day(pd, returned.loc[late, 'returned_at'], utc_offset))
+
+    payments = select(Debt.fine_amount, Debt.paid_at).where(Debt.paid == True, Debt.paid_at.isnot(None))
+    for chunk in pd.read_sql(payments, connection, chunksize=chunk_size):
+        daily['fines_collected'].append(
+            chunk.groupby(pd.to_datetime(chunk['paid_at']).dt.normalize())['fine_amount'].sum()
+        )
+
+    frame = pd.DataFrame({
+        name: pd.concat(parts).groupby(level=0).sum() if parts else pd.Series(dtype='float64')
+        for name, parts in daily.items()
+    }).fillna(0)
+    daily_rows = [
+        {'day': day.date(), 'borrows': int(r.borrows), 'returns': int(r.returns),
+         'overdue_returns': int(r.overdue_returns), 'fines_collected': float(r.fines_collected)}
+        for day, r in zip(frame.index, frame.itertuples(index=False))
+    ]
+    title_counts = pd.concat(titles).groupby(level=[0, 1]).sum() if titles else pd.Series(dtype='int64')
+    title_rows = [
+        {'month': month.date(), 'book_id': int(book_id), 'borrows': int(count)}
+        for (month, book_id), count in title_counts.items()
+    ]
+
+    db.session.execute(delete(DailyCirculation))
+    db.session.execute(delete(MonthlyTitleBorrows))
+    for rows, model in ((daily_rows, DailyCirculation), (title_rows, MonthlyTitleBorrows)):
+        for start in range(0, len(rows), chunk_size):
+            db.session.execute(insert(model.__table__), rows[start:start + chunk_size])
+    return len(daily_rows), len(title_rows)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+from flask import current_app, g, request
+from flask_jwt_extended import decode_token, get_unverified_jwt_headers
+from flask_jwt_extended.exceptions import (
+    InvalidHeaderError, NoAuthorizationError, RevokedTokenError, WrongTokenError,
+)
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import RevokedToken
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings. No false negatives, ~error_rate false positives."""
+
+    def __init__(self, capacity=100000, error_rate=0.01):
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item):
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class VerifiedTokenCache:
+    """LRU of tokens whose signature already checked out, so repeat requests skip the decode."""
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self._tokens = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, token):
+        with self._lock:
+            entry = self._tokens.get(token)
+            if entry is None:
+                return None
+            if entry[0]['exp'] <= time.time():
+                del self._tokens[token]
+                return None
+            self._tokens.move_to_end(token)
+            return entry
+
+    def put(self, token, claims, header):
+        if self.max_size <= 0 or 'exp' not in claims:
+            return
+        with self._lock:
+            self._tokens[token] = (claims, header)
+            self._tokens.move_to_end(token)
+            while len(self._tokens) > self.max_size:
+                self._tokens.popitem(last=False)
+
+    def discard(self, token):
+        with self._lock:
+            self._tokens.pop(token, None)
+
+
+class RevocationList:
+    """Bloom filter of revoked token ids, rebuilt from revoked_tokens every sync_interval seconds.
+
+    A bloom miss means the token is not revoked, so the common case never touches
+    the database; a hit is confirmed with a primary-key lookup. Tokens revoked by
+    another worker are seen after at most one sync interval.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.01, sync_interval=30):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._last_sync = 0.0
+        self._revoked_during_sync = set()
+        self._lock = Lock()
+
+    def sync(self):
+        now = datetime.utcnow()
+        with self._lock:
+            self._revoked_during_sync = set()
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        # Own connection and transaction: sync runs mid-request, and committing the
+        # request's session here would commit whatever the view had pending.
+        with db.engine.begin() as connection:
+            connection.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+            for jti in connection.scalars(select(RevokedToken.jti)):
+                bloom.add(jti)
+        with self._lock:
+            # Keep anything revoked locally while the reload was running.
+            for jti in self._revoked_during_sync:
+                bloom.add(jti)
+            self._bloom = bloom
+            self._last_sync = time.monotonic()
+
+    def _maybe_sync(self):
+        with self._lock:
+            if time.monotonic() - self._last_sync < self.sync_interval:
+                return
+            self._last_sync = time.monotonic()
+        self.sync()
+
+    def is_revoked(self, jti):
+        self._maybe_sync()
+        if jti not in self._bloom:
+            return False
+        return db.session.get(RevokedToken, jti) is not None
+
+    def revoke(self, jti, expires_at, user_id=None):
+        try:
+            with db.session.begin_nested():
+                db.session.add(RevokedToken(jti=jti, user_id=user_id, expires_at=expires_at))
+        except IntegrityError:
+            pass
+        db.session.commit()
+        with self._lock:
+            self._bloom.add(jti)
+            self._revoked_during_sync.add(jti)
+
+
+def _reset_request_claims():
+    # g outlives the request when an app context was already pushed (CLI, tests).
+    g.pop('jwt_claims', None)
+    g.pop('jwt_token', None)
+
+
+def init_token_auth(app):
+    app.before_request(_reset_request_claims)
+    app.extensions['token_cache'] = VerifiedTokenCache(app.config['AUTH_TOKEN_CACHE_SIZE'])
+    app.extensions['revocation_list'] = RevocationList(
+        capacity=app.config['REVOKED_TOKEN_BLOOM_CAPACITY'],
+        sync_interval=app.config['REVOKED_TOKEN_SYNC_INTERVAL'],
+    )
+
+
+def _token_from_header():
+    header_name = current_app.config.get('JWT_HEADER_NAME', 'Authorization')
+    header_type = current_app.config.get('JWT_HEADER_TYPE', 'Bearer')
+    value = request.headers.get(header_name, '').strip()
+    if not value:
+        raise NoAuthorizationError(f'Missing {header_name} Header')
+    parts = value.split()
+    if header_type:
+        if len(parts) != 2 or parts[0] != header_type:
+            raise InvalidHeaderError(f"Bad {header_name} header. Expected value '{header_type} <JWT>'")
+        return parts[1]
+    if len(parts) != 1:
+        raise InvalidHeaderError(f"Bad {header_name} header. Expected value '<JWT>'")
+    return parts[0]
+
+
+def verify_request():
+    """Verify the request's access token once and cache the claims on ``g``.
+
+    Later calls in the same request return the cached claims. ``get_jwt`` and
+    ``get_jwt_identity`` keep working because the flask_jwt_extended slots on
+    ``g`` are filled in as well.
+    """
+    if getattr(g, 'jwt_claims', None) is not None:
+        return g.jwt_claims
+    token = _token_from_header()
+    cache = current_app.extensions['token_cache']
+    cached = cache.get(token)
+    if cached is None:
+        claims = decode_token(token)
+        header = get_unverified_jwt_headers(token)
+        if claims.get('type') != 'access':
+            raise WrongTokenError('Only non-refresh tokens are allowed')
+        cache.put(token, claims, header)
+    else:
+        claims, header = cached
+    if claims.get('jti') and current_app.extensions['revocation_list'].is_revoked(claims['jti']):
+        cache.discard(token)
+        raise RevokedTokenError(header, claims)
+
+    g._jwt_extended_jwt = claims
+    g._jwt_extended_jwt_header = header
+    g._jwt_extended_jwt_user = {'loaded_user': None}
+    g._jwt_extended_jwt_location = 'headers'
+    g.jwt_token = token
+    g.jwt_claims = claims
+    return claims
+
+
+def revoke_current_token():
+    claims = verify_request()
+    current_app.extensions['token_cache'].discard(g.jwt_token)
+    current_app.extensions['revocation_list'].revoke(
+        claims['jti'], datetime.utcfromtimestamp(claims['exp']), user_id=int(claims['sub']),
+    )
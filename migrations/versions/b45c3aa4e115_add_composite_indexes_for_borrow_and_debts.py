@@ -0,0 +1,38 @@
+"""Add composite indexes for borrow and debts lookups
+
+Revision ID: b45c3aa4e115
+Revises: 1ca424cd770c
+Create Date: 2026-10-18 14:22:51.640193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b45c3aa4e115'
+down_revision = '1ca424cd770c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('borrow', schema=None) as batch_op:
+        batch_op.create_index('ix_borrow_user_book_returned', ['user_id', 'book_id', 'returned'], unique=False)
+        # Partial on SQLite/PostgreSQL; MySQL has no partial indexes and gets the plain composite.
+        batch_op.create_index('ix_borrow_open', ['returned', 'id'], unique=False,
+                              sqlite_where=sa.text('returned = 0'), postgresql_where=sa.text('returned = false'))
+
+    with op.batch_alter_table('debts', schema=None) as batch_op:
+        batch_op.create_index('ix_debts_user_paid', ['user_id', 'paid'], unique=False)
+        batch_op.create_index('ix_debts_user_id', ['user_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('debts', schema=None) as batch_op:
+        batch_op.drop_index('ix_debts_user_id')
+        batch_op.drop_index('ix_debts_user_paid')
+
+    with op.batch_alter_table('borrow', schema=None) as batch_op:
+        batch_op.drop_index('ix_borrow_open')
+        batch_op.drop_index('ix_borrow_user_book_returned')
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Measure the per-request cost of token verification and role checks.
+
+Registers three trivial endpoints on the app: one without auth, one behind the
+old decorator stack (flask_jwt_extended's jwt_required plus a role_required that
+verifies the token again) and one behind app.utils.decorators. The auth
+overhead is each protected endpoint's mean latency minus the open one.
+
+    python scripts/bench_auth.py --requests 5000 --tokens 50
+
+Without DATABASE_URI a throwaway SQLite file is used.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from functools import wraps
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+os.environ.setdefault('DATABASE_URI', f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_auth.db')}")
+os.environ.setdefault('SECRET_KEY', 'bench')
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-jwt-secret-key-of-decent-length')
+os.environ['JOB_WORKER_ENABLED'] = 'false'
+os.environ['REMINDER_SCHEDULER_ENABLED'] = 'false'
+
+from flask import jsonify
+import flask_jwt_extended
+from flask_jwt_extended import create_access_token, get_jwt
+from app import create_app
+from app.extensions import db
+from app.utils import decorators
+
+
+def legacy_role_required(*roles):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            flask_jwt_extended.verify_jwt_in_request()
+            if get_jwt().get('role') not in roles:
+                return jsonify({'msg': 'Unauthorized - Insufficient role'}), 403
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_bench_routes(app):
+    def ok():
+        return jsonify({'ok': True})
+
+    app.add_url_rule('/bench/open', 'bench_open', ok)
+    app.add_url_rule('/bench/legacy', 'bench_legacy',
+                     flask_jwt_extended.jwt_required()(legacy_role_required('member')(ok)))
+    app.add_url_rule('/bench/cached', 'bench_cached',
+                     decorators.jwt_required()(decorators.role_required('member')(ok)))
+
+
+def measure(client, path, tokens, requests):
+    started = time.perf_counter()
+    for i in range(requests):
+        response = client.get(path, headers={'Authorization': f'Bearer {tokens[i % len(tokens)]}'})
+        assert response.status_code == 200, response.get_json()
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--tokens', type=int, default=50, help='distinct users cycling through the requests')
+    args = parser.parse_args()
+
+    app = create_app()
+    add_bench_routes(app)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        tokens = [
+            create_access_token(identity=str(i + 1), additional_claims={'role': 'member', 'email': f'user{i}@example.com'})
+            for i in range(args.tokens)
+        ]
+
+    client = app.test_client()
+    for path in ('/bench/open', '/bench/legacy', '/bench/cached'):
+        measure(client, path, tokens, min(args.requests, 200))
+
+    baseline = measure(client, '/bench/open', tokens, args.requests)
+    legacy = measure(client, '/bench/legacy', tokens, args.requests)
+    cached = measure(client, '/bench/cached', tokens, args.requests)
+    print(f'{args.requests} requests, {args.tokens} distinct tokens')
+    print(f'{"no auth":24s} {baseline:9.1f} us/request')
+    print(f'{"legacy decorators":24s} {legacy:9.1f} us/request  auth overhead {legacy - baseline:7.1f} us')
+    print(f'{"cached verification":24s} {cached:9.1f} us/request  auth overhead {cached - baseline:7.1f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Compare hot borrow/debt lookups with and without the composite indexes.
+
+Builds a synthetic data set (1M borrows by default) and prints the query plan
+and mean latency of each lookup before and after creating the indexes.
+
+    python scripts/bench_indexes.py --borrows 1000000
+    DATABASE_URI=mysql+pymysql://... python scripts/bench_indexes.py
+
+Without DATABASE_URI a throwaway SQLite file is used.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+os.environ.setdefault('DATABASE_URI', f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_indexes.db')}")
+os.environ.setdefault('SECRET_KEY', 'bench')
+os.environ['JOB_WORKER_ENABLED'] = 'false'
+os.environ['REMINDER_SCHEDULER_ENABLED'] = 'false'
+
+from sqlalchemy import insert, text
+from app import create_app
+from app.extensions import db
+from app.models import User, Book, Borrow, Debt
+
+BENCH_INDEXES = [
+    (Borrow.__table__, 'ix_borrow_user_book_returned'),
+    (Borrow.__table__, 'ix_borrow_open'),
+    (Debt.__table__, 'ix_debts_user_paid'),
+    (Debt.__table__, 'ix_debts_user_id'),
+]
+
+QUERIES = {
+    'borrow_book debt check': (
+        'SELECT id FROM debts WHERE user_id = :user_id AND paid = 0 LIMIT 1', 'user'),
+    'borrow/return lookup': (
+        'SELECT id FROM borrow WHERE user_id = :user_id AND book_id = :book_id AND returned = 0 LIMIT 1', 'user_book'),
+    'list_borrowed_books page': (
+        'SELECT id, user_id, book_id FROM borrow WHERE returned = 0 AND id > :after ORDER BY id LIMIT 50', 'after'),
+    'get_user_fines page': (
+        'SELECT id, fine_amount FROM debts WHERE user_id = :user_id ORDER BY id DESC LIMIT 50', 'user'),
+}
+
+
+def chunks(n, size):
+    for start in range(0, n, size):
+        yield range(start, min(start + size, n))
+
+
+def populate(users, books, borrows, debts):
+    db.drop_all()
+    db.create_all()
+    now = datetime.utcnow()
+    db.session.execute(insert(User), [
+        {'id': i + 1, 'name': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x', 'role': 'member'}
+        for i in range(users)
+    ])
+    db.session.execute(insert(Book.__table__), [
+        {'id': i + 1, 'title': f'Title {i}', 'author': 'Author', 'category': 'General', 'total_copies': 5, 'available_copies': 5}
+        for i in range(books)
+    ])
+    for block in chunks(borrows, 50000):
+        db.session.execute(insert(Borrow.__table__), [
+            {'user_id': random.randint(1, users), 'book_id': random.randint(1, books),
+             'borrow_date': now, 'due_date': now + timedelta(days=random.randint(-30, 14)),
+             'returned': random.random() < 0.9}
+            for _ in block
+        ])
+    for block in chunks(debts, 50000):
+        db.session.execute(insert(Debt.__table__), [
+            {'user_id': random.randint(1, users), 'book_id': random.randint(1, books),
+             'days_overdue': 3, 'fine_amount': 60.0, 'paid': random.random() < 0.8, 'created_at': now}
+            for _ in block
+        ])
+    db.session.commit()
+
+
+def params_for(kind, users, books, borrows):
+    if kind == 'user':
+        return {'user_id': random.randint(1, users)}
+    if kind == 'user_book':
+        return {'user_id': random.randint(1, users), 'book_id': random.randint(1, books)}
+    return {'after': random.randint(0, borrows)}
+
+
+def explain(sql, params, label):
+    prefix = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    # The label comment keeps the driver's statement cache from replaying the previous plan.
+    return [tuple(row) for row in db.session.execute(text(f'{prefix}{sql} /* {label} */'), params)]
+
+
+def run_queries(label, args, repeat):
+    # Start a fresh transaction so the session sees the index changes, and refresh planner stats.
+    db.session.commit()
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+    print(f'\n== {label} ==')
+    for name, (sql, kind) in QUERIES.items():
+        sample = params_for(kind, args.users, args.books, args.borrows)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            db.session.execute(text(sql), params_for(kind, args.users, args.books, args.borrows)).fetchall()
+        elapsed = (time.perf_counter() - started) / repeat * 1000
+        print(f'{name:28s} {elapsed:9.3f} ms')
+        for row in explain(sql, sample, label):
+            print(f'    {row}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--borrows', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--books', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        print(f'Populating {args.borrows} borrows on {db.engine.url.render_as_string(hide_password=True)} ...')
+        populate(args.users, args.books, args.borrows, args.borrows // 10)
+
+        with db.engine.begin() as connection:
+            for table, name in BENCH_INDEXES:
+                next(i for i in table.indexes if i.name == name).drop(connection)
+        run_queries('before (foreign keys / primary keys only)', args, args.repeat)
+
+        with db.engine.begin() as connection:
+            for table, name in BENCH_INDEXES:
+                next(i for i in table.indexes if i.name == name).create(connection)
+        run_queries('after (composite indexes)', args, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
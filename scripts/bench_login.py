@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Measure POST /api/auth/login throughput for different hashing pool sizes.
+
+Creates --users members, then fires --requests logins from --concurrency
+threads once per pool size. Pool size 0 hashes inline in the request thread,
+which is the old behaviour.
+
+    python scripts/bench_login.py --pools 0,1,2,4 --concurrency 32 --rounds 12
+
+Without DATABASE_URI a throwaway SQLite file is used.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+os.environ.setdefault('DATABASE_URI', f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_login.db')}")
+os.environ.setdefault('SECRET_KEY', 'bench')
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-jwt-secret-key-of-decent-length')
+os.environ['JOB_WORKER_ENABLED'] = 'false'
+os.environ['REMINDER_SCHEDULER_ENABLED'] = 'false'
+
+from sqlalchemy import insert
+from app import create_app
+from app.extensions import db
+from app.models import User
+from app.utils.password_hasher import password_hasher
+
+PASSWORD = 'Passw0rd!'
+
+
+def populate(users):
+    db.drop_all()
+    db.create_all()
+    password_hash = password_hasher.hash(PASSWORD)
+    db.session.execute(insert(User), [
+        {'id': i + 1, 'name': f'user{i}', 'email': f'user{i}@example.com',
+         'password_hash': password_hash, 'role': 'member'}
+        for i in range(users)
+    ])
+    db.session.commit()
+
+
+def run(app, args):
+    statuses = Counter()
+
+    def login(i):
+        client = app.test_client()
+        email = f'user{i % args.users}@example.com'
+        started = time.perf_counter()
+        response = client.post('/api/auth/login', json={'email': email, 'password': PASSWORD})
+        return response.status_code, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as callers:
+        results = list(callers.map(login, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for status, latency in results if status == 200)
+    for status, _ in results:
+        statuses[status] += 1
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0
+    return statuses[200] / elapsed, p95, dict(statuses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pools', default=f'0,1,2,{os.cpu_count() or 1}')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=12)
+    parser.add_argument('--max-pending', type=int, default=64)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        password_hasher.configure(0, 0, args.rounds)
+        populate(args.users)
+
+    print(f'{args.requests} logins, {args.concurrency} concurrent callers, bcrypt cost {args.rounds}')
+    print(f'{"pool":>5} {"logins/s":>10} {"p95 ms":>10}  statuses')
+    for workers in [int(p) for p in args.pools.split(',')]:
+        password_hasher.shutdown()
+        password_hasher.configure(workers, args.max_pending, args.rounds)
+        if workers:
+            # Start the worker processes outside the timed run.
+            password_hasher.hash_many(['warmup'] * workers, chunksize=1)
+        throughput, p95, statuses = run(app, args)
+        print(f'{workers:>5} {throughput:>10.1f} {p95:>10.1f}  {statuses}')
+    password_hasher.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Compare onboarding members one POST /api/auth/register at a time with POST /api/members/bulk.
+
+    python scripts/bench_member_import.py --members 500 --rounds 12
+
+Both paths use the same bcrypt cost. The bulk import hashes with every
+worker of the password pool (PASSWORD_HASH_WORKERS, default: all cores).
+Without DATABASE_URI a throwaway SQLite file is used.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+os.environ.setdefault('DATABASE_URI', f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_member_import.db')}")
+os.environ.setdefault('SECRET_KEY', 'bench')
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-jwt-secret-key-of-decent-length')
+os.environ['JOB_WORKER_ENABLED'] = 'false'
+os.environ['REMINDER_SCHEDULER_ENABLED'] = 'false'
+
+from flask_jwt_extended import create_access_token
+from app import create_app
+from app.extensions import db
+from app.models import User
+from app.utils.password_hasher import password_hasher
+
+PASSWORD = 'Passw0rd!'
+
+
+def reset(app):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        admin = User(name='bench-admin', email='bench-admin@example.com', role='admin', password_hash='x')
+        db.session.add(admin)
+        db.session.commit()
+        return create_access_token(identity=str(admin.id), additional_claims={'role': 'admin', 'email': admin.email})
+
+
+def per_request(app, members):
+    client = app.test_client()
+    for i in range(members):
+        response = client.post('/api/auth/register', json={
+            'name': f'student{i}', 'email': f'student{i}@example.com', 'password': PASSWORD,
+        })
+        assert response.status_code == 201, response.get_json()
+
+
+def bulk(app, members, token):
+    body = 'name,email,password\n' + ''.join(
+        f'student{i},student{i}@example.com,{PASSWORD}\n' for i in range(members)
+    )
+    response = app.test_client().post('/api/members/bulk', data=body, headers={
+        'Content-Type': 'text/csv', 'Authorization': f'Bearer {token}',
+    })
+    report = response.get_json()
+    assert response.status_code == 200 and report['inserted'] == members, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--members', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=12)
+    args = parser.parse_args()
+
+    app = create_app()
+    password_hasher.rounds = args.rounds
+    print(f'{args.members} members, bcrypt cost {args.rounds}, {password_hasher.workers} hashing workers')
+
+    reset(app)
+    started = time.perf_counter()
+    per_request(app, args.members)
+    serial = time.perf_counter() - started
+    print(f'{"register, one per request":28s} {serial:8.2f} s  {args.members / serial:8.1f} members/s')
+
+    token = reset(app)
+    started = time.perf_counter()
+    bulk(app, args.members, token)
+    batched = time.perf_counter() - started
+    print(f'{"bulk import":28s} {batched:8.2f} s  {args.members / batched:8.1f} members/s')
+    password_hasher.shutdown()
+
+
+if __name__ == '__main__':
+    main()
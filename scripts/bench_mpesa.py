@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Compare STK pushes done the old way (fresh token and connections per push) with MpesaClient.
+
+Both run against scripts/mock_daraja.py started in-process, so no Safaricom
+credentials are needed:
+
+    python scripts/bench_mpesa.py --pushes 500 --threads 8 --latency 20
+
+Reports throughput plus how many OAuth calls and TCP connections the mock saw.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault('DATABASE_URI', f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_mpesa.db')}")
+os.environ.setdefault('SECRET_KEY', 'bench')
+
+import requests
+import mock_daraja
+from app.utils.mpesa_client import STK_PUSH_PATH, TOKEN_PATH, MpesaClient
+
+PHONE = '254700000000'
+
+
+def legacy_push(client, base_url):
+    # What app/routes/mpesa.py used to do for every request.
+    res = requests.get(f'{base_url}{TOKEN_PATH}?grant_type=client_credentials', auth=('key', 'secret'))
+    res.raise_for_status()
+    token = res.json()['access_token']
+    response = requests.post(f'{base_url}{STK_PUSH_PATH}', json=client.stk_payload(PHONE, 10),
+                             headers={'Authorization': f'Bearer {token}'})
+    response.raise_for_status()
+
+
+def pooled_push(client, base_url):
+    client.stk_push(PHONE, 10)
+
+
+def run(name, push, client, server, pushes, threads):
+    requests.post(f'{server.url}/__reset')
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        for future in [pool.submit(push, client, server.url) for _ in range(pushes)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+    counters = requests.get(f'{server.url}/__stats').json()
+    print(f'{name:10s} {elapsed:7.2f} s  {pushes / elapsed:8.1f} pushes/s  '
+          f'{counters["token_requests"]:5d} token calls  {counters["connections"] - 2:5d} connections')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pushes', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=20, help='milliseconds of simulated Daraja latency')
+    args = parser.parse_args()
+
+    server = mock_daraja.start(latency=args.latency / 1000)
+    client = MpesaClient(server.url, 'key', 'secret', '174379', 'passkey', 'http://127.0.0.1/callback',
+                         pool_size=args.threads)
+    print(f'{args.pushes} STK pushes, {args.threads} threads, {args.latency:.0f} ms mock latency')
+    run('legacy', legacy_push, client, server, args.pushes, args.threads)
+    run('pooled', pooled_push, client, server, args.pushes, args.threads)
+    client.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
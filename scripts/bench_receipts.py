@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Receipt rendering throughput: old write-to-disk-then-read path vs in-memory vs the process pool.
+
+    python scripts/bench_receipts.py --receipts 2000 --lines 8 --workers 4
+
+"disk" renders with FPDF.output(path) and reads the file back, as the old
+generate_receipt_pdf + send_email_with_attachment pair did. "memory" renders
+to bytes in this process. "pool" uses ReceiptRenderer.render_many, the path
+month-end statement runs take.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+os.environ.setdefault('DATABASE_URI', f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_receipts.db')}")
+os.environ.setdefault('SECRET_KEY', 'bench')
+
+from fpdf import FPDF
+from app.utils.pdf_generator import ReceiptRenderer, render_receipt_pdf
+
+
+def documents(count, lines):
+    return [{
+        'title': "Library Payment Receipts",
+        'name': f'student{i}',
+        'email': f'student{i}@example.com',
+        'amount': 20.0 * lines,
+        'date': '2026-10-18',
+        'heading': "Cleared Debt:",
+        'lines': [(f'Book {n}', 20.0) for n in range(lines)],
+    } for i in range(count)]
+
+
+def render_to_disk(document, directory):
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=15)
+    pdf.cell(200, 10, txt=document['title'], ln=True, align='C')
+    pdf.ln(5)
+    pdf.cell(200, 10, txt=f"Name: {document['name']}", ln=True)
+    pdf.cell(200, 10, txt=f"Email: {document['email']}", ln=True)
+    pdf.cell(200, 10, txt=f"Amount Paid: KES {document['amount']:.2f}", ln=True)
+    pdf.cell(200, 10, txt=f"Date: {document['date']}", ln=True)
+    pdf.ln(10)
+    pdf.cell(200, 10, txt=document['heading'], ln=True)
+    for label, amount in document['lines']:
+        pdf.cell(200, 10, txt=f"{label} - KES {amount:.2f}", ln=True)
+    path = os.path.join(directory, f"receipt_{document['name']}.pdf")
+    pdf.output(path)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def timed(name, fn, count):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f'{name:8s} {elapsed:7.2f} s  {count / elapsed:9.1f} receipts/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--receipts', type=int, default=2000)
+    parser.add_argument('--lines', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    docs = documents(args.receipts, args.lines)
+    print(f'{args.receipts} receipts of {args.lines} lines, {args.workers} pool workers')
+    with tempfile.TemporaryDirectory() as directory:
+        timed('disk', lambda: [render_to_disk(d, directory) for d in docs], args.receipts)
+    timed('memory', lambda: [render_receipt_pdf(d) for d in docs], args.receipts)
+
+    renderer = ReceiptRenderer(workers=args.workers)
+    renderer.render_many(docs[:args.workers])  # start the worker processes outside the timing
+    timed('pool', lambda: renderer.render_many(docs), args.receipts)
+    renderer.shutdown()
+
+
+if __name__ == '__main__':
+    main()
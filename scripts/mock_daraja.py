@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Safaricom Daraja endpoints the app calls.
+
+    python scripts/mock_daraja.py --port 8089 --latency 150 --fail-rate 0.05
+    MPESA_BASE_URL=http://127.0.0.1:8089 flask run
+
+Serves GET /oauth/v1/generate and POST /mpesa/stkpush/v1/processrequest with
+Daraja-shaped bodies. With --callback the STK result is POSTed to the
+request's CallBackURL after --callback-delay seconds. GET /__stats returns
+request and connection counters, POST /__reset zeroes them.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import Request, urlopen
+
+
+class DarajaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _simulate(self):
+        """Apply the configured latency; returns False when this request should fail."""
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        return random.random() >= self.server.fail_rate
+
+    def do_GET(self):
+        if self.path == '/__stats':
+            return self._send(200, self.server.snapshot())
+        if not self.path.startswith('/oauth/v1/generate'):
+            return self._send(404, {'errorMessage': 'Not found'})
+        self.server.count('token_requests')
+        if not self.headers.get('Authorization', '').startswith('Basic '):
+            return self._send(400, {'errorCode': '400.008.01', 'errorMessage': 'Invalid Authentication passed'})
+        if not self._simulate():
+            return self._send(503, {'errorMessage': 'Service unavailable'})
+        token = uuid.uuid4().hex
+        self.server.tokens[token] = time.monotonic() + self.server.token_ttl
+        self._send(200, {'access_token': token, 'expires_in': str(self.server.token_ttl)})
+
+    def do_POST(self):
+        if self.path == '/__reset':
+            self._body()
+            self.server.reset()
+            return self._send(200, {})
+        if self.path != '/mpesa/stkpush/v1/processrequest':
+            return self._send(404, {'errorMessage': 'Not found'})
+        self.server.count('stk_requests')
+        payload = self._body()
+        token = self.headers.get('Authorization', '').removeprefix('Bearer ')
+        if self.server.tokens.get(token, 0) < time.monotonic():
+            return self._send(401, {'errorCode': '404.001.03', 'errorMessage': 'Invalid Access Token'})
+        if not self._simulate():
+            return self._send(500, {'errorCode': '500.001.1001', 'errorMessage': 'Unable to lock subscriber'})
+        checkout_id = f'ws_CO_{time.strftime("%d%m%Y%H%M%S")}{uuid.uuid4().hex[:10]}'
+        merchant_id = uuid.uuid4().hex[:16]
+        self._send(200, {
+            'MerchantRequestID': merchant_id,
+            'CheckoutRequestID': checkout_id,
+            'ResponseCode': '0',
+            'ResponseDescription': 'Success. Request accepted for processing',
+            'CustomerMessage': 'Success. Request accepted for processing',
+        })
+        if self.server.callback and payload.get('CallBackURL'):
+            threading.Timer(self.server.callback_delay, send_callback,
+                            (payload, merchant_id, checkout_id)).start()
+
+
+def send_callback(payload, merchant_id, checkout_id):
+    body = {'Body': {'stkCallback': {
+        'MerchantRequestID': merchant_id,
+        'CheckoutRequestID': checkout_id,
+        'ResultCode': 0,
+        'ResultDesc': 'The service request is processed successfully.',
+        'CallbackMetadata': {'Item': [
+            {'Name': 'Amount', 'Value': payload.get('Amount')},
+            {'Name': 'MpesaReceiptNumber', 'Value': uuid.uuid4().hex[:10].upper()},
+            {'Name': 'TransactionDate', 'Value': int(time.strftime('%Y%m%d%H%M%S'))},
+            {'Name': 'PhoneNumber', 'Value': payload.get('PhoneNumber')},
+        ]},
+    }}}
+    request = Request(payload['CallBackURL'], data=json.dumps(body).encode(),
+                      headers={'Content-Type': 'application/json'}, method='POST')
+    try:
+        urlopen(request, timeout=10).close()
+    except Exception as e:
+        print(f'Callback to {payload["CallBackURL"]} failed: {e}')
+
+
+class DarajaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, fail_rate=0.0, token_ttl=3599,
+                 callback=False, callback_delay=2.0, verbose=False):
+        super().__init__(address, DarajaHandler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.token_ttl = token_ttl
+        self.callback = callback
+        self.callback_delay = callback_delay
+        self.verbose = verbose
+        self.tokens = {}
+        self._lock = threading.Lock()
+        self.reset()
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def reset(self):
+        with self._lock:
+            self.counters = {'connections': 0, 'token_requests': 0, 'stk_requests': 0}
+
+
+def start(port=0, **options):
+    """Run a mock server on a background thread and return it; ``server.url`` is its base URL."""
+    server = DarajaServer(('127.0.0.1', port), **options)
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0, help='milliseconds added to every Daraja call')
+    parser.add_argument('--fail-rate', type=float, default=0, help='fraction of calls answered with 5xx')
+    parser.add_argument('--token-ttl', type=int, default=3599)
+    parser.add_argument('--callback', action='store_true', help='POST a successful result to CallBackURL')
+    parser.add_argument('--callback-delay', type=float, default=2.0)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    server = DarajaServer(('127.0.0.1', args.port), latency=args.latency / 1000, fail_rate=args.fail_rate,
+                          token_ttl=args.token_ttl, callback=args.callback,
+                          callback_delay=args.callback_delay, verbose=args.verbose)
+    print(f'Mock Daraja listening on http://127.0.0.1:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
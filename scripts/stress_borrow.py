@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Hammer POST /api/borrow/ from many threads and check nothing is overbooked.
+
+Creates one book with --copies copies and --borrowers members, then has every
+member try to borrow it at the same moment. Exactly --copies borrows must
+succeed and available_copies must end at zero.
+
+    python scripts/stress_borrow.py --borrowers 300 --copies 25
+
+Without DATABASE_URI a throwaway SQLite file is used.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+os.environ.setdefault('DATABASE_URI', f"sqlite:///{os.path.join(tempfile.gettempdir(), 'stress_borrow.db')}")
+os.environ.setdefault('SECRET_KEY', 'stress')
+os.environ.setdefault('JWT_SECRET_KEY', 'stress-jwt-secret-key-of-decent-length')
+os.environ['JOB_WORKER_ENABLED'] = 'false'
+os.environ['REMINDER_SCHEDULER_ENABLED'] = 'false'
+
+from sqlalchemy import insert
+from flask_jwt_extended import create_access_token
+from app import create_app
+from app.extensions import db
+from app.models import User, Book, Borrow
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--borrowers', type=int, default=300)
+    parser.add_argument('--copies', type=int, default=25)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(insert(User), [
+            {'id': i + 1, 'name': f'member{i}', 'email': f'member{i}@example.com', 'password_hash': 'x', 'role': 'member'}
+            for i in range(args.borrowers)
+        ])
+        db.session.add(Book(id=1, title='Popular Title', author='Author', category='General',
+                            total_copies=args.copies, available_copies=args.copies))
+        db.session.commit()
+        tokens = [
+            create_access_token(identity=str(i + 1), additional_claims={'role': 'member', 'email': f'member{i}@example.com'})
+            for i in range(args.borrowers)
+        ]
+
+    barrier = threading.Barrier(args.borrowers)
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def borrow(token):
+        client = app.test_client()
+        barrier.wait()
+        response = client.post('/api/borrow/', json={'book_id': 1}, headers={'Authorization': f'Bearer {token}'})
+        with lock:
+            statuses[response.status_code] += 1
+
+    threads = [threading.Thread(target=borrow, args=(t,)) for t in tokens]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        available = db.session.get(Book, 1).available_copies
+        borrowed = Borrow.query.filter_by(book_id=1).count()
+
+    print(f'responses: {dict(statuses)}')
+    print(f'borrow rows: {borrowed}, available_copies: {available}')
+    ok = borrowed == args.copies and available == 0 and statuses[201] == args.copies
+    print('OK - no overbooking' if ok else 'FAIL - inventory and borrows disagree')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+import os
+import tempfile
+import pytest
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix='library-tests-'), 'test.db')
+os.environ.update({
+    'SECRET_KEY': 'test-secret',
+    'JWT_SECRET_KEY': 'test-jwt-secret-key-that-is-long-enough',
+    'DATABASE_URI': f'sqlite:///{DB_PATH}',
+    'MAIL_DEFAULT_SENDER': 'library@example.com',
+    'JOB_WORKER_ENABLED': 'false',
+    'REMINDER_SCHEDULER_ENABLED': 'false',
+    'RESPONSE_CACHE_ENABLED': 'false',
+    'SLOW_QUERY_THRESHOLD_MS': '0',
+    'BCRYPT_LOG_ROUNDS': '4',
+    'PASSWORD_HASH_WORKERS': '0',
+    'RECEIPT_RENDER_WORKERS': '0',
+})
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from app import create_app  # noqa: E402
+from app.extensions import db as _db  # noqa: E402
+from app.models import User  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    app.extensions['mail'].suppress = True
+    return app
+
+
+@pytest.fixture
+def db(app):
+    with app.app_context():
+        _db.drop_all()
+        _db.create_all()
+        yield _db
+        _db.session.remove()
+
+
+@pytest.fixture
+def client(app, db):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(db):
+    def make_user(name, role='member', **fields):
+        user = User(name=name, email=f'{name}@example.com', role=role, password_hash='x', **fields)
+        db.session.add(user)
+        db.session.commit()
+        token = create_access_token(identity=str(user.id), additional_claims={'role': role, 'email': user.email})
+        return user, {'Authorization': f'Bearer {token}'}
+    return make_user
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+import io
+from app.models import Book, Hold, User
+from app.utils.bulk_import import import_books, import_members, read_records, update_members
+from app.utils.holds import READY, WAITING
+
+
+def csv_records(text):
+    return read_records(io.BytesIO(text.encode()), 'csv')
+
+
+def test_member_import_reports_case_variants_per_row(db):
+    report, error = import_members(csv_records(
+        'name,email,password\n'
+        'Alice,alice@example.com,Secret1!x\n'
+        'alice,other@example.com,Secret1!x\n'
+        'Bob,ALICE@Example.com,Secret1!x\n'
+        'Carol,carol@example.com,Secret1!x\n'
+    ))
+    assert error is None
+    assert report.inserted == 2
+    assert [(e['row'], sorted(e['errors'])) for e in report.errors] == [(2, ['name']), (3, ['email'])]
+    assert sorted(u.name for u in User.query) == ['Alice', 'Carol']
+
+
+def test_member_update_reports_names_repeated_in_another_case(db, make_user):
+    alice, _ = make_user('alice')
+    bob, _ = make_user('bob')
+    updated, errors = update_members([{'id': alice.id, 'name': 'Reader'}, {'id': bob.id, 'name': 'reader'}])
+    assert updated == 1
+    assert errors[0]['id'] == bob.id and 'name' in errors[0]['errors']
+
+
+def test_book_import_hands_added_copies_to_waiting_holds(db, make_user):
+    reader, _ = make_user('reader')
+    book = Book(title='Dune', author='Herbert', isbn='9780441013593', total_copies=1, available_copies=0)
+    db.session.add(book)
+    db.session.flush()
+    hold = Hold(book_id=book.id, user_id=reader.id, status=WAITING)
+    db.session.add(hold)
+    db.session.commit()
+
+    report, error = import_books(csv_records(
+        'isbn,title,author,total_copies\n'
+        '9780441013593,Dune,Herbert,2\n'
+    ))
+    assert error is None and report.updated == 1
+    db.session.refresh(hold)
+    db.session.refresh(book)
+    assert hold.status == READY
+    assert (book.total_copies, book.available_copies) == (2, 0)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+import pytest
+from app.models import Book, VerificationCode
+from app.utils.code_store import DatabaseCodeStore, MemoryCodeStore
+
+
+@pytest.fixture(params=['memory', 'database'])
+def store(request, db):
+    return MemoryCodeStore() if request.param == 'memory' else DatabaseCodeStore()
+
+
+def put(store, db, code, ttl):
+    store.put('reader@example.com', code, ttl)
+    # The routes commit the new code together with the email job.
+    db.session.commit()
+
+
+def test_code_is_consumed_once(store, db):
+    put(store, db, 123456, 600)
+    assert not store.consume('reader@example.com', '654321')
+    assert store.consume('reader@example.com', '123456')
+    assert not store.consume('reader@example.com', '123456')
+
+
+def test_put_replaces_the_previous_code(store, db):
+    put(store, db, 111111, 600)
+    put(store, db, 222222, 600)
+    assert not store.consume('reader@example.com', '111111')
+    assert store.consume('reader@example.com', '222222')
+
+
+def test_expired_code_is_rejected(store, db):
+    put(store, db, 123456, -1)
+    assert not store.verify('reader@example.com', '123456')
+    assert not store.consume('reader@example.com', '123456')
+
+
+def test_database_put_leaves_the_commit_to_the_caller(db):
+    store = DatabaseCodeStore()
+    db.session.add(Book(title='Dune', author='Herbert', total_copies=1, available_copies=1))
+    store.put('reader@example.com', 123456, 600)
+    db.session.rollback()
+    assert db.session.get(VerificationCode, 'reader@example.com') is None
+    assert Book.query.count() == 0
+
+
+def test_database_consume_sticks_when_the_request_rolls_back(db):
+    store = DatabaseCodeStore()
+    store.put('reader@example.com', 123456, 600)
+    db.session.commit()
+    assert store.consume('reader@example.com', '123456')
+    db.session.rollback()
+    assert not store.consume('reader@example.com', '123456')
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from app.models import Book, Borrow, Debt, User
+
+ENDPOINTS = ('books', 'members', 'borrows', 'fines')
+# One page large enough to hold every seeded row.
+LIST_ENDPOINTS = ('/api/books/', '/api/members/', '/api/borrow/', '/api/debts/my-fines')
+
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def seed(db, count, start):
+    now = datetime.utcnow()
+    for i in range(start, start + count):
+        user = User(name=f'member{i}', email=f'member{i}@example.com', role='member', password_hash='x')
+        book = Book(title=f'Book {i}', author='Author', category='Fiction', total_copies=2, available_copies=1)
+        db.session.add_all([user, book])
+        db.session.flush()
+        borrow = Borrow(user_id=user.id, book_id=book.id, borrow_date=now, due_date=now + timedelta(days=14))
+        db.session.add(borrow)
+        db.session.flush()
+        db.session.add(Debt(user_id=user.id, book_id=book.id, borrow_id=borrow.id, days_overdue=2, fine_amount=40.0))
+    db.session.commit()
+
+
+def query_count(client, db, headers, url):
+    with count_queries(db.engine) as statements:
+        response = client.get(url, headers=headers)
+        response.get_data()
+    assert response.status_code == 200
+    return len(statements)
+
+
+def export_query_count(client, db, headers, name, fmt):
+    return query_count(client, db, headers, f'/api/export/{name}/{fmt}')
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'excel'])
+@pytest.mark.parametrize('name', ENDPOINTS)
+def test_export_query_count_does_not_grow_with_rows(client, db, make_user, name, fmt):
+    _, headers = make_user('librarian', role='librarian')
+    seed(db, 3, 0)
+    # Warm up once so per-process work (e.g. the first revocation list sync) is not counted.
+    export_query_count(client, db, headers, name, fmt)
+    small = export_query_count(client, db, headers, name, fmt)
+    seed(db, 60, 3)
+    large = export_query_count(client, db, headers, name, fmt)
+    assert small == large
+
+
+@pytest.mark.parametrize('url', LIST_ENDPOINTS)
+def test_list_query_count_does_not_grow_with_rows(client, db, make_user, url):
+    _, headers = make_user('librarian', role='librarian')
+    url = f'{url}?limit=200'
+    seed(db, 3, 0)
+    query_count(client, db, headers, url)
+    small = query_count(client, db, headers, url)
+    seed(db, 60, 3)
+    large = query_count(client, db, headers, url)
+    assert small == large
+    body = client.get(url, headers=headers).get_json()
+    # All 63 rows fit on the page, so a per-row query would show up in ``large``.
+    assert len(body['debts'] if isinstance(body, dict) else body) >= 63
+
+
+def test_export_csv_contains_every_row(client, db, make_user):
+    _, headers = make_user('librarian', role='librarian')
+    seed(db, 25, 0)
+    lines = client.get('/api/export/fines/csv', headers=headers).get_data(as_text=True).splitlines()
+    assert lines[0].startswith('ID,User,Email,Book')
+    assert len(lines) == 26
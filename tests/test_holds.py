@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+import json
+from datetime import datetime, timedelta
+from app.models import Book, Hold
+from app.utils.holds import WAITING, parse_event_id, stream_events
+
+
+def next_hold_event(stream):
+    for chunk in stream:
+        if chunk.startswith('id: '):
+            return json.loads(chunk.split('data: ', 1)[1])
+    return None
+
+
+def add_hold(db, user, book, updated_at):
+    hold = Hold(book_id=book.id, user_id=user.id, status=WAITING, updated_at=updated_at)
+    db.session.add(hold)
+    db.session.commit()
+    return hold.id
+
+
+def test_stream_sends_change_committed_after_a_later_stamped_one(app, db, make_user, monkeypatch):
+    monkeypatch.setitem(app.config, 'HOLD_STREAM_POLL_INTERVAL', 0.01)
+    monkeypatch.setitem(app.config, 'HOLD_STREAM_MAX_SECONDS', 1)
+    user, _ = make_user('reader')
+    book = Book(title='Dune', author='Herbert', category='fiction', total_copies=1, available_copies=0)
+    db.session.add(book)
+    db.session.commit()
+    now = datetime.utcnow()
+    first = add_hold(db, user, book, now)
+
+    stream = stream_events(user.id)
+    assert next_hold_event(stream)['hold_id'] == first
+
+    # Stamped before the snapshot, committed after it.
+    late = add_hold(db, user, book, now - timedelta(seconds=2))
+    assert next_hold_event(stream)['hold_id'] == late
+
+    latest = add_hold(db, user, book, datetime.utcnow())
+    assert next_hold_event(stream)['hold_id'] == latest
+    assert next_hold_event(stream) is None
+
+
+def test_resumed_stream_does_not_resend_last_event(app, db, make_user, monkeypatch):
+    monkeypatch.setitem(app.config, 'HOLD_STREAM_POLL_INTERVAL', 0.01)
+    monkeypatch.setitem(app.config, 'HOLD_STREAM_MAX_SECONDS', 1)
+    user, _ = make_user('reader')
+    book = Book(title='Emma', author='Austen', category='fiction', total_copies=1, available_copies=0)
+    db.session.add(book)
+    db.session.commit()
+    now = datetime.utcnow()
+    seen = add_hold(db, user, book, now)
+    missed = add_hold(db, user, book, now - timedelta(seconds=1))
+
+    stream = stream_events(user.id, parse_event_id(f'{now.isoformat()}_{seen}'))
+    assert next_hold_event(stream)['hold_id'] == missed
+    assert next_hold_event(stream) is None
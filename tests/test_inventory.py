@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+import threading
+from collections import Counter
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy.exc import OperationalError
+from app.models import Book, Borrow, User
+from app.utils.inventory import return_copy, run_in_transaction, take_copy
+
+
+def test_take_copy_never_goes_below_zero(db):
+    book = Book(title='Dune', author='Herbert', total_copies=1, available_copies=1)
+    db.session.add(book)
+    db.session.commit()
+    assert take_copy(book.id) is True
+    assert take_copy(book.id) is False
+    assert return_copy(book.id) is True
+    assert return_copy(book.id) is False
+    db.session.commit()
+    assert db.session.get(Book, book.id, populate_existing=True).available_copies == 1
+
+
+def test_run_in_transaction_retries_lock_conflicts(db):
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise OperationalError('UPDATE book', {}, Exception('database is locked'))
+        return 'done'
+
+    assert run_in_transaction(flaky) == 'done'
+    assert len(attempts) == 3
+
+
+def test_run_in_transaction_does_not_retry_other_errors(db):
+    def broken():
+        raise OperationalError('UPDATE book', {}, Exception('no such column: nope'))
+
+    with pytest.raises(OperationalError):
+        run_in_transaction(broken)
+
+
+def test_concurrent_borrows_never_overbook(app, db):
+    borrowers, copies = 12, 3
+    users = [User(name=f'm{i}', email=f'm{i}@example.com', role='member', password_hash='x') for i in range(borrowers)]
+    book = Book(title='Popular', author='Author', category='General', total_copies=copies, available_copies=copies)
+    db.session.add_all(users + [book])
+    db.session.commit()
+    tokens = [
+        create_access_token(identity=str(u.id), additional_claims={'role': 'member', 'email': u.email}) for u in users
+    ]
+    book_id = book.id
+    db.session.remove()
+
+    barrier = threading.Barrier(borrowers)
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def borrow(token):
+        client = app.test_client()
+        barrier.wait()
+        response = client.post('/api/borrow/', json={'book_id': book_id}, headers={'Authorization': f'Bearer {token}'})
+        with lock:
+            statuses[response.status_code] += 1
+
+    threads = [threading.Thread(target=borrow, args=(token,)) for token in tokens]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses[201] == copies
+    assert Borrow.query.filter_by(book_id=book_id).count() == copies
+    assert db.session.get(Book, book_id).available_copies == 0
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+from datetime import datetime, timedelta
+from app.models import Job
+from app.utils import job_queue
+
+
+def test_enqueue_is_idempotent_per_key(db):
+    first = job_queue.enqueue('email', {'n': 1}, idempotency_key='k1')
+    db.session.commit()
+    second = job_queue.enqueue('email', {'n': 2}, idempotency_key='k1')
+    db.session.commit()
+    assert first.id == second.id
+    assert Job.query.count() == 1
+
+
+def test_claimed_job_is_leased_until_visibility_timeout(db):
+    job_queue.enqueue('email', {})
+    db.session.commit()
+    job = job_queue.claim_job(visibility_timeout=300)
+    assert job is not None and job.status == job_queue.RUNNING and job.attempts == 1
+    assert job_queue.claim_job(visibility_timeout=300) is None
+
+    # A worker that died mid-job leaves an expired lease that another worker can take over.
+    job.locked_until = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    again = job_queue.claim_job(visibility_timeout=300)
+    assert again.id == job.id and again.attempts == 2
+
+
+def test_failed_job_backs_off_then_fails_permanently(db):
+    job = job_queue.enqueue('email', {}, max_attempts=1)
+    db.session.commit()
+    job = job_queue.claim_job(visibility_timeout=300)
+    job_queue.fail_job(job, RuntimeError('smtp down'))
+    assert db.session.get(Job, job.id).status == job_queue.FAILED
+
+
+def test_prune_jobs_keeps_recent_and_unfinished_jobs(db):
+    old = datetime.utcnow() - timedelta(days=40)
+    db.session.add_all([
+        Job(kind='email', payload='{}', status=job_queue.DONE, run_at=old),
+        Job(kind='email', payload='{}', status=job_queue.FAILED, run_at=old),
+        Job(kind='email', payload='{}', status=job_queue.DONE, run_at=datetime.utcnow()),
+        Job(kind='email', payload='{}', status=job_queue.PENDING, run_at=old),
+    ])
+    db.session.commit()
+    assert job_queue.prune_jobs(done_days=7, failed_days=30, batch_size=1) == 2
+    assert sorted(job.status for job in Job.query) == [job_queue.DONE, job_queue.PENDING]
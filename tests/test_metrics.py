@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+import pytest
+from sqlalchemy.exc import IntegrityError
+from app.models import User
+
+
+def test_integrity_error_survives_metrics_listeners(app, db, make_user):
+    assert app.extensions.get('metrics') is not None
+    make_user('alice')
+    db.session.add(User(name='alice', email='other@example.com', password_hash='x'))
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+    # The failed statement's start time must not linger on the pooled connection.
+    connection = db.session.connection()
+    assert not connection.info.get('metrics_started')
+
+
+def sample(client, name):
+    # The registry lives for the whole process, so other tests' requests are counted too.
+    for line in client.get('/metrics').get_data(as_text=True).splitlines():
+        if line.startswith(name + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+
+def test_metrics_endpoint_counts_requests(client, make_user):
+    _, headers = make_user('bob')
+    requests = 'http_requests_total{method="GET",endpoint="/api/books/",status="200"}'
+    statements = 'http_request_sql_statements_count{endpoint="/api/books/"}'
+    before = sample(client, requests), sample(client, statements)
+    client.get('/api/books/', headers=headers)
+    assert (sample(client, requests), sample(client, statements)) == (before[0] + 1, before[1] + 1)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+import pytest
+import requests
+from app.utils.mpesa_client import CircuitBreaker, CircuitOpen, MpesaClient, MpesaError
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.text = ''
+        self._body = body or {}
+
+    def json(self):
+        return self._body
+
+
+def make_client(outcomes):
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+    client = MpesaClient('https://mpesa.test', 'key', 'secret', '174379', 'passkey', 'https://cb.test',
+                         breaker=breaker)
+    outcomes = iter(outcomes)
+
+    def request(method, url, **kwargs):
+        outcome = next(outcomes)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    client.session.request = request
+    return client
+
+
+def test_unexpected_error_during_trial_does_not_wedge_breaker():
+    client = make_client([
+        requests.exceptions.ConnectionError('down'),
+        RuntimeError('bug in an adapter'),
+        FakeResponse(200, {'ok': True}),
+    ])
+    with pytest.raises(MpesaError):
+        client._request('GET', '/ping')
+    assert client.breaker.opened_at is not None
+
+    # Half-open trial raises something other than RequestException.
+    with pytest.raises(RuntimeError):
+        client._request('GET', '/ping')
+    assert client.breaker._trial is False
+
+    assert client._request('GET', '/ping') == {'ok': True}
+    assert client.breaker.state == 'closed'
+
+
+def test_open_breaker_fails_fast_until_reset():
+    client = make_client([FakeResponse(503)])
+    client.breaker.reset_timeout = 60
+    with pytest.raises(MpesaError):
+        client._request('GET', '/ping')
+    with pytest.raises(CircuitOpen):
+        client._request('GET', '/ping')
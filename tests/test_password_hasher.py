@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+import time
+from concurrent.futures import TimeoutError
+from threading import Thread
+import pytest
+from app.utils.password_hasher import HasherBusy, PasswordHasher
+
+
+def _slow(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def test_timed_out_work_keeps_its_slot_until_it_finishes():
+    hasher = PasswordHasher(workers=1, max_pending=0, rounds=4, timeout=0.05)
+    try:
+        with pytest.raises(TimeoutError):
+            hasher._submit(_slow, 0.5)
+        # The first call is still running in the pool, so there is no room for another.
+        with pytest.raises(HasherBusy):
+            hasher._submit(_slow, 0)
+        time.sleep(0.6)
+        assert hasher._submit(_slow, 0) == 0
+    finally:
+        hasher.shutdown()
+
+
+def test_bulk_hashing_leaves_request_slots_free():
+    hasher = PasswordHasher(workers=1, max_pending=0, rounds=4, timeout=5, bulk_workers=1)
+    try:
+        bulk = Thread(target=hasher.hash_many, args=(['secret'] * 20,))
+        bulk.start()
+        time.sleep(0.05)
+        started = time.perf_counter()
+        password_hash = hasher.hash('login-password')
+        assert time.perf_counter() - started < 2
+        assert hasher.check(password_hash, 'login-password')
+        bulk.join()
+    finally:
+        hasher.shutdown()
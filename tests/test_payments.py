@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+import json
+from app.models import Book, Debt, Job, Payment, UserBalance
+from app.utils.fines import adjust_balance, get_balance, recompute_balances
+from app.utils.payments import PAID, PENDING, process_callback
+
+
+def callback(checkout_id, amount, receipt='QK12ABC345', code=0):
+    return {'Body': {'stkCallback': {
+        'MerchantRequestID': 'm-1',
+        'CheckoutRequestID': checkout_id,
+        'ResultCode': code,
+        'ResultDesc': 'ok',
+        'CallbackMetadata': {'Item': [
+            {'Name': 'Amount', 'Value': amount},
+            {'Name': 'MpesaReceiptNumber', 'Value': receipt},
+            {'Name': 'PhoneNumber', 'Value': 254712345678},
+        ]},
+    }}}
+
+
+def setup_debts(db, user, amounts):
+    book = Book(title='Dune', author='Herbert', category='fiction', total_copies=1, available_copies=1)
+    db.session.add(book)
+    db.session.flush()
+    debts = [Debt(user_id=user.id, book_id=book.id, days_overdue=int(a // 20), fine_amount=a, paid=False)
+             for a in amounts]
+    db.session.add_all(debts)
+    adjust_balance(user.id, sum(amounts), len(amounts))
+    db.session.add(Payment(checkout_request_id='ws_CO_1', user_id=user.id, phone='254712345678',
+                           amount=sum(amounts), status=PENDING))
+    db.session.commit()
+    return debts
+
+
+def test_settles_oldest_debts_up_to_paid_amount_and_credits_the_rest(db, make_user):
+    user, _ = make_user('payer')
+    first, second, third = setup_debts(db, user, [40.0, 60.0, 20.0])
+
+    payment = process_callback(callback('ws_CO_1', 70))
+    db.session.commit()
+
+    assert payment.status == PAID and payment.amount == 70
+    assert payment.settled_amount == 40
+    assert [first.paid, second.paid, third.paid] == [True, False, False]
+    assert db.session.get(UserBalance, user.id).credit == 30
+    assert get_balance(user.id) == (120 - 40 - 30, 2)
+    job = Job.query.one()
+    assert json.loads(job.payload)['debt_ids'] == [first.id]
+
+    recompute_balances()
+    db.session.commit()
+    assert get_balance(user.id) == (120 - 40 - 30, 2)
+
+
+def test_instalments_that_cover_the_balance_settle_every_debt(db, make_user):
+    user, _ = make_user('payer')
+    first, second = setup_debts(db, user, [100.0, 100.0])
+    db.session.add(Payment(checkout_request_id='ws_CO_2', user_id=user.id, phone='254712345678',
+                           amount=50, status=PENDING))
+    db.session.commit()
+
+    process_callback(callback('ws_CO_1', 150, receipt='QK12ABC345'))
+    db.session.commit()
+    assert [first.paid, second.paid] == [True, False]
+    assert get_balance(user.id) == (50, 1)
+
+    payment = process_callback(callback('ws_CO_2', 50, receipt='QK12ABC346'))
+    db.session.commit()
+    assert payment.settled_amount == 100
+    assert second.paid
+    assert get_balance(user.id) == (0, 0)
+
+    recompute_balances()
+    db.session.commit()
+    assert get_balance(user.id) == (0, 0)
+    assert db.session.get(UserBalance, user.id).credit == 0
+
+
+def test_duplicate_callback_is_applied_once(db, make_user):
+    user, _ = make_user('payer')
+    setup_debts(db, user, [40.0, 60.0])
+
+    assert process_callback(callback('ws_CO_1', 100)) is not None
+    db.session.commit()
+    assert process_callback(callback('ws_CO_1', 100)) is None
+    db.session.commit()
+
+    assert get_balance(user.id) == (0, 0)
+    assert Debt.query.filter_by(paid=True).count() == 2
+    assert Job.query.count() == 1
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+import time
+from concurrent.futures import TimeoutError
+import pytest
+from app.utils.pdf_generator import ReceiptRenderer, RendererBusy
+
+
+def _slow(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def test_timed_out_render_keeps_its_slot_until_it_finishes():
+    renderer = ReceiptRenderer(workers=1, max_pending=0, timeout=0.05)
+    try:
+        with pytest.raises(TimeoutError):
+            renderer._submit(_slow, 0.5)
+        # The first render is still running in the pool, so there is no room for another.
+        with pytest.raises(RendererBusy):
+            renderer._submit(_slow, 0)
+        time.sleep(0.6)
+        assert renderer._submit(_slow, 0) == 0
+    finally:
+        renderer.shutdown()
+
+
+def test_render_produces_a_pdf():
+    renderer = ReceiptRenderer(workers=0)
+    document = {'title': 'Receipt', 'name': 'Reader', 'email': 'r@example.com', 'amount': 40.0,
+                'date': '2026-03-01', 'heading': 'Cleared Debt:', 'lines': [('Dune', 40.0)]}
+    assert renderer.render(document).startswith(b'%PDF')
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app.models import Book, Borrow, Job
+from app.utils.reminders import sweep_reminders
+
+
+def test_sweep_reminds_only_borrows_due_in_window(db, make_user):
+    user, _ = make_user('reader')
+    book = Book(title='Dune', author='Herbert', total_copies=5, available_copies=2)
+    db.session.add(book)
+    db.session.flush()
+    now = datetime.utcnow()
+    due_soon = Borrow(user_id=user.id, book_id=book.id, due_date=now + timedelta(days=1))
+    overdue = Borrow(user_id=user.id, book_id=book.id, due_date=now - timedelta(days=3))
+    later = Borrow(user_id=user.id, book_id=book.id, due_date=now + timedelta(days=10))
+    db.session.add_all([due_soon, overdue, later])
+    db.session.commit()
+
+    assert sweep_reminders(now=now) == 1
+    assert due_soon.reminder_sent_at is not None
+    assert overdue.reminder_sent_at is None and later.reminder_sent_at is None
+    assert Job.query.filter_by(kind='email').count() == 1
+
+    # The due-date window is part of the query, so overdue borrows are never fetched.
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM borrow' in statement:
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        assert sweep_reminders(now=now) == 0
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    assert statements and all('borrow.due_date >=' in sql and 'borrow.due_date <=' in sql for sql in statements)
+
+
+def test_sweep_chunks_walk_the_reminder_index_without_sorting(db, make_user):
+    user, _ = make_user('reader')
+    book = Book(title='Dune', author='Herbert', total_copies=5, available_copies=5)
+    db.session.add(book)
+    db.session.flush()
+    now = datetime.utcnow()
+    db.session.add_all([Borrow(user_id=user.id, book_id=book.id, due_date=now + timedelta(days=1)) for _ in range(3)])
+    # Typical steady state: most borrows in the window were reminded by an earlier run.
+    db.session.add_all([Borrow(user_id=user.id, book_id=book.id, due_date=now + timedelta(hours=i % 48),
+                               reminder_sent_at=now - timedelta(seconds=i)) for i in range(500)])
+    db.session.commit()
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM borrow' in statement and 'ORDER BY borrow.user_id, borrow.id' in statement:
+            captured.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        sweep_reminders(now=now, chunk_size=2)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    statement, parameters = captured[0]
+    with db.engine.connect() as connection:
+        # SQLite loads planner statistics per connection.
+        connection.exec_driver_sql('ANALYZE')
+        plan = ' '.join(str(row) for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters))
+    assert 'ix_borrow_reminder_scan' in plan
+    assert 'TEMP B-TREE' not in plan
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+from sqlalchemy import func, select
+from app.models import Book, CacheVersion
+from app.utils.response_cache import CATALOG, ResponseCache, cache_key
+
+
+def test_cache_key_folds_case_only_for_catalog_filters(app):
+    with app.test_request_context('/api/books/?author=%20Tolkien&cursor=eyJpZCI6IDV9&fields=title'):
+        author_key = cache_key()
+    with app.test_request_context('/api/books/?author=tolkien&cursor=eyJpZCI6IDV9&fields=title'):
+        assert cache_key() == author_key
+
+
+def test_cache_key_keeps_cursor_byte_exact(app):
+    with app.test_request_context('/api/books/?cursor=eyJpZCI6IDV9'):
+        upper = cache_key()
+    with app.test_request_context('/api/books/?cursor=eyjpzci6idv9'):
+        assert cache_key() != upper
+
+
+def test_book_commit_skips_version_bump_when_cache_disabled(app, db):
+    assert app.extensions.get('response_cache') is None
+    db.session.add(Book(title='Dune', author='Herbert', total_copies=1, available_copies=1))
+    db.session.commit()
+    assert db.session.scalar(select(func.count()).select_from(CacheVersion)) == 0
+
+
+def test_book_commit_bumps_version_when_cache_enabled(app, db, monkeypatch):
+    monkeypatch.setitem(app.extensions, 'response_cache', ResponseCache())
+    db.session.add(Book(title='Dune', author='Herbert', total_copies=1, available_copies=1))
+    db.session.commit()
+    assert db.session.get(CacheVersion, CATALOG).version == 1
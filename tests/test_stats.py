@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+from datetime import date, datetime, timedelta
+import pytz
+from app.models import Book, Borrow, Debt
+from app.utils import stats
+from app.utils.fines import settle_debts
+
+NAIROBI = pytz.timezone('Africa/Nairobi')
+
+
+def test_local_day_buckets_in_nairobi_time():
+    assert stats.local_day(datetime(2026, 3, 1, 22, 30)) == date(2026, 3, 2)
+    assert stats.local_day(datetime(2026, 3, 1, 20, 59)) == date(2026, 3, 1)
+    assert stats.local_day(NAIROBI.localize(datetime(2026, 3, 2, 0, 30))) == date(2026, 3, 2)
+
+
+def test_incremental_rollups_match_rebuild_around_midnight(db, make_user):
+    user, _ = make_user('reader')
+    book = Book(title='Dune', author='Herbert', category='fiction', total_copies=1, available_copies=1)
+    db.session.add(book)
+    db.session.flush()
+
+    # Same clocks as the borrow and return routes: local borrow_date, UTC return date.
+    borrowed_at = NAIROBI.localize(datetime(2026, 3, 1, 23, 30))
+    returned_at = datetime(2026, 3, 8, 21, 15)
+    borrow = Borrow(user_id=user.id, book_id=book.id, borrow_date=borrowed_at,
+                    due_date=datetime(2026, 3, 7, 12, 0), returned=True, returned_at=returned_at)
+    db.session.add(borrow)
+    db.session.flush()
+    stats.record_borrow(book.id, borrowed_at)
+    stats.record_return(returned_at, True)
+    debt = Debt(user_id=user.id, book_id=book.id, borrow_id=borrow.id, days_overdue=1, fine_amount=50, paid=False)
+    db.session.add(debt)
+    db.session.flush()
+    settle_debts(user.id, [debt])
+    db.session.commit()
+
+    today = stats.local_now().date()
+    incremental = stats.circulation(date(2026, 3, 1), today)
+    assert [row['day'] for row in incremental[:2]] == ['2026-03-01', '2026-03-09']
+    assert incremental[1]['returns'] == 1 and incremental[1]['overdue_returns'] == 1
+
+    stats.rebuild_rollups()
+    db.session.commit()
+    assert stats.circulation(date(2026, 3, 1), today) == incremental
+
+
+def test_open_overdue_compares_due_date_in_local_time(db, make_user):
+    user, _ = make_user('late')
+    book = Book(title='Emma', author='Austen', category='fiction', total_copies=1, available_copies=0)
+    db.session.add(book)
+    db.session.flush()
+    now = stats.local_now()
+    db.session.add_all([
+        Borrow(user_id=user.id, book_id=book.id, borrow_date=now - timedelta(days=15),
+               due_date=now - timedelta(hours=1), returned=False),
+        Borrow(user_id=user.id, book_id=book.id, borrow_date=now - timedelta(days=13),
+               due_date=now + timedelta(hours=1), returned=False),
+    ])
+    db.session.commit()
+    assert stats.open_overdue() == 1
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+from datetime import datetime, timedelta
+from app.models import Book, RevokedToken
+
+
+def test_revocation_sync_leaves_the_request_session_alone(app, db):
+    revocations = app.extensions['revocation_list']
+    db.session.add(RevokedToken(jti='expired', expires_at=datetime.utcnow() - timedelta(minutes=1)))
+    db.session.add(RevokedToken(jti='live', expires_at=datetime.utcnow() + timedelta(hours=1)))
+    db.session.commit()
+
+    pending = Book(title='Unsaved', author='Nobody', total_copies=1, available_copies=1)
+    db.session.add(pending)
+    revocations.sync()
+    db.session.rollback()
+
+    assert Book.query.count() == 0
+    assert revocations.is_revoked('live')
+    assert not revocations.is_revoked('expired')
+    assert db.session.get(RevokedToken, 'expired') is None